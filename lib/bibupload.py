@@ -0,0 +1,192 @@
+###############################################################################
+#
+# Purpose: Upload institution-level bib records for records that don't have
+#   OCLC numbers.
+# Date:    Mon Oct 19 11:02:17 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import sys
+from os import linesep
+from os.path import exists
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+try:
+    from lib.flat import read_flat_records
+    from lib.flat2marcxml import MarcXML
+    from lib.quota import QuotaExceeded
+    from lib.compressed import open_text, output_path
+except ModuleNotFoundError:
+    from flat import read_flat_records
+    from flat2marcxml import MarcXML
+    from quota import QuotaExceeded
+    from compressed import open_text, output_path
+
+# This class takes the records of a flat file that don't have OCLC numbers,
+# converts them to MARC XML, and submits them to OCLC with a bounded pool of
+# workers. Each record's outcome is appended to '<flat>.upload' as
+#   TCN<tab>status<tab>OCLC number<tab>detail
+# so an interrupted upload can be resumed; records that were successfully
+# created are not sent again. The OCLC numbers assigned to the new records
+# are appended to the '<flat>.updated' slim flat file for 'catalogmerge'.
+class BibUploader:
+
+    # Constructor.
+    # param: flat_file:str path to the flat file the records are read from.
+    # param: tcns:list TCNs of the records to upload, see Flat.get_no_oclc_number_tcns().
+    # param: ws:OclcService web service used to create the records.
+    # param: report:OclcReport report that tallies the results.
+    # param: logger:Logger optional logging. The class will print if not supplied.
+    # param: workers:int maximum number of concurrent requests. Default 4.
+    # param: branch:str optional branch name added as a '049' to each record.
+    # param: max_errors:int stop submitting records after this many errors
+    #   in a row, which usually means the service or credentials are at fault.
+    # param: debug:bool turns on and off extra diagnostic messaging.
+    def __init__(self, flat_file:str, tcns:list, ws, report, logger=None,
+      workers:int=4, branch:str='', max_errors:int=10, debug:bool=False):
+        self.flat_file  = flat_file
+        self.tcns       = set(tcns)
+        self.ws         = ws
+        self.report     = report
+        self.logger     = logger
+        self.workers    = max(1, int(workers))
+        self.branch     = branch
+        self.max_errors = max_errors
+        self.debug      = debug
+        # The state is appended a line at a time so it is never compressed.
+        self.state_file = output_path(flat_file, '.upload', compress=False)
+        self.slim_file  = output_path(flat_file, '.updated')
+        # The new OCLC numbers {TCN: OCLC number, ...}
+        self.created    = {}
+
+    # Wrapper for the logger.
+    # param: message:str message to either log or print.
+    # param: to_stderr:bool if True the message is reported as an error.
+    def print_or_log(self, message:str, to_stderr:bool=False):
+        if self.logger:
+            self.logger.logit(message, level='error' if to_stderr else 'info', include_timestamp=to_stderr)
+        elif to_stderr:
+            sys.stderr.write(f"{message}" + linesep)
+        else:
+            print(f"{message}")
+
+    # Reads the outcomes of previous uploads of this flat file.
+    # return: dictionary of {TCN: status, ...}, the last outcome wins.
+    def _read_state_(self) -> dict:
+        state = {}
+        if not exists(self.state_file):
+            return state
+        with open(self.state_file, encoding='ISO-8859-1', mode='r') as f:
+            for line in f:
+                fields = line.rstrip('\r\n').split('\t')
+                if len(fields) >= 2:
+                    state[fields[0]] = fields[1]
+        return state
+
+    # Finds the flat records that still need uploading.
+    # param: state:dict of previous outcomes from _read_state_().
+    # return: generator of (TCN, form, flat record list).
+    def _pending_records_(self, state:dict):
+        for record in read_flat_records(self.flat_file):
+            tcn  = ''
+            form = ''
+            for line in record:
+                if line.startswith('FORM='):
+                    form = line
+                elif line.startswith('.001.'):
+                    tcn = line.split('|a', 1)[-1].strip()
+                    break
+            if tcn not in self.tcns:
+                continue
+            if state.get(tcn) == 'success':
+                if self.debug:
+                    self.print_or_log(f"DEBUG: skipping {tcn}, uploaded previously.")
+                continue
+            yield tcn, form, record
+
+    # Converts and submits one record. Runs in a worker thread.
+    # param: record:list of flat strings.
+    # return: HTTP status code and response XML.
+    def _upload_(self, record:list):
+        xml_record = MarcXML(list(record), branch=self.branch)
+        return self.ws.create_intitution_level_bib_record(xml_record.as_bytes(), debug=self.debug)
+
+    # Writes the new OCLC number to the slim flat file.
+    def _write_slim_(self, slim, tcn:str, form:str, number:str):
+        slim.write(f"*** DOCUMENT BOUNDARY ***" + linesep)
+        slim.write(f"{form}" + linesep)
+        slim.write(f".001. |a{tcn}" + linesep)
+        slim.write(f".035.   |a(OCoLC){number}" + linesep)
+
+    # Uploads all the pending records.
+    # return: dictionary of the bib load tally.
+    def run(self) -> dict:
+        state = self._read_state_()
+        records = self._pending_records_(state)
+        errors_in_a_row = 0
+        stopped = False
+        in_flight = {}
+        with open(self.state_file, encoding='ISO-8859-1', mode='a', buffering=1) as st, \
+          open_text(self.slim_file, mode='a') as slim, \
+          ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                # Keep the queue of submitted records short so the flat file is streamed.
+                while not stopped and len(in_flight) < self.workers * 2:
+                    pending = next(records, None)
+                    if pending is None:
+                        break
+                    tcn, form, record = pending
+                    in_flight[pool.submit(self._upload_, record)] = (tcn, form)
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tcn, form = in_flight.pop(future)
+                    try:
+                        code, response = future.result()
+                    # Out of hits for today. The record isn't recorded so the
+                    # next run uploads it.
+                    except QuotaExceeded as ex:
+                        if not stopped:
+                            stopped = True
+                            self.print_or_log(f"{ex}", to_stderr=True)
+                        continue
+                    # requests' exceptions are IOErrors.
+                    except (OSError, ValueError) as ex:
+                        code, response = 0, f"{ex}"
+                    if self.report.create_bib_response(response, debug=self.debug, code=code):
+                        number = self.report.get_bib_oclc_number(response)
+                        st.write(f"{tcn}\tsuccess\t{number}\t" + linesep)
+                        if number:
+                            self.created[tcn] = number
+                            self._write_slim_(slim, tcn, form, number)
+                        errors_in_a_row = 0
+                    else:
+                        detail = ' '.join(f"{response}".split())[:200]
+                        st.write(f"{tcn}\terror\t\t{code} {detail}" + linesep)
+                        self.print_or_log(f"failed to upload {tcn}: {code} {detail}", to_stderr=True)
+                        errors_in_a_row += 1
+                        if errors_in_a_row >= self.max_errors and not stopped:
+                            stopped = True
+                            self.print_or_log(f"The web service stopped while uploading bib records after {errors_in_a_row} errors in a row.", to_stderr=True)
+        return self.report.get_bib_load_results()
+
+    # Returns the dictionary of uploaded TCNs and their new OCLC numbers.
+    def get_created(self) -> dict:
+        return self.created
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("bibupload.tst")
+# EOF
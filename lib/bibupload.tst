@@ -0,0 +1,98 @@
+Test uploading bib records that don't have OCLC numbers.
+--------------------------------------------------------
+
+The upload is tested against a local stand-in for OCLC's '/token' and
+'/bib/data' end points.
+
+>>> from bibupload import BibUploader
+>>> from flat import Flat
+>>> from oclcws import OclcService
+>>> from oclcreport import OclcReport
+>>> import os
+>>> import json
+>>> import threading
+>>> from http.server import BaseHTTPRequestHandler, HTTPServer
+
+>>> class StandIn(BaseHTTPRequestHandler):
+...     count = 0
+...     def log_message(self, format, *args):
+...         pass
+...     def do_POST(self):
+...         body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+...         if self.path.startswith('/token'):
+...             code, content = 200, json.dumps({'access_token': 'tk_test', 'expires_at': '2099-01-01 00:00:00Z'})
+...         elif 'Broken' in body:
+...             code, content = 400, '<error><message>Record is invalid.</message></error>'
+...         else:
+...             StandIn.count += 1
+...             code, content = 201, f'<record><controlfield tag="001">ocn{900 + StandIn.count}</controlfield></record>'
+...         self.send_response(code)
+...         self.end_headers()
+...         self.wfile.write(content.encode('utf-8'))
+>>> server = HTTPServer(('127.0.0.1', 0), StandIn)
+>>> thread = threading.Thread(target=server.serve_forever, daemon=True)
+>>> thread.start()
+>>> url = f"http://127.0.0.1:{server.server_port}"
+>>> configs = {'service': {'clientId': 'id', 'secret': 'secret', 'registryId': '128807',
+...   'principalId': '', 'institutionalSymbol': 'OCPSB', 'branchName': 'MAIN',
+...   'baseUrl': url, 'authUrl': url}}
+>>> if os.path.exists('_auth_.json'):
+...     os.remove('_auth_.json')
+
+>>> with open('test_upload.flat', encoding='ISO-8859-1', mode='w') as f:
+...     _ = f.write("""*** DOCUMENT BOUNDARY ***
+... FORM=MUSIC
+... .000. |ajm a0c a
+... .001. |aepl0001
+... .035.   |a(OCoLC)12345
+... .245. 00|aHas a number
+... *** DOCUMENT BOUNDARY ***
+... FORM=MUSIC
+... .000. |ajm a0c a
+... .001. |aepl0002
+... .245. 00|aNew title
+... *** DOCUMENT BOUNDARY ***
+... FORM=MUSIC
+... .000. |ajm a0c a
+... .001. |aepl0003
+... .245. 00|aBroken title
+... *** DOCUMENT BOUNDARY ***
+... FORM=BOOK
+... .000. |aam a0c a
+... .001. |aepl0004
+... .245. 00|aAnother new title
+... """)
+>>> flat = Flat('test_upload.flat')
+rejecting epl0002, no OCLC number.
+rejecting epl0003, no OCLC number.
+rejecting epl0004, no OCLC number.
+1 OCLC updates possible from 4 records read.
+3 records were rejected because they didn't have OCLC numbers.
+>>> flat.get_no_oclc_number_tcns()
+['epl0002', 'epl0003', 'epl0004']
+
+Upload with two workers. Failures are reported on stderr.
+
+>>> uploader = BibUploader('test_upload.flat', flat.get_no_oclc_number_tcns(), OclcService(configs), OclcReport(), workers=2, branch='MAIN')
+>>> uploader.run()
+{'total': 3, 'success': 2, 'warnings': 0, 'errors': 1}
+>>> sorted(uploader.get_created().keys())
+['epl0002', 'epl0004']
+>>> with open('test_upload.flat.upload', encoding='ISO-8859-1') as f:
+...     sorted(line.split('\t')[1] for line in f)
+['error', 'success', 'success']
+>>> with open('test_upload.flat.updated', encoding='ISO-8859-1') as f:
+...     [line.rstrip() for line in f if not line.startswith('.035.')]
+['*** DOCUMENT BOUNDARY ***', 'FORM=MUSIC', '.001. |aepl0002', '*** DOCUMENT BOUNDARY ***', 'FORM=BOOK', '.001. |aepl0004']
+
+Resuming only sends the record that failed.
+
+>>> uploader = BibUploader('test_upload.flat', flat.get_no_oclc_number_tcns(), OclcService(configs), OclcReport(), workers=2)
+>>> uploader.run()
+{'total': 1, 'success': 0, 'warnings': 0, 'errors': 1}
+>>> StandIn.count
+2
+
+>>> server.shutdown()
+>>> for f in ['test_upload.flat', 'test_upload.flat.upload', 'test_upload.flat.updated', '_auth_.json']:
+...     os.remove(f)
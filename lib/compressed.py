@@ -0,0 +1,186 @@
+###############################################################################
+#
+# Purpose: Read and write text files that may be compressed with gzip,
+#   zip, or zstd.
+# Date:    Sun Oct 25 09:18:26 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import io
+import os
+import re
+import sys
+import stat
+from os.path import join, dirname, basename, exists, getsize, splitext
+
+# Compressed files are recognized by their last extension, so 'all.flat.gz'
+# is read as a flat file. A member of a zip archive is named after a colon,
+# like 'all_records.zip:all_records.flat'; without one the first file in the
+# archive is read. The compression modules are only imported when a
+# compressed file is opened, and zstd needs 'pip install zstandard'.
+COMPRESSIONS = ('.gz', '.zip', '.zst')
+# A file named '-' is read from stdin, so records can be parsed as another
+# program writes them.
+STDIN        = '-'
+ZIP_MEMBER   = re.compile(r'^(.+\.zip):([^:]+)$', re.IGNORECASE)
+
+# Splits a zip archive's path from the name of a member.
+# param: path str path like 'all.zip:all.flat'.
+# return: tuple of the path of the file on disk, and the member name or None.
+def split_member(path:str) -> tuple:
+    match = ZIP_MEMBER.match(path)
+    if match:
+        return match.group(1), match.group(2)
+    return path, None
+
+# Returns the compression of a file, '.gz', '.zip', '.zst', or '' if it isn't compressed.
+def get_compression(path:str) -> str:
+    file_path, member = split_member(path)
+    ext = splitext(file_path)[1].lower()
+    return ext if ext in COMPRESSIONS else ''
+
+# Returns the name of the file without its compression, so its type can
+# be told from its extension. A zip archive's first member is read from
+# the archive if it isn't named.
+# param: path str path to the file.
+# return: str like 'all.flat' for 'all.flat.gz'.
+def plain_name(path:str) -> str:
+    file_path, member = split_member(path)
+    compression = get_compression(path)
+    if compression == '.zip':
+        if member is None:
+            member = _first_member_(file_path) or basename(file_path)[:-4]
+        return join(dirname(file_path), basename(member))
+    if compression:
+        return file_path[:-len(compression)]
+    return file_path
+
+# Returns True if the file, or the archive it is in, exists.
+def file_exists(path:str) -> bool:
+    return path == STDIN or exists(split_member(path)[0])
+
+# Returns True if the file is stdin or a named pipe, which can only be read
+# once, from start to end, and has no size until it is written to.
+def is_stream(path:str) -> bool:
+    if path == STDIN:
+        return True
+    try:
+        return stat.S_ISFIFO(os.stat(split_member(path)[0]).st_mode)
+    except OSError:
+        return False
+
+# Returns the size, on disk, of the file or the archive it is in.
+def file_size(path:str) -> int:
+    return getsize(split_member(path)[0])
+
+# Returns the path of a file written from another, like '.completed' from an
+# instruction file. It is compressed like the file it came from, except a zip
+# member's results are written with gzip, since a zip archive can't be added
+# to a line at a time.
+# param: path str path of the file read.
+# param: suffix str like '.completed'.
+# param: compress bool False for an uncompressed file, like a state file
+#   that must survive a crash part way through.
+# return: str like 'save_as.lst.completed.gz' for 'save_as.lst.gz'.
+def output_path(path:str, suffix:str, compress:bool=True) -> str:
+    if path == STDIN:
+        return 'stdin' + suffix
+    compression = get_compression(path)
+    if not compression:
+        return path + suffix
+    if compression == '.zip':
+        compression = '.gz'
+    return plain_name(path) + suffix + (compression if compress else '')
+
+def _first_member_(file_path:str) -> str:
+    import zipfile
+    if not exists(file_path):
+        return None
+    with zipfile.ZipFile(file_path) as archive:
+        for info in archive.infolist():
+            if not info.is_dir():
+                return info.filename
+    return None
+
+# Closes the archive with the member read from it.
+class _ZipText(io.TextIOWrapper):
+
+    def __init__(self, archive, member, **kwargs):
+        super().__init__(member, **kwargs)
+        self.archive = archive
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.archive.close()
+
+def _open_zstd_(file_path:str, mode:str, encoding:str):
+    try:
+        import zstandard
+    except ModuleNotFoundError as ex:
+        raise ModuleNotFoundError(f"reading or writing '{file_path}' needs zstd support, 'pip install zstandard'.") from ex
+    if mode == 'r':
+        # Files appended to are a series of frames.
+        reader = zstandard.ZstdDecompressor().stream_reader(open(file_path, mode='rb'),
+            read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding=encoding)
+    writer = zstandard.ZstdCompressor().stream_writer(open(file_path, mode=mode + 'b'), closefd=True)
+    return io.TextIOWrapper(writer, encoding=encoding)
+
+def _open_zip_(file_path:str, member:str, mode:str, encoding:str):
+    import zipfile
+    if mode == 'a':
+        raise ValueError(f"can't append to zip archive '{file_path}', write a '.gz' file instead.")
+    if mode == 'r':
+        archive = zipfile.ZipFile(file_path, mode='r')
+        if member is None:
+            member = _first_member_(file_path)
+        if member is None:
+            archive.close()
+            raise FileNotFoundError(f"zip archive '{file_path}' is empty.")
+        return _ZipText(archive, archive.open(member, mode='r'), encoding=encoding)
+    archive = zipfile.ZipFile(file_path, mode='w', compression=zipfile.ZIP_DEFLATED)
+    if member is None:
+        member = basename(file_path)[:-4]
+    return _ZipText(archive, archive.open(member, mode='w', force_zip64=True), encoding=encoding)
+
+# Opens a text file, compressed or not, to read, write, or append a line
+# at a time. Appending to a gzip or zstd file adds a new member or frame,
+# which is read back as if the file were written at once.
+# param: path str path to the file, 'archive.zip:member', or '-' to read stdin.
+# param: mode str 'r', 'w', or 'a'.
+# param: encoding str text encoding, default 'ISO-8859-1' like the flat files.
+# return: text file object.
+def open_text(path:str, mode:str='r', encoding:str='ISO-8859-1'):
+    mode = mode.replace('t', '')
+    if path == STDIN and mode == 'r':
+        # Left open, it's the process's stdin.
+        return open(sys.stdin.fileno(), encoding=encoding, mode='r', closefd=False)
+    file_path, member = split_member(path)
+    compression = get_compression(path)
+    if compression == '.gz':
+        import gzip
+        return gzip.open(file_path, mode=mode + 't', encoding=encoding)
+    if compression == '.zst':
+        return _open_zstd_(file_path, mode, encoding)
+    if compression == '.zip':
+        return _open_zip_(file_path, member, mode, encoding)
+    return open(file_path, encoding=encoding, mode=mode)
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("compressed.tst")
+# EOF
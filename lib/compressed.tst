@@ -0,0 +1,126 @@
+Test reading and writing compressed files.
+------------------------------------------
+
+>>> from compressed import open_text, plain_name, output_path, get_compression, split_member, file_exists
+>>> import os
+>>> import gzip
+>>> import zipfile
+
+The type of a file is told from its name without the compression.
+
+>>> get_compression('all.flat.gz'), get_compression('report.csv.zst'), get_compression('all.zip:all.flat'), get_compression('save_as.lst')
+('.gz', '.zst', '.zip', '')
+>>> plain_name('all.flat.gz'), plain_name('report.csv.zst'), plain_name('save_as.lst')
+('all.flat', 'report.csv', 'save_as.lst')
+>>> split_member('dumps/all.zip:all.flat'), plain_name('dumps/all.zip:all.flat')
+(('dumps/all.zip', 'all.flat'), 'dumps/all.flat')
+
+Results are compressed like the file they came from, except a zip member's,
+which can't be appended to, so are written with gzip.
+
+>>> output_path('save_as.lst', '.completed'), output_path('save_as.lst.gz', '.completed'), output_path('save_as.lst.zst', '.completed')
+('save_as.lst.completed', 'save_as.lst.completed.gz', 'save_as.lst.completed.zst')
+>>> output_path('all.zip:all.flat', '.updated'), output_path('all.flat.gz', '.upload', compress=False)
+('all.flat.updated.gz', 'all.flat.upload')
+
+Plain files are read and written as they always were.
+
+>>> with open_text('test_plain.lst', mode='w') as f:
+...     _ = f.write('+1234\n-5678\n')
+>>> with open_text('test_plain.lst') as f:
+...     f.read()
+'+1234\n-5678\n'
+
+A gzip file is written and read a line at a time, and appending adds a
+member that is read as if the file were written at once.
+
+>>> with open_text('test_compressed.lst.gz', mode='w') as f:
+...     _ = f.write('+1234\n')
+>>> with open_text('test_compressed.lst.gz', mode='a') as f:
+...     _ = f.write('-5678\n')
+>>> with open_text('test_compressed.lst.gz') as f:
+...     list(line.rstrip() for line in f)
+['+1234', '-5678']
+>>> with gzip.open('test_compressed.lst.gz', mode='rt') as f:
+...     f.read()
+'+1234\n-5678\n'
+
+A member of a zip archive is read by name, or the first file if it isn't named.
+
+>>> with zipfile.ZipFile('test_compressed.zip', mode='w') as archive:
+...     archive.writestr('readme.txt', 'not this one\n')
+...     archive.writestr('records.flat', '*** DOCUMENT BOUNDARY ***\nFORM=BOOK\n')
+>>> file_exists('test_compressed.zip:records.flat'), plain_name('test_compressed.zip')
+(True, 'readme.txt')
+>>> with open_text('test_compressed.zip:records.flat') as f:
+...     f.read().splitlines()
+['*** DOCUMENT BOUNDARY ***', 'FORM=BOOK']
+>>> with open_text('test_compressed.zip') as f:
+...     f.read()
+'not this one\n'
+>>> open_text('test_compressed.zip', mode='a')
+Traceback (most recent call last):
+...
+ValueError: can't append to zip archive 'test_compressed.zip', write a '.gz' file instead.
+
+A zip archive can be written with one member, named after the archive.
+
+>>> with open_text('test_written.lst.zip', mode='w') as f:
+...     _ = f.write('?1234\n')
+>>> with zipfile.ZipFile('test_written.lst.zip') as archive:
+...     archive.namelist(), archive.read('test_written.lst')
+(['test_written.lst'], b'?1234\n')
+
+zstd needs the 'zstandard' package. If it is installed the files round trip.
+
+>>> try:
+...     import zstandard
+... except ModuleNotFoundError:
+...     zstandard = None
+>>> def zstd_round_trip():
+...     with open_text('test_compressed.lst.zst', mode='w') as f:
+...         _ = f.write('+1234\n')
+...     with open_text('test_compressed.lst.zst', mode='a') as f:
+...         _ = f.write('-5678\n')
+...     with open_text('test_compressed.lst.zst') as f:
+...         lines = f.read().splitlines()
+...     os.remove('test_compressed.lst.zst')
+...     return lines == ['+1234', '-5678']
+>>> zstandard is None or zstd_round_trip()
+True
+
+The list readers and the instruction manager read and write them all.
+
+>>> from listutils import Lister, InstructionManager
+>>> with gzip.open('test_report.csv.gz', mode='wt', encoding='ISO-8859-1') as f:
+...     _ = f.write('=HYPERLINK("http://www.worldcat.org/oclc/1834", "1834")\tBook, Print\n')
+>>> Lister('test_report.csv.gz').get_list('-')
+['-1834']
+>>> instructions = InstructionManager('test_instructions.lst.gz')
+>>> instructions.write_instructions(['+1234', '?5678'])
+>>> instructions.read_instruction_numbers('?')
+['5678']
+
+A file named '-' is stdin, and a named pipe is read as it is written, so
+'catalogdump' and oclc.py can run at the same time. Neither has a size.
+
+>>> from compressed import is_stream, output_path
+>>> os.mkfifo('test_pipe.flat')
+>>> is_stream('-'), is_stream('test_pipe.flat'), is_stream('test_instructions.lst.gz'), file_exists('-')
+(True, True, False, True)
+>>> output_path('-', '.updated')
+'stdin.updated'
+>>> import subprocess
+>>> import sys
+>>> script = "from listutils import Lister; print(Lister('-', stdin_type=sys.argv[1]).get_list('+'))"
+>>> subprocess.run([sys.executable, '-c', 'import sys; ' + script, 'lst'], input='1234 a title\n(OCoLC)5678\n',
+...   capture_output=True, text=True).stdout
+"['+1234', '+5678']\n"
+>>> flat = '*** DOCUMENT BOUNDARY ***\nFORM=BOOK\n.001. |aepl01\n.035.   |a(OCoLC)1834\n'
+>>> subprocess.run([sys.executable, '-c', 'import sys; ' + script, 'flat'], input=flat, capture_output=True, text=True).stdout.splitlines()[-1]
+"['+1834']"
+>>> os.remove('test_pipe.flat')
+
+>>> for name in ('test_plain.lst', 'test_compressed.lst.gz', 'test_compressed.zip', 'test_written.lst.zip',
+...   'test_report.csv.gz', 'test_instructions.lst.gz'):
+...     os.remove(name)
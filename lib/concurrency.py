@@ -0,0 +1,336 @@
+###############################################################################
+#
+# Purpose: Adapt the number of concurrent web service calls to how OCLC responds.
+# Date:    Wed Oct 21 14:02:17 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import sys
+import time
+import threading
+from os import linesep
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Responses that mean try again later.
+RETRY_CODES = (429, 503)
+
+# Additive increase, multiplicative decrease (AIMD) limit on requests in
+# flight. The limit goes up by one after a limit's worth of healthy
+# responses in a row, and is cut by 'decrease' on a 429, a 5xx, a failed
+# request, or a latency spike. A spike is a response slower than
+# 'latency_target' seconds if one is given, otherwise slower than
+# 'tolerance' times the baseline, the recent best latency.
+#
+# Responses to requests that were sent before the last cut are ignored,
+# so one burst of trouble only cuts the limit once.
+class AdaptiveLimit:
+
+    # param: initial int starting limit.
+    # param: minimum int lowest limit.
+    # param: maximum int highest limit.
+    # param: decrease float the limit is multiplied by on trouble.
+    # param: latency_target float seconds a response may take, or None to
+    #   compare to the baseline.
+    # param: tolerance float how many times the baseline latency is a spike.
+    # param: logger:Logger optional logging of the decisions. The class will
+    #   print if not supplied and debug is True.
+    def __init__(self, initial:int=1, minimum:int=1, maximum:int=4, decrease:float=0.5,
+      latency_target:float=None, tolerance:float=2.0, logger=None, debug:bool=False):
+        self.minimum   = max(1, int(minimum))
+        self.maximum   = max(self.minimum, int(maximum))
+        self.limit     = min(self.maximum, max(self.minimum, int(initial)))
+        self.decrease  = decrease
+        self.latency_target = latency_target
+        self.tolerance = tolerance
+        self.logger    = logger
+        self.debug     = debug
+        self.in_flight = 0
+        self.healthy   = 0
+        self.baseline  = None
+        self.last_cut  = 0.0
+        self.decisions = []
+        self.lock      = threading.Lock()
+
+    # Wrapper for the logger.
+    def print_or_log(self, message:str):
+        if self.logger:
+            self.logger.logit(message)
+        elif self.debug:
+            sys.stderr.write(f"{message}" + linesep)
+
+    # Takes a slot if the number of requests in flight is under the limit.
+    # return: float the time the request starts, to pass to release(),
+    #   or None if the limit has been reached.
+    def try_acquire(self):
+        with self.lock:
+            if self.in_flight >= self.limit:
+                return None
+            self.in_flight += 1
+            return time.monotonic()
+
+    # Gives back a slot and adjusts the limit to the response.
+    # param: started float the value try_acquire() returned.
+    # param: latency float seconds the request took.
+    # param: code int HTTP status code, 0 if the request failed.
+    def release(self, started:float, latency:float, code:int):
+        with self.lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            reason = ''
+            if code == 429:
+                reason = 'throttled (429)'
+            elif code == 0 or code >= 500:
+                reason = f"server error ({code})"
+            elif self._is_spike_(latency):
+                reason = f"latency {latency:.2f}s"
+            if self.baseline is None or latency < self.baseline:
+                self.baseline = latency
+            elif not reason:
+                # Let the baseline drift up slowly if OCLC gets slower for a while.
+                self.baseline += (latency - self.baseline) * 0.05
+            if reason:
+                self.healthy = 0
+                if started >= self.last_cut:
+                    self.last_cut = time.monotonic()
+                    self._set_limit_(int(self.limit * self.decrease), f"decrease, {reason}")
+                return
+            self.healthy += 1
+            if self.healthy >= self.limit and self.limit < self.maximum:
+                self.healthy = 0
+                self._set_limit_(self.limit + 1, f"increase, {latency:.2f}s latency")
+
+    # Caller holds the lock.
+    def _is_spike_(self, latency:float) -> bool:
+        if self.latency_target:
+            return latency > self.latency_target
+        return self.baseline is not None and latency > self.baseline * self.tolerance
+
+    # Caller holds the lock.
+    def _set_limit_(self, limit:int, reason:str):
+        limit = min(self.maximum, max(self.minimum, limit))
+        if limit == self.limit:
+            return
+        self.decisions.append((self.limit, limit, reason))
+        self.print_or_log(f"concurrency {self.limit} -> {limit}: {reason}")
+        self.limit = limit
+
+    # Returns the current limit on requests in flight.
+    def get_limit(self) -> int:
+        return self.limit
+
+    # Returns the list of (old limit, new limit, reason) changes.
+    def get_decisions(self) -> list:
+        return self.decisions
+
+# A wall clock deadline for a run, like the end of a maintenance window.
+# Each batch's latency is observed, and a batch is only sent if the
+# slowest recent batch, times 'safety', would still finish in time, so no
+# batch is cut off part way through. Time can also be reserved for the
+# work after the last batch, like writing the instructions left to do.
+class Deadline:
+
+    # param: seconds float seconds from now the run must be finished by.
+    # param: initial float seconds a batch is expected to take until one is observed.
+    # param: safety float how many times the slowest recent batch to allow for.
+    # param: window int recent batches to remember.
+    # param: logger:Logger optional logging of when the deadline is reached.
+    #   The class will print if not supplied and debug is True.
+    def __init__(self, seconds:float, initial:float=5.0, safety:float=1.5, window:int=20,
+      logger=None, debug:bool=False):
+        self.end      = time.monotonic() + seconds
+        self.initial  = initial
+        self.safety   = safety
+        self.latencies = deque(maxlen=window)
+        self.reserved = 0.0
+        self.reached  = False
+        self.logger   = logger
+        self.debug    = debug
+        self.lock     = threading.Lock()
+
+    # Wrapper for the logger.
+    def print_or_log(self, message:str):
+        if self.logger:
+            self.logger.logit(message)
+        elif self.debug:
+            sys.stderr.write(f"{message}" + linesep)
+
+    # Reserves time at the end for work after the last batch.
+    # param: seconds float seconds to keep.
+    def reserve(self, seconds:float):
+        with self.lock:
+            self.reserved += seconds
+
+    # Records how long a batch took.
+    def observe(self, latency:float):
+        with self.lock:
+            self.latencies.append(latency)
+
+    # Returns the seconds a batch sent now is expected to take.
+    def predicted(self) -> float:
+        with self.lock:
+            if not self.latencies:
+                return self.initial
+            return max(self.latencies) * self.safety
+
+    # Returns the seconds left to send batches in, less the time reserved.
+    def remaining(self) -> float:
+        return self.end - time.monotonic() - self.reserved
+
+    # Returns True if a batch sent now should finish before the deadline.
+    # Once it returns False the deadline is reached, and it stays reached.
+    def allows(self) -> bool:
+        if self.reached:
+            return False
+        remaining = self.remaining()
+        predicted = self.predicted()
+        if remaining > predicted:
+            return True
+        self.reached = True
+        self.print_or_log(f"deadline reached, {max(0.0, remaining):.1f}s left and a batch takes up to {predicted:.1f}s, no more batches are sent.")
+        return False
+
+    # Returns True if batches were held back because of the deadline.
+    def is_reached(self) -> bool:
+        return self.reached
+
+# Returns the seconds from now until a time of day, like '06:30', today
+# if it is still to come or tomorrow if it has passed.
+# param: clock str 'HH:MM' or 'HH:MM:SS', 24 hour.
+# param: now optional datetime, default now.
+# return: float seconds.
+def seconds_until(clock:str, now=None) -> float:
+    from datetime import datetime, timedelta
+    if now is None:
+        now = datetime.now()
+    try:
+        parts = list(int(part) for part in clock.split(':'))
+    except ValueError:
+        parts = []
+    if len(parts) not in (2, 3):
+        raise ValueError(f"expected a time like '06:30', got '{clock}'.")
+    end = now.replace(hour=parts[0], minute=parts[1], second=parts[2] if len(parts) == 3 else 0, microsecond=0)
+    if end <= now:
+        end += timedelta(days=1)
+    return (end - now).total_seconds()
+
+# Runs a call and times it, in a 'batch' span if there is a tracer.
+def _timed_call_(call, batch:list, tracer=None, retry:int=0):
+    start = time.monotonic()
+    try:
+        if tracer:
+            with tracer.span('batch', batch_size=len(batch), retry=retry):
+                return call(batch), None, time.monotonic() - start
+        return call(batch), None, time.monotonic() - start
+    except Exception as ex:
+        return None, ex, time.monotonic() - start
+
+# Sends a list of numbers in batches, with as many batches in flight as
+# the limit allows. Results are handled in the calling thread in the order
+# they arrive.
+# param: call function that takes a list of numbers and returns
+#   (param_str, status code, content), like OclcService.set_institution_holdings.
+# param: numbers list of numbers. Batches are taken off the front, and a
+#   batch that fails is put back, so when this returns the list holds
+#   whatever is still to do.
+# param: batch_size int numbers per call.
+# param: limit AdaptiveLimit that decides how many calls are in flight.
+# param: handle function that takes (batch, param_str, status code, content)
+#   and returns False to stop sending. The batch is then put back.
+# param: retries int times in a row a throttled batch is put back and sent
+#   again, with a doubling pause, before the response is handled as is.
+# param: backoff float seconds of the first pause.
+# param: stop optional threading.Event. Once it is set no more batches are
+#   sent, but the calls in flight are finished and handled.
+# param: pool optional ThreadPoolExecutor shared with other jobs. By default
+#   a pool of limit.maximum threads is used for the one call.
+# param: metrics optional Metrics that counts the retries.
+# param: deadline optional Deadline. A batch is only sent if it should finish
+#   before the deadline, and the calls in flight are finished and handled.
+# param: tracer optional Tracer that records a span for each call, with
+#   its batch size and how many times in a row it was throttled.
+# param: hits optional int most calls to make, retries included, like the
+#   hits a HitScheduler planned. Batches that don't fit are left in the list.
+# raises: the first exception a call raised, once the calls in flight finish.
+#   Its batch is put back, as are the batches in flight on a KeyboardInterrupt.
+def send_batches(call, numbers:list, batch_size:int, limit:AdaptiveLimit, handle,
+  retries:int=5, backoff:float=1.0, stop:threading.Event=None, pool:ThreadPoolExecutor=None,
+  metrics=None, deadline:Deadline=None, tracer=None, hits:int=None):
+    in_flight = {}
+    sent = 0
+    stopped = False
+    error = None
+    throttled = 0
+    # A pool shared with other jobs is left running.
+    own_pool = pool is None
+    if own_pool:
+        pool = ThreadPoolExecutor(max_workers=limit.maximum)
+    try:
+        while True:
+            while not stopped and numbers and not (stop and stop.is_set()) and not (deadline and not deadline.allows()) and (hits is None or sent < hits):
+                started = limit.try_acquire()
+                if started is None:
+                    break
+                batch = numbers[:batch_size]
+                del numbers[:batch_size]
+                # The web service takes numbers off the list it is given, keep the batch.
+                in_flight[pool.submit(_timed_call_, call, list(batch), tracer, throttled)] = (batch, started)
+                sent += 1
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch, started = in_flight.pop(future)
+                result, ex, latency = future.result()
+                if deadline:
+                    deadline.observe(latency)
+                if ex is not None:
+                    limit.release(started, latency, 0)
+                    numbers[:0] = batch
+                    stopped = True
+                    if error is None:
+                        error = ex
+                    continue
+                param_str, code, content = result
+                limit.release(started, latency, code)
+                # The limit has been cut, try the batch again after a pause.
+                if code in RETRY_CODES and throttled < retries:
+                    throttled += 1
+                    numbers[:0] = batch
+                    if metrics:
+                        metrics.count('oclc_retries_total', code=code)
+                    time.sleep(backoff * 2 ** (throttled - 1))
+                    continue
+                throttled = 0
+                # Calls already sent are handled even after a stop.
+                if not handle(batch, param_str, code, content):
+                    numbers[:0] = batch
+                    stopped = True
+    except KeyboardInterrupt:
+        # Whether or not the calls in flight get through, they are
+        # still to do as far as the caller knows. Sets and unsets can
+        # safely be sent twice.
+        for (batch, started) in in_flight.values():
+            numbers[:0] = batch
+        raise
+    finally:
+        if own_pool:
+            pool.shutdown(wait=True)
+    if error is not None:
+        raise error
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("concurrency.tst")
+# EOF
@@ -0,0 +1,181 @@
+Test the adaptive concurrency limit.
+------------------------------------
+
+>>> from concurrency import AdaptiveLimit, send_batches
+
+The limit goes up by one after a limit's worth of healthy responses.
+
+>>> limit = AdaptiveLimit(initial=1, maximum=4)
+>>> def respond(code, latency=0.1):
+...     limit.release(limit.try_acquire(), latency, code)
+>>> for _ in range(3):
+...     respond(200)
+>>> limit.get_limit()
+3
+
+Only so many requests can be in flight.
+
+>>> [limit.try_acquire() is not None for _ in range(4)]
+[True, True, True, False]
+>>> for _ in range(3):
+...     limit.release(0.0, 0.1, 200)
+
+Throttling halves it.
+
+>>> limit.get_limit()
+4
+>>> respond(429)
+>>> limit.get_limit()
+2
+
+Responses to requests sent before the cut don't cut it again.
+
+>>> limit.release(0.0, 0.1, 503)
+>>> limit.get_limit()
+2
+
+A response much slower than the best seen is a latency spike.
+
+>>> respond(200, latency=1.0)
+>>> limit.get_limit()
+1
+>>> for (old, new, reason) in limit.get_decisions():
+...     print(old, new, reason)
+1 2 increase, 0.10s latency
+2 3 increase, 0.10s latency
+3 4 increase, 0.10s latency
+4 2 decrease, throttled (429)
+2 1 decrease, latency 1.00s
+
+The limit never goes below the minimum.
+
+>>> respond(500)
+>>> limit.get_limit()
+1
+
+Send numbers in batches. The call takes numbers off the list it is given,
+like the web service does.
+
+>>> def call(numbers):
+...     batch = numbers[:2]
+...     del numbers[:2]
+...     return ','.join(batch), 200, {}
+>>> sent = []
+>>> def handle(batch, param_str, code, content):
+...     sent.extend(param_str.split(','))
+...     return True
+>>> numbers = list(str(n) for n in range(1, 10))
+>>> send_batches(call, numbers, 2, AdaptiveLimit(initial=2, maximum=4), handle)
+>>> sorted(sent, key=int), numbers
+(['1', '2', '3', '4', '5', '6', '7', '8', '9'], [])
+
+A handler that returns False stops the sending, and the batch goes back.
+
+>>> def stop_at_5(batch, param_str, code, content):
+...     return '5' not in batch
+>>> numbers = list(str(n) for n in range(1, 10))
+>>> send_batches(call, numbers, 2, AdaptiveLimit(initial=1, maximum=1), stop_at_5)
+>>> numbers
+['5', '6', '7', '8', '9']
+
+An exception stops the sending too, and is raised once the calls in flight are done.
+
+>>> def broken(numbers):
+...     if '3' in numbers:
+...         raise OSError('connection reset')
+...     return call(numbers)
+>>> numbers = list(str(n) for n in range(1, 10))
+>>> try:
+...     send_batches(broken, numbers, 2, AdaptiveLimit(initial=1, maximum=1), handle)
+... except OSError as ex:
+...     print(ex)
+connection reset
+>>> numbers
+['3', '4', '5', '6', '7', '8', '9']
+
+Throttled batches are sent again, up to 'retries' times in a row, and
+then handled like any other response.
+
+>>> codes = [429, 429, 200, 429, 429, 429]
+>>> def busy(numbers):
+...     param_str, code, content = call(numbers)
+...     return param_str, codes.pop(0) if codes else 200, content
+>>> seen = []
+>>> def record(batch, param_str, code, content):
+...     seen.append((param_str, code))
+...     return code == 200
+>>> numbers = list(str(n) for n in range(1, 7))
+>>> send_batches(busy, numbers, 2, AdaptiveLimit(initial=1, maximum=1), record, retries=2, backoff=0)
+>>> seen, numbers
+([('1,2', 200), ('3,4', 429)], ['3', '4', '5', '6'])
+
+Retries are hits too, so with a budget of hits a throttled batch is only
+sent again while there are hits left, and what isn't sent stays to do.
+
+>>> codes = [429, 200]
+>>> seen = []
+>>> numbers = list(str(n) for n in range(1, 7))
+>>> send_batches(busy, numbers, 2, AdaptiveLimit(initial=1, maximum=1), record, backoff=0, hits=3)
+>>> seen, numbers
+([('1,2', 200), ('3,4', 200)], ['5', '6'])
+
+A stop event ends the sending without losing anything.
+
+>>> import threading
+>>> stop = threading.Event()
+>>> def stop_after_first(batch, param_str, code, content):
+...     stop.set()
+...     return True
+>>> numbers = list(str(n) for n in range(1, 7))
+>>> send_batches(call, numbers, 2, AdaptiveLimit(initial=1, maximum=1), stop_after_first, stop=stop)
+>>> numbers
+['3', '4', '5', '6']
+
+Retries are counted if there are metrics.
+
+>>> from metrics import Metrics
+>>> metrics = Metrics()
+>>> codes = [503, 200]
+>>> numbers = list(str(n) for n in range(1, 3))
+>>> send_batches(busy, numbers, 2, AdaptiveLimit(initial=1, maximum=1), record, backoff=0, metrics=metrics)
+>>> metrics.get_counter('oclc_retries_total', code=503), numbers
+(1, [])
+
+A deadline only lets a batch be sent if it should finish in time. Until a
+batch is observed one is expected to take 'initial' seconds, then the
+slowest recent batch times 'safety'.
+
+>>> from concurrency import Deadline, seconds_until
+>>> deadline = Deadline(60, initial=5)
+>>> deadline.predicted(), deadline.allows()
+(5, True)
+>>> deadline.observe(2.0)
+>>> deadline.observe(10.0)
+>>> deadline.predicted()
+15.0
+>>> deadline.reserve(50)
+>>> deadline.allows(), deadline.is_reached()
+(False, True)
+
+Once it is reached no more batches are sent, and the rest are left to do.
+
+>>> import time
+>>> slow = Deadline(0.5, initial=0.1)
+>>> def take_time(numbers):
+...     time.sleep(0.2)
+...     return call(numbers)
+>>> numbers = list(str(n) for n in range(1, 21))
+>>> send_batches(take_time, numbers, 2, AdaptiveLimit(initial=1, maximum=1), handle, deadline=slow)
+>>> slow.is_reached(), 0 < len(numbers) < 20, len(numbers) % 2
+(True, True, 0)
+
+A time of day is today if it is still to come, otherwise tomorrow.
+
+>>> from datetime import datetime
+>>> now = datetime(2026, 10, 19, 22, 0, 0)
+>>> seconds_until('23:30', now=now), seconds_until('06:00', now=now), seconds_until('22:00:30', now=now)
+(5400.0, 28800.0, 30.0)
+>>> seconds_until('6am')
+Traceback (most recent call last):
+...
+ValueError: expected a time like '06:30', got '6am'.
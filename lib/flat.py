@@ -19,10 +19,38 @@
 ###############################################################################
 import sys
 import re
-from os.path import exists
 from os import linesep
+try:
+    from lib.compressed import open_text, file_exists, output_path
+except ModuleNotFoundError:
+    from compressed import open_text, file_exists, output_path
 
 IS_TEST = False
+DOCUMENT_BOUNDARY = '*** DOCUMENT BOUNDARY ***'
+
+# Reads a flat file, or any iterable of flat lines, one bib record at a time.
+# Unlike the Flat class the whole record is returned, not just the slim
+# fields, so it can be converted to MARC XML or MARC 21.
+# param: flat:str path to the flat file, which may be compressed, or an
+#   iterable of lines.
+# return: generator of records, each a list of flat strings starting with
+#   the document boundary.
+def read_flat_records(flat):
+    if isinstance(flat, str):
+        with open_text(flat, mode='r') as f:
+            yield from read_flat_records(f)
+        return
+    record = []
+    for l in flat:
+        line = l.rstrip('\r\n')
+        if line.startswith(DOCUMENT_BOUNDARY):
+            if record:
+                yield record
+            record = [DOCUMENT_BOUNDARY]
+        elif line:
+            record.append(line)
+    if record:
+        yield record
 
 # This class will take a flat file and stream or collect all the DOCUMENT, FORM
 # sentenials, the 001, and all 035 tags. When an OCLC tag is encountered it will
@@ -49,9 +77,11 @@ class Flat:
         self.debug= debug
         self.reject_tags = ignore
         self.reject_recs = []
+        # TCNs of well-formed records that don't have an OCLC number.
+        self.no_oclc_recs = []
         if IS_TEST:
             print(f"DEBUG: reading {self.flat}")
-        if not exists(self.flat):
+        if not file_exists(self.flat):
             sys.stderr.write(f"*error, no such flat file: '{self.flat}'." + linesep)
         # Read FLAT file record by record.
         # Store the slim bib record as follows 
@@ -140,7 +170,7 @@ class Flat:
         oclc_num_matcher  = re.compile(r'\(OCoLC\)')
         record  = {}
         records = {}
-        with open(flat, encoding='ISO-8859-1', mode='r') as f:
+        with open_text(flat, mode='r') as f:
             line_num = 0
             # If there is no OCLC number in the record don't store the bib and issue a warning
             # If there is more than one, replace the previous one. In the end which ever remains
@@ -168,6 +198,7 @@ class Flat:
                             records[str(oclc_number)] = record
                         else:
                             self.print_or_log(f"rejecting {record['001']}, no OCLC number.")
+                            self.no_oclc_recs.append(record['001'])
                             missing_oclc_num += 1
                     record, oclc_number, oclc_num_count = self.reset_record()
                     continue
@@ -223,7 +254,12 @@ class Flat:
             return records
         if oclc_num_count > 1:
             self.print_or_log(f"*warning, TCN {record['001']} contains multiple OCLC numbers. Only the last will be checked and updated as necessary.")
-        records[str(oclc_number)] = record
+        if oclc_number:
+            records[str(oclc_number)] = record
+        else:
+            self.print_or_log(f"rejecting {record['001']}, no OCLC number.")
+            self.no_oclc_recs.append(record['001'])
+            missing_oclc_num += 1
         self.print_or_log(f"{len(records)} OCLC updates possible from {records_read} records read.")
         if missing_oclc_num > 0:
             self.print_or_log(f"{missing_oclc_num} records were rejected because they didn't have OCLC numbers.")
@@ -237,6 +273,11 @@ class Flat:
     def get_rejected_tcns(self) ->list:
         return self.reject_recs
 
+    # Returns a list of TCNs of records that don't have OCLC numbers.
+    # These are candidates for upload as institution-level bib records.
+    def get_no_oclc_number_tcns(self) ->list:
+        return self.no_oclc_recs
+
     # Pass the dictionary of new and old OCLC numbers. This method
     # will update the slim flat records and output to a file called
     # <input>.slim.flat.
@@ -257,11 +298,11 @@ class Flat:
             self.print_or_log(f"No OCLC updates detected.")
             return False
         # Make up a new file name for the updated slim file.
-        slim_file = f"{self.flat}.updated"
+        slim_file = output_path(self.flat, '.updated')
         total_flat_records_submitted = len(self.slim_bib_records)
         # This is the number of records read from the flat file.
         update_count = 0
-        with open(slim_file, encoding='ISO-8859-1', mode='a') as s:
+        with open_text(slim_file, mode='a') as s:
             for (old_num, new_num) in oclc_updates.items():
                 # Don't update is there was any hint that a problem happened.
                 if not old_num or not new_num:
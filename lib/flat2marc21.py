@@ -0,0 +1,165 @@
+###############################################################################
+#
+# Purpose: Convert Symphony flat records into MARC 21 (ISO 2709) records.
+# Date:    Mon Oct 19 09:12:40 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import re
+try:
+    from lib.flat2marcxml import MarcXML
+    from lib.flat import read_flat_records
+except ModuleNotFoundError:
+    from flat2marcxml import MarcXML
+    from flat import read_flat_records
+
+SUBFIELD_DELIMITER = b'\x1f'
+FIELD_TERMINATOR   = b'\x1e'
+RECORD_TERMINATOR  = b'\x1d'
+# Largest record the 5-digit record length in the leader can describe.
+MAX_RECORD_LENGTH  = 99999
+# Largest field the 4-digit field length in a directory entry can describe.
+MAX_FIELD_LENGTH   = 9999
+
+###
+# This class formats flat data into MARC 21 transmission format (ISO 2709),
+# which is roughly a third the size of the same record in MARC XML. It uses
+# the same tag, indicator, and subfield parsing as MarcXML, and the records
+# are ordered by tag the same way.
+# Ref:
+#   https://www.loc.gov/marc/specifications/specrecstruc.html
+#
+# Symphony stores an abbreviated leader in the '.000.' tag, like 'jm a0c a'.
+# The first four characters are leader positions 06-09, and the last three
+# are positions 17-19. A full 24 character leader is used as is. In either
+# case the record length, base address, and character coding (UTF-8) are
+# computed when the record is converted.
+class Marc21(MarcXML):
+    def __init__(self, flat:list, branch:str='', encoding:str='utf-8'):
+        new_doc = re.compile(r'\*\*\* DOCUMENT BOUNDARY \*\*\*')
+        self.branch   = branch
+        self.encoding = encoding
+        self.records  = []
+        record = []
+        for line in flat:
+            if new_doc.match(line):
+                if record:
+                    self.records.append(self._convert_(record))
+                record = []
+            else:
+                record.append(line)
+        if record:
+            self.records.append(self._convert_(record))
+
+    # Builds a 24 byte leader from the flat '.000.' data.
+    # param: value:str leader data from the flat record, may be empty.
+    # param: record_length:int total length of the record in bytes.
+    # param: base_address:int offset of the first field's data.
+    # return: leader as bytes.
+    def _leader_(self, value:str, record_length:int, base_address:int) -> bytes:
+        if len(value) >= 24:
+            leader = value[5:9] + 'a' + value[10:12] + f"{base_address:05d}" + value[17:24]
+        else:
+            value = value.ljust(8)
+            leader = 'n' + value[0:3] + 'a' + '22' + f"{base_address:05d}" + value[5:8] + '4500'
+        return f"{record_length:05d}{leader}".encode('ascii', 'replace')
+
+    # Encodes a single flat entry as the data portion of a variable field.
+    # param: entry:str flat entry like '.245. 04|aThe Fresh Beat Band'.
+    # param: tag:str the tag of the entry.
+    # return: bytes of the field including the field terminator.
+    def _field_(self, entry:str, tag:str) -> bytes:
+        if int(tag) <= 8:
+            return self._get_control_field_data_(entry, False).encode(self.encoding) + FIELD_TERMINATOR
+        (ind1, ind2) = self._get_indicators_(entry)
+        field = [f"{ind1}{ind2}".encode(self.encoding)]
+        for subfield in self._get_control_field_data_(entry).split('|'):
+            # The sub field name is the first character
+            if subfield[:1] != '':
+                field.append(SUBFIELD_DELIMITER + subfield.encode(self.encoding))
+        field.append(FIELD_TERMINATOR)
+        return b''.join(field)
+
+    # Converts MARC tag entries into a MARC 21 record. The directory and
+    # lengths are computed as the fields are encoded.
+    # param: entries list of FLAT data strings.
+    # return: bytes of the ISO 2709 record.
+    def _convert_(self, entries:list) -> bytes:
+        leader_value = ''
+        fields = []
+        if self.branch:
+            fields.append(('049', f".049.   |a{self.branch}"))
+        for entry in entries:
+            # Sirsi Dynix flat files contain a 'FORM=blah-blah' which is not valid MARC.
+            if re.match(r'^FORM*', entry):
+                continue
+            tag = self._get_tag_(entry)
+            if not tag:
+                continue
+            if tag == '000':
+                leader_value = self._get_control_field_data_(entry, False)
+                continue
+            fields.append((tag, entry))
+        # Same tag order as MarcXML, repeated tags keep their original order.
+        fields.sort(key=lambda field: field[0])
+        directory = []
+        data = []
+        offset = 0
+        for (tag, entry) in fields:
+            field = self._field_(entry, tag)
+            if len(field) > MAX_FIELD_LENGTH:
+                raise ValueError(f"field {tag} is {len(field)} bytes, MARC 21 allows {MAX_FIELD_LENGTH}.")
+            directory.append(f"{tag}{len(field):04d}{offset:05d}".encode('ascii'))
+            data.append(field)
+            offset += len(field)
+        base_address  = 24 + (12 * len(directory)) + 1
+        record_length = base_address + offset + 1
+        if record_length > MAX_RECORD_LENGTH:
+            raise ValueError(f"record is {record_length} bytes, MARC 21 allows {MAX_RECORD_LENGTH}.")
+        leader = self._leader_(leader_value, record_length, base_address)
+        return leader + b''.join(directory) + FIELD_TERMINATOR + b''.join(data) + RECORD_TERMINATOR
+
+    def __str__(self) -> str:
+        return self.as_bytes().decode(self.encoding)
+
+    # Returns the MARC 21 records as a byte-string.
+    def as_bytes(self):
+        return b''.join(self.records)
+
+    # Appends the records to a MARC 21 file.
+    # param: marc_file:str path to the output file.
+    def write(self, marc_file:str):
+        with open(marc_file, mode='ab') as m:
+            for record in self.records:
+                m.write(record)
+
+# Streams a flat file to a MARC 21 file one record at a time, so the whole
+# flat file is never held in memory.
+# param: flat_file:str path to the flat file.
+# param: marc_file:str path of the MARC 21 output file, overwritten if it exists.
+# param: branch:str optional branch added as a '049' to every record.
+# return: count of records written.
+def flat_to_marc21(flat_file:str, marc_file:str, branch:str='') -> int:
+    count = 0
+    with open(marc_file, mode='wb') as m:
+        for flat_record in read_flat_records(flat_file):
+            m.write(Marc21(flat_record, branch=branch).as_bytes())
+            count += 1
+    return count
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("flat2marc21.tst")
+# EOF
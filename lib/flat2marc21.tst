@@ -0,0 +1,92 @@
+Test flat to MARC 21 (ISO 2709) conversions.
+--------------------------------------------
+
+Basic imports
+
+>>> from flat2marc21 import Marc21, flat_to_marc21
+>>> import os
+
+
+Test the leader is built from Symphony's abbreviated leader
+-----------------------------------------------------------
+
+>>> marc = Marc21([])
+>>> marc._leader_('jm a0c a', 192, 73)
+b'00192njm a2200073c a4500'
+
+A full leader keeps its values, but the lengths and coding are recomputed.
+
+>>> marc._leader_('01234cam  2200301 a 4500', 192, 73)
+b'00192cam a2200073 a 4500'
+
+
+Test fields
+-----------
+
+>>> marc._field_('.001. |aocn769144454', '001')
+b'ocn769144454\x1e'
+>>> marc._field_('.040.   |aTEFMT|cTEFMT|dTEF', '040')
+b'  \x1faTEFMT\x1fcTEFMT\x1fdTEF\x1e'
+>>> marc._field_('.245. 04|aThe Fresh Beat Band|h[sound recording]', '245')
+b'04\x1faThe Fresh Beat Band\x1fh[sound recording]\x1e'
+
+
+Test record production from slim FLAT data.
+-------------------------------------------
+
+>>> marc = Marc21([
+... "*** DOCUMENT BOUNDARY ***",
+... "FORM=MUSIC",
+... ".000. |ajm a0c a",
+... ".001. |aocn769144454",
+... ".008. |a111222s2012    nyu||n|j|         | eng d",
+... ".245. 04|aThe Fresh Beat Band|h[sound recording]",
+... ".035.   |a(OCoLC)769144454"])
+>>> marc.as_bytes()
+b'00192njm a2200073c a4500001001300000008004100013035002100054245004300075\x1eocn769144454\x1e111222s2012    nyu||n|j|         | eng d\x1e  \x1fa(OCoLC)769144454\x1e04\x1faThe Fresh Beat Band\x1fh[sound recording]\x1e\x1d'
+
+The record length in the leader matches the actual record length.
+
+>>> rec = marc.as_bytes()
+>>> int(rec[0:5]) == len(rec)
+True
+>>> rec[int(rec[12:17]) - 1:int(rec[12:17])]
+b'\x1e'
+
+A field too long for its directory entry's 4-digit length is an error,
+not a corrupt record.
+
+>>> Marc21([".001. |aocn769144454", ".520.   |a" + 'x' * 9995])
+Traceback (most recent call last):
+...
+ValueError: field 520 is 10000 bytes, MARC 21 allows 9999.
+>>> len(Marc21([".520.   |a" + 'x' * 9994]).records)
+1
+
+Test the branch is added as a 049.
+
+>>> marc = Marc21(["*** DOCUMENT BOUNDARY ***", ".000. |ajm a0c a", ".001. |aocn769144454"], branch='MAIN')
+>>> marc.as_bytes()
+b'00072njm a2200049c a4500001001300000049000900013\x1eocn769144454\x1e  \x1faMAIN\x1e\x1d'
+
+Test multiple records.
+
+>>> marc = Marc21(["*** DOCUMENT BOUNDARY ***", ".001. |aa1", "*** DOCUMENT BOUNDARY ***", ".001. |aa2"])
+>>> len(marc.records)
+2
+>>> marc.as_bytes()
+b'00041n   a2200037   4500001000300000\x1ea1\x1e\x1d00041n   a2200037   4500001000300000\x1ea2\x1e\x1d'
+
+
+Test streaming a flat file to MARC 21
+-------------------------------------
+
+>>> with open('test_marc21.flat', encoding='ISO-8859-1', mode='w') as f:
+...     _ = f.write("*** DOCUMENT BOUNDARY ***\nFORM=MUSIC\n.000. |ajm a0c a\n.001. |aocn1\n*** DOCUMENT BOUNDARY ***\nFORM=MUSIC\n.000. |ajm a0c a\n.001. |aocn2\n")
+>>> flat_to_marc21('test_marc21.flat', 'test_marc21.mrc')
+2
+>>> with open('test_marc21.mrc', mode='rb') as f:
+...     f.read()
+b'00043njm a2200037c a4500001000500000\x1eocn1\x1e\x1d00043njm a2200037c a4500001000500000\x1eocn2\x1e\x1d'
+>>> os.remove('test_marc21.flat')
+>>> os.remove('test_marc21.mrc')
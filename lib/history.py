@@ -0,0 +1,180 @@
+###############################################################################
+#
+# Purpose: Keep a history of every holdings operation across runs.
+# Date:    Mon Oct 19 14:21:05 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import sqlite3
+import threading
+from datetime import datetime
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Opens a SQLite database shared by the stores that keep state between
+# runs. WAL mode lets readers query while a run is writing.
+# param: db_path str path to the database file.
+# return: sqlite3 connection.
+def open_database(db_path:str):
+    db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+# Converts an OCLC number string to an integer for compact storage.
+# return: int or None if the value isn't a number.
+def _as_int_(number:str):
+    try:
+        return int(number)
+    except (TypeError, ValueError):
+        return None
+
+# Records every set, unset, and check outcome of every run in SQLite.
+# Outcomes are buffered and written in batched transactions, and per-run
+# totals are kept as they are written so run summaries don't have to scan
+# the outcomes table.
+#
+# The store can be used as an OclcReport sink, for example
+#   history = HistoryStore('oclc.db')
+#   run_id = history.start_run('master.lst', 'OCPSB')
+#   report = OclcReport(sink=history)
+#   ...
+#   history.finish_run()
+class HistoryStore:
+    def __init__(self, db_path:str, batch_size:int=5000, debug:bool=False):
+        self.db_path    = db_path
+        self.batch_size = batch_size
+        self.debug      = debug
+        self.run_id     = None
+        self.pending    = []
+        self.totals     = {}
+        self.lock       = threading.Lock()
+        self.db         = open_database(db_path)
+        with self.db:
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id INTEGER PRIMARY KEY,
+                    started TEXT NOT NULL,
+                    finished TEXT,
+                    instructions TEXT,
+                    institution TEXT);
+                CREATE TABLE IF NOT EXISTS outcomes (
+                    run_id INTEGER NOT NULL,
+                    number INTEGER,
+                    action TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    new_number INTEGER,
+                    detail TEXT,
+                    timestamp TEXT);
+                CREATE INDEX IF NOT EXISTS outcomes_number ON outcomes (number, timestamp);
+                CREATE TABLE IF NOT EXISTS run_totals (
+                    run_id INTEGER NOT NULL,
+                    action TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (run_id, action, status));
+            """)
+
+    # Records the start of a run.
+    # param: instructions str the instruction file being run.
+    # param: institution str institutional symbol.
+    # return: int id of the run.
+    def start_run(self, instructions:str='', institution:str='') -> int:
+        with self.lock, self.db:
+            cursor = self.db.execute("INSERT INTO runs (started, instructions, institution) VALUES (?, ?, ?)",
+                (datetime.now().strftime(DATE_FORMAT), instructions, institution))
+            self.run_id = cursor.lastrowid
+        return self.run_id
+
+    # Buffers outcomes, writing them when the batch is full.
+    # param: outcomes list of Outcome objects.
+    def write(self, outcomes:list):
+        if self.run_id is None:
+            self.start_run()
+        with self.lock:
+            for outcome in outcomes:
+                self.pending.append((self.run_id, _as_int_(outcome.number), outcome.action,
+                    outcome.status, _as_int_(outcome.new_number), outcome.detail, outcome.timestamp))
+                key = (outcome.action, outcome.status)
+                self.totals[key] = self.totals.get(key, 0) + 1
+            if len(self.pending) >= self.batch_size:
+                self._flush_()
+
+    # Writes buffered outcomes and totals in one transaction. Caller holds the lock.
+    def _flush_(self):
+        if not self.pending and not self.totals:
+            return
+        with self.db:
+            self.db.executemany("INSERT INTO outcomes VALUES (?, ?, ?, ?, ?, ?, ?)", self.pending)
+            self.db.executemany("""INSERT INTO run_totals VALUES (?, ?, ?, ?)
+                ON CONFLICT (run_id, action, status) DO UPDATE SET count = count + excluded.count""",
+                list((self.run_id, action, status, count) for ((action, status), count) in self.totals.items()))
+        if self.debug:
+            print(f"DEBUG: wrote {len(self.pending)} outcomes to {self.db_path}")
+        self.pending = []
+        self.totals  = {}
+
+    def flush(self):
+        with self.lock:
+            self._flush_()
+
+    # Writes any buffered outcomes and records the end of the run.
+    def finish_run(self):
+        with self.lock:
+            self._flush_()
+            if self.run_id is not None:
+                with self.db:
+                    self.db.execute("UPDATE runs SET finished = ? WHERE run_id = ?",
+                        (datetime.now().strftime(DATE_FORMAT), self.run_id))
+
+    def close(self):
+        self.finish_run()
+        self.db.close()
+
+    # Returns everything that happened to an OCLC number, oldest first.
+    # param: number str or int OCLC number.
+    # return: list of dictionaries with run_id, action, status, new_number, detail, and timestamp.
+    def number_history(self, number) -> list:
+        cursor = self.db.execute("""SELECT run_id, action, status, new_number, detail, timestamp
+            FROM outcomes WHERE number = ? ORDER BY timestamp, rowid""", (_as_int_(number),))
+        columns = [c[0] for c in cursor.description]
+        return list(dict(zip(columns, row)) for row in cursor.fetchall())
+
+    # Returns the runs, most recent first.
+    # param: limit int maximum number of runs.
+    # return: list of dictionaries of run_id, started, finished, instructions, and institution.
+    def get_runs(self, limit:int=10) -> list:
+        cursor = self.db.execute("""SELECT run_id, started, finished, instructions, institution
+            FROM runs ORDER BY run_id DESC LIMIT ?""", (limit,))
+        columns = [c[0] for c in cursor.description]
+        return list(dict(zip(columns, row)) for row in cursor.fetchall())
+
+    # Returns the totals of a run.
+    # param: run_id int id of the run, default the last run.
+    # return: dictionary of {action: {status: count, ...}, ...}
+    def run_summary(self, run_id:int=None) -> dict:
+        if run_id is None:
+            row = self.db.execute("SELECT MAX(run_id) FROM runs").fetchone()
+            run_id = row[0]
+        summary = {}
+        for (action, status, count) in self.db.execute("""SELECT action, status, count
+            FROM run_totals WHERE run_id = ? ORDER BY action, status""", (run_id,)):
+            summary.setdefault(action, {})[status] = count
+        return summary
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("history.tst")
+# EOF
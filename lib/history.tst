@@ -0,0 +1,52 @@
+Test the history of holdings operations.
+----------------------------------------
+
+>>> from history import HistoryStore
+>>> from oclcreport import OclcReport, Outcome
+>>> import os
+>>> for f in ['test_history.db', 'test_history.db-wal', 'test_history.db-shm']:
+...     if os.path.exists(f):
+...         os.remove(f)
+
+>>> history = HistoryStore('test_history.db', batch_size=2)
+>>> history.start_run('master.lst', 'OCPSB')
+1
+>>> history.write([Outcome('12345', '+', 'success', '12345', timestamp='2023-03-21 23:17:51'),
+...   Outcome('67890', '+', 'updated', '6777790', 'Record found.', '2023-03-21 23:17:52')])
+>>> history.write([Outcome('999', '-', 'success', '999', timestamp='2023-03-21 23:17:53')])
+>>> history.finish_run()
+
+The report can write directly to the history as a sink, with other sinks.
+
+>>> history.start_run('master.lst.completed', 'OCPSB')
+2
+>>> check = {'title': '12345', 'updated': '2023-04-20T22:38:06.540Z',
+...   'content': {'requestedOclcNumber': '12345', 'currentOclcNumber': '12345',
+...     'institution': 'OCPSB', 'holdingCurrentlySet': True, 'id': 'http://worldcat.org/oclc/12345'}}
+>>> report = OclcReport(sink=[history, None])
+>>> report.check_holdings_response(200, check)[0]
+True
+>>> history.close()
+
+Query the history of a number across runs.
+
+>>> history = HistoryStore('test_history.db')
+>>> for row in history.number_history('12345'):
+...     print(row)
+{'run_id': 1, 'action': '+', 'status': 'success', 'new_number': 12345, 'detail': '', 'timestamp': '2023-03-21 23:17:51'}
+{'run_id': 2, 'action': '?', 'status': 'set', 'new_number': 12345, 'detail': 'OCPSB', 'timestamp': '2023-04-20 22:38:06'}
+>>> history.number_history('67890')[0]['new_number']
+6777790
+
+Summaries come from the per-run totals.
+
+>>> history.run_summary(1)
+{'+': {'success': 1, 'updated': 1}, '-': {'success': 1}}
+>>> history.run_summary()
+{'?': {'set': 1}}
+>>> [(r['run_id'], r['instructions']) for r in history.get_runs()]
+[(2, 'master.lst.completed'), (1, 'master.lst')]
+>>> history.close()
+>>> for f in ['test_history.db', 'test_history.db-wal', 'test_history.db-shm']:
+...     if os.path.exists(f):
+...         os.remove(f)
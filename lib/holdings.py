@@ -0,0 +1,141 @@
+###############################################################################
+#
+# Purpose: Keep a local mirror of the institution's holdings at OCLC.
+# Date:    Tue Oct 20 09:37:12 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import threading
+from datetime import datetime
+try:
+    from lib.history import open_database, DATE_FORMAT
+except ModuleNotFoundError:
+    from history import open_database, DATE_FORMAT
+
+# SQLite limits the number of parameters in a query.
+QUERY_CHUNK = 500
+
+# Local mirror of which OCLC numbers are set as holdings. It is updated from
+# the outcome of every set, unset, and check, and can be seeded from the
+# OCLC holdings report. Before a run, instructions that would not change
+# anything, setting a holding that is already set or unsetting one that is
+# already unset, can be dropped so they don't cost a web service hit.
+# Numbers the mirror doesn't know about are always sent.
+#
+# The mirror can be used as an OclcReport sink.
+class HoldingsMirror:
+    def __init__(self, db_path:str, debug:bool=False):
+        self.db_path = db_path
+        self.debug   = debug
+        self.lock    = threading.Lock()
+        self.db      = open_database(db_path)
+        with self.db:
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS holdings (
+                    number INTEGER PRIMARY KEY,
+                    is_set INTEGER NOT NULL,
+                    updated TEXT,
+                    source TEXT);
+            """)
+
+    # Records the holding state of numbers.
+    # param: states list of (number, is_set:bool) tuples.
+    # param: source str where the state came from, like 'set', 'check', or 'report'.
+    # return: int count of numbers recorded.
+    def update(self, states:list, source:str='') -> int:
+        now = datetime.now().strftime(DATE_FORMAT)
+        rows = []
+        for (number, is_set) in states:
+            try:
+                rows.append((int(number), 1 if is_set else 0, now, source))
+            except (TypeError, ValueError):
+                continue
+        with self.lock, self.db:
+            self.db.executemany("INSERT OR REPLACE INTO holdings VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    # Seeds the mirror from OCLC's holdings report, where every number is set.
+    # param: numbers list of OCLC numbers, with or without an instruction
+    #   character, as read by OclcCsvListFile.
+    # return: int count of numbers recorded.
+    def seed(self, numbers:list) -> int:
+        return self.update(list((n.lstrip('+-?! '), True) for n in numbers), source='report')
+
+    # Sink interface. Records the state each successful outcome implies.
+    # param: outcomes list of Outcome objects.
+    def write(self, outcomes:list):
+        states = {'+': [], '-': [], '?': []}
+        for o in outcomes:
+            if o.status == 'error' or o.action not in states:
+                continue
+            number = o.new_number if o.new_number else o.number
+            if o.action == '+':
+                states['+'].append((number, True))
+            elif o.action == '-':
+                states['-'].append((number, False))
+            else:
+                states['?'].append((number, o.status == 'set'))
+        for (action, source) in (('+', 'set'), ('-', 'unset'), ('?', 'check')):
+            if states[action]:
+                self.update(states[action], source=source)
+
+    # Looks up the holding state of numbers.
+    # param: numbers list of OCLC numbers as strings.
+    # return: dict of {number: bool, ...} of the numbers in the mirror.
+    def get_states(self, numbers:list) -> dict:
+        states = {}
+        keys = []
+        for number in numbers:
+            try:
+                keys.append(int(number))
+            except (TypeError, ValueError):
+                continue
+        for i in range(0, len(keys), QUERY_CHUNK):
+            chunk = keys[i:i + QUERY_CHUNK]
+            query = f"SELECT number, is_set FROM holdings WHERE number IN ({','.join('?' * len(chunk))})"
+            for (number, is_set) in self.db.execute(query, chunk):
+                states[str(number)] = bool(is_set)
+        return states
+
+    # Removes the instructions that wouldn't change the holdings.
+    # param: action str '+' or '-'. Any other action isn't filtered.
+    # param: numbers list of OCLC numbers as strings.
+    # return: tuple of the list of numbers to send, and the list of numbers skipped.
+    def filter(self, action:str, numbers:list):
+        if action not in ('+', '-') or not numbers:
+            return numbers, []
+        states = self.get_states(numbers)
+        want_set = action == '+'
+        send = []
+        skipped = []
+        for number in numbers:
+            if states.get(number) == want_set:
+                skipped.append(number)
+            else:
+                send.append(number)
+        if self.debug:
+            print(f"DEBUG: {len(skipped)} '{action}' instructions are already done at OCLC.")
+        return send, skipped
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM holdings").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("holdings.tst")
+# EOF
@@ -0,0 +1,42 @@
+Test the local mirror of institutional holdings.
+------------------------------------------------
+
+>>> from holdings import HoldingsMirror
+>>> from oclcreport import Outcome
+>>> import os
+>>> def clean_up():
+...     for f in ['test_holdings.db', 'test_holdings.db-wal', 'test_holdings.db-shm', 'test_holdings.csv']:
+...         if os.path.exists(f):
+...             os.remove(f)
+>>> clean_up()
+
+Seed the mirror from an OCLC holdings report.
+
+>>> from listutils import OclcCsvListFile
+>>> with open('test_holdings.csv', encoding='ISO-8859-1', mode='w') as f:
+...     _ = f.write('=HYPERLINK("http://www.worldcat.org/oclc/267", "267")\tBook, Print\n')
+...     _ = f.write('=HYPERLINK("http://www.worldcat.org/oclc/1210", "1210")\tBook, Print\n')
+>>> mirror = HoldingsMirror('test_holdings.db')
+>>> mirror.seed(OclcCsvListFile('test_holdings.csv').get_add_list())
+2
+
+Outcomes of sets, unsets, and checks update the mirror.
+
+>>> mirror.write([Outcome('100', '+', 'success', '100'), Outcome('200', '+', 'updated', '201'),
+...   Outcome('267', '-', 'success', '267'), Outcome('300', '?', 'unset', '300'),
+...   Outcome('400', '?', 'set', '400'), Outcome('', '+', 'error')])
+>>> sorted(mirror.get_states(['100', '201', '267', '300', '400', '1210', '999']).items())
+[('100', True), ('1210', True), ('201', True), ('267', False), ('300', False), ('400', True)]
+
+Instructions that wouldn't change anything are skipped.
+
+>>> mirror.filter('+', ['100', '267', '300', '999', '1210'])
+(['267', '300', '999'], ['100', '1210'])
+>>> mirror.filter('-', ['100', '267', '300', '999'])
+(['100', '999'], ['267', '300'])
+>>> mirror.filter('?', ['100', '267'])
+(['100', '267'], [])
+>>> len(mirror)
+6
+>>> mirror.close()
+>>> clean_up()
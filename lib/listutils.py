@@ -19,13 +19,20 @@
 #
 ###############################################################################
 
-from os.path import join, dirname, exists, getsize, splitext
+from os.path import join, dirname, exists, splitext
 import re
+import time
 from os import linesep
+from array import array
+from bisect import bisect_left
 try:
     from lib.flat import Flat
+    from lib.compressed import open_text, plain_name, file_exists, file_size, is_stream, get_compression, STDIN
+    from lib.packed import is_packed, write_packed, PackedInstructions, PACKED_EXT
 except ModuleNotFoundError:
     from flat import Flat
+    from compressed import open_text, plain_name, file_exists, file_size, is_stream, get_compression, STDIN
+    from packed import is_packed, write_packed, PackedInstructions, PACKED_EXT
 
 # Reads simple lists of integers of which the first in the line are added to 
 # a list.
@@ -47,7 +54,7 @@ class SimpleListFile:
         if self.debug:
             print(f"DEBUG: reading {self.list_file}")
         # Test that the class can read this type of list_file
-        self.file_path, self.file_ext = splitext(self.list_file)
+        self.file_path, self.file_ext = splitext(plain_name(self.list_file))
         self.ignore_dict = ignore
 
     # Reads and parses the input file returning a list of a given 'type'.
@@ -57,7 +64,7 @@ class SimpleListFile:
         # In the most basic parser type read a file of integers one per line.
         numbers = []
         num_matcher  = re.compile(r'\d+')
-        with open(self.list_file, encoding='ISO-8859-1', mode='r') as lf:
+        with open_text(self.list_file, mode='r') as lf:
             for line in lf:
                 num_match = re.search(num_matcher, line)
                 if num_match:
@@ -90,7 +97,7 @@ class OclcCsvListFile(SimpleListFile):
         # In the most basic parser type read a file of integers one per line.
         numbers = []
         num_matcher  = re.compile(r'"\d+"')
-        with open(self.list_file, encoding='ISO-8859-1', mode='r') as lf:
+        with open_text(self.list_file, mode='r') as lf:
             for line in lf:
                 num_match = re.search(num_matcher, line)
                 if num_match:
@@ -126,26 +133,36 @@ class FlatListFile(SimpleListFile):
 
 # Reads various files extension type and manages the lists that it reads.
 # It can read lists from .txt, .lst, .csv & .tsv (OCLC form), .flat, and
-# .log, oclc.py's own log file format. 
+# .log, oclc.py's own log file format. Any of them can be compressed, like
+# 'all.flat.gz', 'report.csv.zst', or a member of a zip, 'all.zip:all.flat'.
+# A file name of '-' reads stdin, and a named pipe is read like a file, so
+# records are parsed as 'catalogdump' writes them. Either can only be read once.
 class Lister:
-    def __init__(self, fileName:str, debug:bool=False, ignore:dict=None):
+    # param: metrics optional Metrics that times the parsing.
+    # param: stdin_type str type of the list read from stdin, 'flat', 'lst', or 'csv'.
+    def __init__(self, fileName:str, debug:bool=False, ignore:dict=None, metrics=None, stdin_type:str='flat'):
         self.list_file   = fileName
         self.debug       = debug
+        self.metrics     = metrics
         self.list_reader = None
         self.flat        = None
         self.rejected_recs = []
-        # Guarding file tests.
-        if not exists(self.list_file) or getsize(self.list_file) == 0:
+        # Guarding file tests. A pipe has no size until it is written to.
+        if not file_exists(self.list_file) or (not is_stream(self.list_file) and file_size(self.list_file) == 0):
             print(f"The {self.list_file} file is empty (or missing).")
         # Test that the class can read this type of list_file
-        file_path, file_ext = splitext(self.list_file)
+        if self.list_file == STDIN:
+            file_ext = '.' + stdin_type.lstrip('.')
+        else:
+            file_path, file_ext = splitext(plain_name(self.list_file))
+        self.file_type = file_ext.lower().lstrip('.') or 'lst'
         if file_ext.lower() == '.csv' or file_ext.lower() == '.tsv':
             self.list_reader = OclcCsvListFile(fileName=fileName, debug=debug)
         elif file_ext.lower() == '.flat':
             self.list_reader = FlatListFile(fileName=fileName, debug=debug, ignore=ignore)
             self.flat = self.list_reader.get_flat_obj()
             # Records that don't have OCLC numbers. Submit as XML records.
-            self.rejected_recs = self.flat.get_rejected_tcns()
+            self.rejected_recs = self.flat.get_no_oclc_number_tcns()
         elif file_ext.lower() == '.txt' or file_ext.lower() == '.lst' or file_ext.lower() == '':
             self.list_reader = SimpleListFile(fileName=fileName, debug=debug)
         else:
@@ -158,6 +175,14 @@ class Lister:
     # param: action:str action character for each number match on a given line.
     #   For more information on reading instructions see List.read_instruction_numbers(). 
     def get_list(self, action:str) -> list:
+        if self.metrics and action:
+            with self.metrics.timer('oclc_parse_seconds', format=self.file_type):
+                numbers = self._get_list_(action)
+            self.metrics.count('oclc_parsed_numbers_total', len(numbers), format=self.file_type)
+            return numbers
+        return self._get_list_(action)
+
+    def _get_list_(self, action:str) -> list:
         if not action:
             return []
         elif action == '+':
@@ -174,6 +199,11 @@ class Lister:
             self.logger.logit(f"*unknown list type request '{action}'!")
             return []
 
+    # Returns the TCNs of flat records that don't have OCLC numbers.
+    # Always empty if the list file isn't a flat file.
+    def get_rejected_tcns(self) -> list:
+        return self.rejected_recs
+
     # Looks up the updated old: new OCLC numbers in the flat file
     # and if found, appends the records to a slim-flat file.
     def write_updates(self, updated:dict):
@@ -181,9 +211,146 @@ class Lister:
             self.flat.update_and_write_slim_flat(updated)
 
 class InstructionManager:
-    def __init__(self, fileName:str, debug:bool=False) -> dict:
+    # param: fileName:str path of the instruction file.
+    # param: debug:bool turns on and off extra diagnostic messaging.
+    # param: remap:dict optional {old: new, ...} OCLC numbers, see RemapTable.
+    #   Numbers are replaced with their current number as they are merged
+    #   or read, so requests are never sent with stale numbers.
+    # param: metrics optional Metrics that times reading and writing the file.
+    # param: packed:bool True to write a packed binary file, see packed.py.
+    #   By default a file is read as packed if it is, and written packed if
+    #   its name ends in '.bin'.
+    # param: in_place:bool True to remember where each instruction is as the
+    #   file is read, so mark_done() can change them in the file.
+    def __init__(self, fileName:str, debug:bool=False, remap:dict=None, metrics=None, packed:bool=None, in_place:bool=False) -> dict:
         self.instruction_file = fileName
         self.debug = debug
+        self.metrics = metrics
+        self.packed = packed
+        self.in_place = in_place
+        self.remap = remap if remap else {}
+        # The remaps that were actually applied {old: new, ...}
+        self.remapped = {}
+        # Where the instructions of each action are in a text file
+        # {action: (numbers, byte offsets, True if the numbers are sorted)}.
+        self.offsets = {}
+
+    # Replaces a number with its current number if it was remapped.
+    def _remap_(self, number:str) -> str:
+        new_number = self.remap.get(number)
+        if new_number:
+            self.remapped[number] = new_number
+            return new_number
+        return number
+
+    # Returns the dictionary of remaps applied while merging or reading.
+    def get_remapped(self) -> dict:
+        return self.remapped
+
+    # Returns True if the instruction file is, or will be written, packed.
+    def is_packed(self) -> bool:
+        if self.packed is not None:
+            return self.packed
+        return self.instruction_file.endswith(PACKED_EXT) or is_packed(self.instruction_file)
+
+    # Counts the instructions of each action in one pass over the file,
+    # without keeping the numbers.
+    # return: dict of {action: count} like {'+': 10, '-': 2, '?': 0, '!': 5, ' ': 0}.
+    def count_instructions(self) -> dict:
+        counts = dict((action, 0) for action in '+-?! ')
+        started = time.monotonic()
+        if is_packed(self.instruction_file):
+            with PackedInstructions(self.instruction_file) as packed:
+                actions = bytes(packed.actions)
+            for action in counts:
+                counts[action] = actions.count(ord(action))
+        else:
+            with open_text(self.instruction_file, mode='r') as f:
+                for line in f:
+                    if line[:1] in counts:
+                        counts[line[:1]] += 1
+        if self.metrics:
+            self.metrics.observe('oclc_instruction_io_seconds', time.monotonic() - started, op='read')
+            self.metrics.count('oclc_instruction_lines_total', sum(counts.values()), op='read')
+        return counts
+
+    # Returns True if instructions can be marked done in the file itself.
+    # Compressed files and pipes can only be rewritten.
+    def can_mark_in_place(self) -> bool:
+        if is_packed(self.instruction_file):
+            return True
+        return (not get_compression(self.instruction_file) and not is_stream(self.instruction_file)
+            and exists(self.instruction_file))
+
+    # Reads the numbers of an action from a text file, and where each line starts.
+    def _read_indexed_(self, action:str) -> list:
+        numbers = []
+        offsets = array('Q')
+        ordered = True
+        code    = action.encode('ISO-8859-1')
+        offset  = 0
+        with open(self.instruction_file, mode='rb') as f:
+            for line in f:
+                if line.startswith(code):
+                    number = line.rstrip().decode('ISO-8859-1')[1:]
+                    if numbers and number < numbers[-1]:
+                        ordered = False
+                    numbers.append(number)
+                    offsets.append(offset)
+                offset += len(line)
+        self.offsets[action] = (list(numbers), offsets, ordered)
+        return numbers
+
+    # Finds the byte offsets of the lines of a number with an action.
+    def _find_offsets_(self, action:str, number:str) -> list:
+        (numbers, offsets, ordered) = self.offsets[action]
+        if ordered is False:
+            # Files written by --save_as are sorted, others are indexed once.
+            lookup = {}
+            for (index, found) in enumerate(numbers):
+                lookup.setdefault(found, []).append(index)
+            self.offsets[action] = (lookup, offsets, None)
+            (numbers, offsets, ordered) = self.offsets[action]
+        if ordered is None:
+            return list(offsets[index] for index in numbers.get(number, []))
+        found = []
+        index = bisect_left(numbers, number)
+        while index < len(numbers) and numbers[index] == number:
+            found.append(offsets[index])
+            index += 1
+        return found
+
+    # Marks instructions done, '!', in the file itself rather than writing
+    # the whole file again. Only the lines of the numbers are changed, so the
+    # cost is in proportion to the numbers marked, not the size of the file.
+    # A text file must have been read with in_place=True. Numbers that were
+    # remapped as they were read are marked by their number in the file.
+    # param: numbers:list numbers, without an action, that are done.
+    # return: int count of instructions marked done.
+    def mark_done(self, numbers:list) -> int:
+        originals = {}
+        for (old, new) in self.remapped.items():
+            originals.setdefault(new, []).append(old)
+        candidates = []
+        for number in numbers:
+            candidates.append(number)
+            candidates.extend(originals.get(number, []))
+        if is_packed(self.instruction_file):
+            with PackedInstructions(self.instruction_file, writable=True) as packed:
+                return packed.mark_done(candidates)
+        found = set()
+        for number in candidates:
+            for action in self.offsets:
+                if action != '!':
+                    found.update(self._find_offsets_(action, number))
+        # In file order, so the writes are sequential.
+        with open(self.instruction_file, mode='r+b') as f:
+            for offset in sorted(found):
+                f.seek(offset)
+                f.write(b'!')
+        if self.debug:
+            print(f"DEBUG: marked {len(found)} instructions done in '{self.instruction_file}'")
+        return len(found)
 
     # Compares two lists with '+', ' ', or '-' instructions and returns
     # a merged list. If duplicate numbers have the different instructions
@@ -206,6 +373,8 @@ class InstructionManager:
             for num in l:
                 key = num[1:]
                 sign= num[0]
+                if self.remap:
+                    key = self._remap_(key)
                 if sign == '!':
                     merged_dict[key] = sign
                     continue
@@ -226,12 +395,19 @@ class InstructionManager:
             merged_list.append(f"{sign}{number}")
         return merged_list
 
-    # Writes a list to file.
+    # Writes a list to file, compressed if the file name ends in '.gz', '.zst', or '.zip'.
     # param: instructions:list   
     def write_instructions(self, instructions:list):
-        with open(self.instruction_file, encoding='ISO-8859-1', mode='w') as f:
-            for instruction in instructions:
-                f.write(f"{instruction}" + linesep)
+        started = time.monotonic()
+        if self.is_packed():
+            write_packed(self.instruction_file, instructions)
+        else:
+            with open_text(self.instruction_file, mode='w') as f:
+                for instruction in instructions:
+                    f.write(f"{instruction}" + linesep)
+        if self.metrics:
+            self.metrics.observe('oclc_instruction_io_seconds', time.monotonic() - started, op='write')
+            self.metrics.count('oclc_instruction_lines_total', len(instructions), op='write')
         if self.debug:
             print(f"DEBUG: finished writing instructions to '{self.instruction_file}'")
 
@@ -242,10 +418,23 @@ class InstructionManager:
     # return: list of integers without instruction character.  
     def read_instruction_numbers(self, action:str):
         numbers = []
-        with open(self.instruction_file, encoding='ISO-8859-1', mode='r') as f:
-            for line in f:
-                if line and line.startswith(action):
-                    numbers.append(line.rstrip()[1:])
+        started = time.monotonic()
+        if is_packed(self.instruction_file):
+            with PackedInstructions(self.instruction_file) as packed:
+                numbers = packed.read_numbers(action)
+        elif self.in_place and self.can_mark_in_place():
+            numbers = self._read_indexed_(action)
+        else:
+            with open_text(self.instruction_file, mode='r') as f:
+                for line in f:
+                    if line and line.startswith(action):
+                        numbers.append(line.rstrip()[1:])
+        if self.metrics:
+            self.metrics.observe('oclc_instruction_io_seconds', time.monotonic() - started, op='read')
+            self.metrics.count('oclc_instruction_lines_total', len(numbers), op='read')
+        if self.remap:
+            # Remapped numbers may duplicate numbers already in the list.
+            numbers = list(dict.fromkeys(self._remap_(number) for number in numbers))
         if self.debug:
             print(f"DEBUG: finished reading instructions from '{self.instruction_file}'")
         return numbers
@@ -0,0 +1,245 @@
+###############################################################################
+#
+# Purpose: Count and time what a run does, and export it for monitoring.
+# Date:    Fri Oct 23 09:14:26 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import os
+import json
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+# Quantiles exported for every histogram.
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# HDR-style histogram. Values are counted in buckets whose width grows with
+# the value, so every value is kept to within 1 part in 2**precision_bits
+# (under 1% by default) in a few hundred buckets, however many are recorded.
+# Values are recorded in whole units of 'resolution', microseconds by default.
+class Histogram:
+
+    # param: resolution float smallest difference between values kept, default 1 microsecond.
+    # param: precision_bits int significant bits kept of each value.
+    def __init__(self, resolution:float=1e-6, precision_bits:int=7):
+        self.resolution = resolution
+        self.precision_bits = precision_bits
+        self.buckets = {}
+        self.count   = 0
+        self.total   = 0.0
+        self.min     = None
+        self.max     = None
+
+    # Returns the (shift, mantissa) bucket of a value in whole units.
+    def _bucket_(self, units:int):
+        shift = max(0, units.bit_length() - self.precision_bits)
+        return (shift, units >> shift)
+
+    # Records a value.
+    # param: value float, like seconds.
+    def record(self, value:float):
+        units = max(0, int(round(value / self.resolution)))
+        key = self._bucket_(units)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    # Returns the value that 'quantile' of the recorded values are at or below,
+    # the top of its bucket, but never more than the largest value recorded.
+    # param: quantile float between 0.0 and 1.0.
+    # return: float value, or 0.0 if nothing was recorded.
+    def quantile(self, quantile:float) -> float:
+        if not self.count:
+            return 0.0
+        wanted = max(1, math.ceil(round(quantile * self.count, 9)))
+        seen = 0
+        for (shift, mantissa) in sorted(self.buckets, key=lambda k: k[1] << k[0]):
+            seen += self.buckets[(shift, mantissa)]
+            if seen >= wanted:
+                top = (((mantissa + 1) << shift) - 1) * self.resolution
+                return min(top, self.max)
+        return self.max
+
+    def get_count(self) -> int:
+        return self.count
+
+    def get_total(self) -> float:
+        return self.total
+
+# Formats labels the way Prometheus does: {code="200",endpoint="check"}.
+def _label_str_(labels:tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for (k, v) in labels) + '}'
+
+# Counters and histograms of a run, kept by name and labels. Safe to use
+# from the threads that send requests at the same time. Metrics are written
+# to a Prometheus textfile collector file and a JSON summary when the run
+# ends, and every 'interval' seconds while it runs if started.
+#
+#   metrics = Metrics('/var/lib/node_exporter/textfile/oclc.prom')
+#   metrics.count('oclc_requests_total', endpoint='check', code=200)
+#   with metrics.timer('oclc_parse_seconds', format='flat'):
+#       ...
+#   metrics.close()
+class Metrics:
+
+    # param: prom_file str optional path of the Prometheus textfile.
+    # param: json_file str optional path of the JSON summary. Default the
+    #   prom_file with '.json' in place of its extension.
+    # param: clock function that returns the time in seconds.
+    def __init__(self, prom_file:str=None, json_file:str=None, clock=time.monotonic):
+        self.prom_file  = prom_file
+        self.json_file  = json_file
+        if prom_file and not json_file:
+            self.json_file = os.path.splitext(prom_file)[0] + '.json'
+        self.clock      = clock
+        self.started    = clock()
+        self.counters   = {}
+        self.histograms = {}
+        self.lock       = threading.Lock()
+        self.stopped    = threading.Event()
+        self.writer     = None
+
+    # Adds to a counter.
+    # param: name str metric name, like 'oclc_requests_total'.
+    # param: value number to add, default 1.
+    # param: labels keyword values that tell series apart, like endpoint='check'.
+    def count(self, name:str, value=1, **labels):
+        key = (name, tuple(sorted((k, str(v)) for (k, v) in labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    # Records a value, like a latency in seconds, in a histogram.
+    def observe(self, name:str, value:float, **labels):
+        key = (name, tuple(sorted((k, str(v)) for (k, v) in labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = Histogram()
+                self.histograms[key] = histogram
+            histogram.record(value)
+
+    # Times the body of a 'with' statement into a histogram.
+    @contextmanager
+    def timer(self, name:str, **labels):
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.observe(name, self.clock() - started, **labels)
+
+    def get_counter(self, name:str, **labels):
+        return self.counters.get((name, tuple(sorted((k, str(v)) for (k, v) in labels.items()))), 0)
+
+    # Returns the histogram of a series, or None if nothing was recorded.
+    def get_histogram(self, name:str, **labels):
+        return self.histograms.get((name, tuple(sorted((k, str(v)) for (k, v) in labels.items()))))
+
+    # Returns seconds since the metrics were created.
+    def get_elapsed(self) -> float:
+        return self.clock() - self.started
+
+    # Returns the metrics in the Prometheus text exposition format.
+    # Histograms are exported as summaries, with their quantiles.
+    def to_prometheus(self) -> str:
+        lines = []
+        with self.lock:
+            typed = set()
+            for (name, labels) in sorted(self.counters):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{_label_str_(labels)} {self.counters[(name, labels)]}")
+            for (name, labels) in sorted(self.histograms):
+                histogram = self.histograms[(name, labels)]
+                if name not in typed:
+                    lines.append(f"# TYPE {name} summary")
+                    typed.add(name)
+                for q in QUANTILES:
+                    lines.append(f"{name}{_label_str_(labels + (('quantile', str(q)),))} {histogram.quantile(q):.6f}")
+                lines.append(f"{name}_sum{_label_str_(labels)} {histogram.get_total():.6f}")
+                lines.append(f"{name}_count{_label_str_(labels)} {histogram.get_count()}")
+        lines.append(f"# TYPE oclc_elapsed_seconds gauge")
+        lines.append(f"oclc_elapsed_seconds {self.get_elapsed():.3f}")
+        # The exposition format wants '\n', whatever the platform.
+        return '\n'.join(lines) + '\n'
+
+    # Returns a summary of the metrics, with web service requests per second.
+    def to_dict(self) -> dict:
+        elapsed = self.get_elapsed()
+        with self.lock:
+            counters = dict((name + _label_str_(labels), value) for ((name, labels), value) in sorted(self.counters.items()))
+            histograms = {}
+            for ((name, labels), histogram) in sorted(self.histograms.items()):
+                summary = {'count': histogram.get_count(), 'sum': round(histogram.get_total(), 6),
+                    'min': histogram.min, 'max': histogram.max}
+                for q in QUANTILES:
+                    summary[f"p{q * 100:g}"] = round(histogram.quantile(q), 6)
+                histograms[name + _label_str_(labels)] = summary
+            requests = sum(value for ((name, labels), value) in self.counters.items() if name == 'oclc_requests_total')
+        return {'elapsed_seconds': round(elapsed, 3),
+            'requests_per_second': round(requests / elapsed, 3) if elapsed > 0 else 0.0,
+            'counters': counters, 'histograms': histograms}
+
+    # Writes the Prometheus textfile and JSON summary. Each file is written
+    # aside and renamed, so a collector never reads half a file.
+    def write(self):
+        for (path, text) in ((self.prom_file, self.to_prometheus), (self.json_file, lambda: json.dumps(self.to_dict(), indent=2))):
+            if not path:
+                continue
+            with open(path + '.tmp', encoding='utf-8', mode='w') as f:
+                f.write(text())
+            os.replace(path + '.tmp', path)
+
+    # Writes the files every 'interval' seconds until closed.
+    # param: interval float seconds between writes.
+    def start(self, interval:float=60.0):
+        def keep_writing():
+            while not self.stopped.wait(interval):
+                try:
+                    self.write()
+                except OSError:
+                    pass
+        self.writer = threading.Thread(target=keep_writing, name='metrics', daemon=True)
+        self.writer.start()
+
+    # Returns a line per web service endpoint of its requests and latencies.
+    def get_summary(self) -> list:
+        lines = []
+        with self.lock:
+            for ((name, labels), histogram) in sorted(self.histograms.items()):
+                if name != 'oclc_request_seconds':
+                    continue
+                endpoint = dict(labels).get('endpoint', '')
+                lines.append(f"{endpoint}: {histogram.get_count()} requests, p50 {histogram.quantile(0.5):.3f}s, p99 {histogram.quantile(0.99):.3f}s, max {histogram.max:.3f}s")
+        return lines
+
+    # Stops the periodic writes and writes the files a last time.
+    def close(self):
+        self.stopped.set()
+        if self.writer:
+            self.writer.join()
+            self.writer = None
+        self.write()
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("metrics.tst")
+# EOF
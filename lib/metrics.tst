@@ -0,0 +1,88 @@
+Test run metrics.
+-----------------
+
+>>> from metrics import Histogram, Metrics
+>>> import os
+>>> import json
+
+Histograms keep values to within 1% however many are recorded.
+
+>>> h = Histogram()
+>>> for ms in range(1, 1001):
+...     h.record(ms / 1000.0)
+>>> h.get_count(), round(h.get_total(), 3)
+(1000, 500.5)
+>>> for q in (0.5, 0.9, 0.99, 1.0):
+...     value = h.quantile(q)
+...     print(q, abs(value - q) / q < 0.01)
+0.5 True
+0.9 True
+0.99 True
+1.0 True
+>>> len(h.buckets) < 400
+True
+>>> Histogram().quantile(0.5)
+0.0
+
+Counters and histograms are kept by name and labels.
+
+>>> t = [0.0]
+>>> metrics = Metrics('test_metrics.prom', clock=lambda: t[0])
+>>> metrics.json_file
+'test_metrics.json'
+>>> metrics.count('oclc_requests_total', endpoint='check', code=200)
+>>> metrics.count('oclc_requests_total', endpoint='check', code=200)
+>>> metrics.count('oclc_requests_total', code=429, endpoint='check')
+>>> metrics.get_counter('oclc_requests_total', endpoint='check', code=200)
+2
+>>> metrics.observe('oclc_request_seconds', 0.25, endpoint='check')
+>>> with metrics.timer('oclc_parse_seconds', format='lst'):
+...     t[0] += 0.5
+>>> metrics.get_histogram('oclc_parse_seconds', format='lst').get_total()
+0.5
+
+Prometheus text, with histograms as summaries.
+
+>>> t[0] = 10.0
+>>> print(metrics.to_prometheus(), end='')
+# TYPE oclc_requests_total counter
+oclc_requests_total{code="200",endpoint="check"} 2
+oclc_requests_total{code="429",endpoint="check"} 1
+# TYPE oclc_parse_seconds summary
+oclc_parse_seconds{format="lst",quantile="0.5"} 0.500000
+oclc_parse_seconds{format="lst",quantile="0.9"} 0.500000
+oclc_parse_seconds{format="lst",quantile="0.99"} 0.500000
+oclc_parse_seconds{format="lst",quantile="0.999"} 0.500000
+oclc_parse_seconds_sum{format="lst"} 0.500000
+oclc_parse_seconds_count{format="lst"} 1
+# TYPE oclc_request_seconds summary
+oclc_request_seconds{endpoint="check",quantile="0.5"} 0.250000
+oclc_request_seconds{endpoint="check",quantile="0.9"} 0.250000
+oclc_request_seconds{endpoint="check",quantile="0.99"} 0.250000
+oclc_request_seconds{endpoint="check",quantile="0.999"} 0.250000
+oclc_request_seconds_sum{endpoint="check"} 0.250000
+oclc_request_seconds_count{endpoint="check"} 1
+# TYPE oclc_elapsed_seconds gauge
+oclc_elapsed_seconds 10.000
+
+The JSON summary has the requests per second.
+
+>>> summary = metrics.to_dict()
+>>> summary['elapsed_seconds'], summary['requests_per_second']
+(10.0, 0.3)
+>>> summary['histograms']['oclc_request_seconds{endpoint="check"}']['p99']
+0.25
+>>> metrics.get_summary()
+['check: 1 requests, p50 0.250s, p99 0.250s, max 0.250s']
+
+Closing writes both files.
+
+>>> metrics.close()
+>>> with open('test_metrics.json') as f:
+...     json.load(f)['counters']['oclc_requests_total{code="429",endpoint="check"}']
+1
+>>> with open('test_metrics.prom') as f:
+...     f.readline()
+'# TYPE oclc_requests_total counter\n'
+>>> os.remove('test_metrics.prom')
+>>> os.remove('test_metrics.json')
@@ -17,6 +17,7 @@
 # limitations under the License.
 #
 ###############################################################################
+import csv
 import json
 from os.path import dirname, join, exists
 from datetime import datetime
@@ -24,6 +25,115 @@ import re
 import sys
 
 DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+OUTCOME_FIELDS = ('number', 'action', 'status', 'new_number', 'detail', 'timestamp', 'url')
+
+# Converts OCLC's '2023-03-21T23:17:51.678Z' time stamps to DATE_FORMAT.
+# param: updated str time stamp from a response entry, may be empty.
+# return: str of the time stamp, or the current time if there wasn't one.
+def _timestamp_(updated:str='') -> str:
+    if updated:
+        return updated.replace("T", " ")[:19]
+    return datetime.now().strftime(DATE_FORMAT)
+
+# A compact, structured record of what happened to one OCLC number.
+#   number:     the OCLC number that was sent.
+#   action:     '+' set, '-' unset, '?' check, or '*' bib upload.
+#   status:     'success', 'updated' if OCLC reported a different current
+#               number, 'set' or 'unset' for the holding status of a check,
+#               or 'error'.
+#   new_number: the current OCLC number as reported by OCLC.
+#   detail:     any detail OCLC supplied, the institution for checks, or
+#               the error message.
+#   timestamp:  when OCLC processed the request.
+#   url:        the record's URL OCLC gave with a check, if any.
+# The human-readable text that used to be logged is only rendered if the
+# outcome is converted to a string.
+class Outcome:
+    __slots__ = OUTCOME_FIELDS
+
+    def __init__(self, number:str, action:str, status:str, new_number:str='', detail:str='', timestamp:str='', url:str=''):
+        self.number     = str(number)
+        self.action     = action
+        self.status     = status
+        self.new_number = str(new_number)
+        self.detail     = detail
+        self.timestamp  = timestamp if timestamp else _timestamp_()
+        self.url        = url
+
+    # Returns the outcome as a dictionary, suitable for JSON.
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in OUTCOME_FIELDS}
+
+    # Returns the outcome as a tuple in OUTCOME_FIELDS order.
+    def as_tuple(self) -> tuple:
+        return tuple(getattr(self, field) for field in OUTCOME_FIELDS)
+
+    def __str__(self) -> str:
+        if self.status == 'error':
+            return self.detail
+        if self.action == '?':
+            text = f"?{self.number} is {self.detail} holding: {self.status == 'set'} as of '{self.timestamp}'"
+            if self.status == 'set':
+                if self.number == self.new_number:
+                    text += f"  OCLC number confirmed"
+                else:
+                    text += f"  OCLC number updated to {self.new_number}"
+            url = self.url if self.url else f"http://worldcat.org/oclc/{self.new_number}"
+            return text + f" See {url} for more information."
+        if self.action == '+':
+            if self.status == 'success':
+                return f"+{self.number}  added. See http://worldcat.org/oclc/{self.number}"
+            text = f"+{self.number}  updated to {self.new_number}. See http://worldcat.org/oclc/{self.new_number}"
+        elif self.action == '-':
+            if self.status == 'success':
+                return f"-{self.number}  deleted"
+            text = f"-{self.number}  updated to {self.new_number}"
+        else:
+            return f"{self.action}{self.number}  {self.status} {self.new_number}"
+        if self.detail:
+            text += f", {self.detail}"
+        return text
+
+    # Outcomes print like the strings they replace.
+    def __repr__(self) -> str:
+        return repr(str(self))
+
+# Writes outcomes to a file, one per line, so runs can be analysed without
+# parsing the log. Files that end in '.tsv' are written as tab-separated
+# columns in OUTCOME_FIELDS order, quoted like a spreadsheet would if a
+# field has a tab or line break, anything else as JSON lines.
+class OutcomeSink:
+    def __init__(self, file_name:str):
+        self.file_name = file_name
+        self.columnar  = file_name.lower().endswith('.tsv')
+        self.out = open(file_name, encoding='utf-8', mode='a', newline='')
+        self.writer = csv.writer(self.out, dialect='excel-tab', lineterminator='\n') if self.columnar else None
+
+    # param: outcomes list of Outcome objects.
+    def write(self, outcomes:list):
+        if self.columnar:
+            self.writer.writerows(outcome.as_tuple() for outcome in outcomes)
+        else:
+            self.out.writelines(json.dumps(outcome.as_dict(), separators=(',', ':')) + '\n' for outcome in outcomes)
+
+    def close(self):
+        self.out.close()
+
+# Reads outcomes written by an OutcomeSink.
+# param: file_name str path to a '.tsv' or JSON lines outcome file.
+# return: generator of Outcome objects.
+def read_outcomes(file_name:str):
+    if file_name.lower().endswith('.tsv'):
+        with open(file_name, encoding='utf-8', mode='r', newline='') as f:
+            for row in csv.reader(f, dialect='excel-tab'):
+                if row:
+                    yield Outcome(*row)
+        return
+    with open(file_name, encoding='utf-8', mode='r') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line:
+                yield Outcome(**json.loads(line))
 
 # This class outputs a report of transactions with OCLC's web service.
 # Spec for Reporting
@@ -35,8 +145,16 @@ DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 # * Adds and delete counts shall be reported along with any errors.
 class OclcReport:
 
-    def __init__(self, debug:bool=False):
+    # param: debug bool value true if you want more messaging and false for less.
+    # param: sink optional OutcomeSink, or any object with a write(outcomes)
+    #   method, that receives every outcome as it is parsed. May also be a
+    #   list of sinks.
+    def __init__(self, debug:bool=False, sink=None):
         self.debug = debug
+        if isinstance(sink, list):
+            self.sinks = list(s for s in sink if s is not None)
+        else:
+            self.sinks = [sink] if sink is not None else []
         self.checks   = {'total': 0, 'success': 0, 'warnings':0, 'errors': 0}
         self.holdings = {'total': 0, 'success': 0, 'warnings':0, 'errors': 0}
         self.adds     = {'total': 0, 'success': 0, 'warnings':0, 'errors': 0}
@@ -64,6 +182,20 @@ class OclcReport:
             else:
                 print(f"{message}")
 
+    # Sends outcomes to the sinks if there are any.
+    # param: outcomes list of Outcome objects.
+    def _emit_(self, outcomes:list):
+        if outcomes:
+            for sink in self.sinks:
+                sink.write(outcomes)
+
+    # Records a failed request.
+    # param: action str '+', '-', '?', or '*'.
+    # param: code int HTTP status code.
+    # param: json_data the response.
+    def _emit_error_(self, action:str, code:int, json_data):
+        self._emit_([Outcome('', action, 'error', detail=f"HTTP {code} {json_data}")])
+
 
     # {'title': '46629055', 
     #  'content': 
@@ -95,6 +227,7 @@ class OclcReport:
                 msg = f"check failed!"
             self.print_or_log(msg, 'error')
             self.holdings['errors'] += 1
+            self._emit_error_('?', code, json_data)
             return False
         b_result= True
         if json_data:
@@ -111,17 +244,12 @@ class OclcReport:
                 is_holding_set = content['holdingCurrentlySet']
                 check_url      = content['id']
                 institution    = content['institution']
-                return_str     = f"?{title} is {institution} holding: {is_holding_set} as of '{updated}'"
                 self.holdings['success'] += 1
                 if is_holding_set:
-                    if old_num == new_num:
-                        return_str += f"  OCLC number confirmed"
-                    else:
+                    if old_num != new_num:
                         self.updates_dict[str(old_num)] = str(new_num)
-                        return_str += f"  OCLC number updated to {new_num}"
                         self.holdings['warnings'] += 1
-                return_str += f" See {check_url} for more information."
-                results.append(return_str)
+                results.append(Outcome(title, '?', 'set' if is_holding_set else 'unset', new_num, institution, updated, check_url))
                 self.holdings['total'] += 1
             except KeyError as ex:
                 try:
@@ -130,10 +258,10 @@ class OclcReport:
                     reported_error = f"JSON: {json_data}"
                 msg = f"check response failed on {ex} attribute.\n{reported_error}\n"
                 self.print_or_log(msg, 'error')
-                results.append(msg)
+                results.append(Outcome('', '?', 'error', detail=msg))
                 # There was a problem with the web service so stop processing.
                 b_result = False
-        # self.print_or_log(results)
+        self._emit_(results)
         return b_result, results
 
     # Parses the response from the OCLC set holdings request.
@@ -154,6 +282,7 @@ class OclcReport:
                 msg = f"set failed!"
             self.print_or_log(msg, 'error')
             self.adds['errors'] += 1
+            self._emit_error_('+', code, json_data)
             return False
         b_result= True
         if json_data:
@@ -165,18 +294,16 @@ class OclcReport:
                     title   = entry['title']
                     old_num = entry['content']['requestedOclcNumber']
                     new_num = entry['content']['currentOclcNumber']
-                    return_str = f"+{title}"
+                    updated = _timestamp_(entry.get('updated'))
                     if old_num == new_num:
-                        return_str += f"  added. See http://worldcat.org/oclc/{old_num}"
+                        results.append(Outcome(title, '+', 'success', new_num, timestamp=updated))
                         self.adds['success'] += 1
                     else:
-                        return_str += f"  updated to {new_num}. See http://worldcat.org/oclc/{new_num}"
                         self.updates_dict[str(old_num)] = str(new_num)
                         detail = entry['content']['detail']
                         if detail:
-                            return_str += f", {detail}"
                             self.adds['warnings'] += 1
-                    results.append(return_str)
+                        results.append(Outcome(title, '+', 'updated', new_num, detail, updated))
                     self.adds['total'] += 1
             except KeyError as ex:
                 try:
@@ -186,9 +313,9 @@ class OclcReport:
                 msg = f"set response failed on {ex} attribute.\n{reported_error}\n"
                 self.print_or_log(msg, 'error')
                 self.adds['errors'] += 1
-                results.append(msg)
+                results.append(Outcome('', '+', 'error', detail=msg))
                 b_result = False
-        # self.print_or_log(results)
+        self._emit_(results)
         return b_result, results
 
     # Checks the results of the delete transaction.
@@ -210,6 +337,7 @@ class OclcReport:
                 msg = f"delete failed!"
             self.print_or_log(msg, 'error')
             self.dels['errors'] += 1
+            self._emit_error_('-', code, json_data)
             return False
         # Otherwise carry on parsing results.
         results = []
@@ -223,17 +351,15 @@ class OclcReport:
                     title   = entry['title']
                     old_num = entry['content']['requestedOclcNumber']
                     new_num = entry['content']['currentOclcNumber']
-                    return_str = f"-{title}"
+                    updated = _timestamp_(entry.get('updated'))
                     if old_num == new_num:
-                        return_str += f"  deleted"
+                        results.append(Outcome(title, '-', 'success', new_num, timestamp=updated))
                         self.dels['success'] += 1
                     else:
-                        return_str += f"  updated to {new_num}"
                         detail = entry['content']['detail']
                         if detail:
-                            return_str += f", {detail}"
                             self.dels['warnings'] += 1
-                    results.append(return_str)
+                        results.append(Outcome(title, '-', 'updated', new_num, detail, updated))
                     self.dels['total'] += 1
             except KeyError as ex:
                 try:
@@ -243,17 +369,22 @@ class OclcReport:
                 msg = f"delete response failed on {ex} attribute.\n{reported_error}\n"
                 self.print_or_log(msg, 'error')
                 self.dels['errors'] += 1
-                results.append(msg)
+                results.append(Outcome('', '-', 'error', detail=msg))
                 b_result = False
-        # self.print_or_log(results)
+        self._emit_(results)
         return b_result, results
 
     # Parses an expected (XML) web service result.  
-    def create_bib_response(self, response, debug:bool=False):
+    # param: response str XML returned from the web service.
+    # param: debug bool value true if you want more messaging and false for less.
+    # param: code int HTTP status code of the response. Default 200.
+    # returns: True if successful and False otherwise.
+    def create_bib_response(self, response, debug:bool=False, code:int=200):
         # Should see this in the response.
         # <controlfield tag="004">99999999999999999999999</controlfield>
         # TODO: use beautiful soup to convert the response. 
-        if not response:
+        self.bibs['total'] += 1
+        if not response or code < 200 or code > 207:
             self.bibs['errors'] += 1
             return False
         if debug:
@@ -264,6 +395,19 @@ class OclcReport:
         self.bibs['errors'] += 1
         return False
 
+    # Finds the OCLC number OCLC assigned to a newly created bib record.
+    # The number is in the '001' of the returned record, like
+    # <controlfield tag="001">ocn311684437</controlfield>
+    # param: response str XML returned from the web service.
+    # return: str of the OCLC number digits or an empty string if not found.
+    def get_bib_oclc_number(self, response:str) -> str:
+        if not response:
+            return ''
+        num_match = re.search(r'<(?:\w+:)?controlfield tag="001">\D*(\d+)\s*</', response)
+        if num_match:
+            return num_match.group(1)
+        return ''
+
     # Returns the checks result tally dictionary. 
     # return: dictionary of check tally results.
     def get_check_results(self) ->dict:
@@ -141,4 +141,71 @@ Test the create bib response method
 ... </record>"""
 >>> report = OclcReport()
 >>> report.create_bib_response(response_rec)
-True
\ No newline at end of file
+True
+
+Test structured outcomes
+------------------------
+
+Responses are parsed into Outcome records which only render the
+human-readable text when printed.
+
+>>> from oclcreport import Outcome, OutcomeSink, read_outcomes
+>>> import os
+>>> went_okay, outcomes = OclcReport().delete_response(207, check_response)
+>>> outcomes[1].as_dict()['number'], outcomes[1].status, outcomes[1].new_number, outcomes[1].timestamp
+('67890', 'updated', '6777790', '2023-03-21 23:17:51')
+>>> print(outcomes[1])
+-67890  updated to 6777790, Record found.
+
+>>> holding = json.loads("""{"title": "46629055",
+...   "content": {"requestedOclcNumber": "46629055", "currentOclcNumber": "46629099",
+...     "institution": "CNEDM", "holdingCurrentlySet": true, "id": "http://worldcat.org/oclc/46629099"},
+...   "updated": "2023-04-20T22:38:06.540Z"}""")
+>>> report = OclcReport()
+>>> went_okay, outcomes = report.check_holdings_response(200, holding)
+>>> outcomes[0].as_tuple()
+('46629055', '?', 'set', '46629099', 'CNEDM', '2023-04-20 22:38:06', 'http://worldcat.org/oclc/46629099')
+>>> print(outcomes[0])
+?46629055 is CNEDM holding: True as of '2023-04-20 22:38:06'  OCLC number updated to 46629099 See http://worldcat.org/oclc/46629099 for more information.
+>>> report.get_updated()
+{'46629055': '46629099'}
+
+Outcomes, including failed requests, are written to a sink as they are parsed.
+
+>>> sink = OutcomeSink('test_outcomes.jsonl')
+>>> report = OclcReport(sink=sink)
+>>> went_okay, outcomes = report.delete_response(207, check_response)
+>>> report.set_response(404, '')
+False
+>>> sink.close()
+>>> [(o.number, o.action, o.status) for o in read_outcomes('test_outcomes.jsonl')]
+[('12345', '-', 'success'), ('67890', '-', 'updated'), ('999999999', '-', 'success'), ('', '+', 'error')]
+>>> sink = OutcomeSink('test_outcomes.tsv')
+>>> OclcReport(sink=sink).check_holdings_response(200, holding)
+(True, ["?46629055 is CNEDM holding: True as of '2023-04-20 22:38:06'  OCLC number updated to 46629099 See http://worldcat.org/oclc/46629099 for more information."])
+>>> sink.close()
+>>> with open('test_outcomes.tsv') as f:
+...     f.read()
+'46629055\t?\tset\t46629099\tCNEDM\t2023-04-20 22:38:06\thttp://worldcat.org/oclc/46629099\n'
+>>> [o.as_tuple() for o in read_outcomes('test_outcomes.tsv')]
+[('46629055', '?', 'set', '46629099', 'CNEDM', '2023-04-20 22:38:06', 'http://worldcat.org/oclc/46629099')]
+
+The check's text uses the URL OCLC sent.
+
+>>> holding['content']['id'] = 'https://www.worldcat.org/oclc/46629099'
+>>> print(OclcReport().check_holdings_response(200, holding)[1][0])
+?46629055 is CNEDM holding: True as of '2023-04-20 22:38:06'  OCLC number updated to 46629099 See https://www.worldcat.org/oclc/46629099 for more information.
+
+Errors, with their tabs and line breaks, read back as they were written.
+
+>>> sink = OutcomeSink('test_outcomes.tsv')
+>>> report = OclcReport(sink=sink)
+>>> went_okay, outcomes = report.check_holdings_response(200, {'title': '1', 'updated': '2023-04-20T22:38:06.540Z', 'content': {}})
+>>> sink.write([Outcome('', '+', 'error', detail='a\tb\r\nc')])
+>>> sink.close()
+>>> [o.detail for o in read_outcomes('test_outcomes.tsv')][1:] == [outcomes[0].detail, 'a\tb\r\nc']
+True
+>>> [(o.number, o.action, o.status) for o in read_outcomes('test_outcomes.tsv')]
+[('46629055', '?', 'set'), ('', '?', 'error'), ('', '+', 'error')]
+>>> os.remove('test_outcomes.jsonl')
+>>> os.remove('test_outcomes.tsv')
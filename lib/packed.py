@@ -0,0 +1,253 @@
+###############################################################################
+#
+# Purpose: Compact binary instruction files that are read in place.
+# Date:    Sun Oct 25 14:36:09 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import os
+import sys
+import mmap
+import struct
+from array import array
+from os import linesep
+from os.path import exists
+from itertools import compress
+try:
+    from lib.compressed import open_text, get_compression
+except ModuleNotFoundError:
+    from compressed import open_text, get_compression
+
+# A packed instruction file is a header, then every OCLC number as an
+# unsigned 64 bit little endian integer, then every number's action as one
+# byte. Instructions are sorted by action, then number, and the header holds
+# where each action's numbers start and how many there are:
+#
+#   magic 'OCLCINS\0', version, count, then (start, count) of '+', '-', '?', '!', ' '.
+#
+# The file is memory mapped, so an action's numbers are read without copying
+# or parsing the file, and an instruction is marked done by changing its
+# action byte to '!' in place. A number marked done stays in its action's
+# range, so a range is checked for done numbers before it is returned.
+MAGIC    = b'OCLCINS\x00'
+VERSION  = 1
+ACTIONS  = ('+', '-', '?', '!', ' ')
+HEADER   = struct.Struct('<8sIQ' + 'QQ' * len(ACTIONS))
+# Numbers start on an 8 byte boundary.
+DATA_START = (HEADER.size + 7) // 8 * 8
+DONE     = ord('!')
+# Packed files are named like 'master.bin'.
+PACKED_EXT = '.bin'
+
+# Returns True if the file is a packed instruction file.
+def is_packed(path:str) -> bool:
+    if get_compression(path) or not exists(path):
+        return False
+    with open(path, mode='rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def _to_little_endian_(numbers:array) -> array:
+    if sys.byteorder != 'little':
+        numbers = array('Q', numbers)
+        numbers.byteswap()
+    return numbers
+
+# Writes a packed instruction file.
+# param: path str file to write.
+# param: instructions list of instructions like '+1234', in any order.
+#   Numbers that aren't numbers raise ValueError.
+# return: int count of instructions written.
+def write_packed(path:str, instructions:list) -> int:
+    grouped = dict((action, []) for action in ACTIONS)
+    for instruction in instructions:
+        action = instruction[:1]
+        if action not in grouped:
+            raise ValueError(f"unknown action in instruction '{instruction}'.")
+        grouped[action].append(int(instruction[1:]))
+    numbers = array('Q')
+    actions = bytearray()
+    ranges  = []
+    for action in ACTIONS:
+        group = sorted(set(grouped[action]))
+        ranges.extend((len(numbers), len(group)))
+        numbers.extend(group)
+        actions.extend(action.encode('ascii') * len(group))
+    header = HEADER.pack(MAGIC, VERSION, len(numbers), *ranges)
+    # Written beside and moved in place, so a reader never maps half a file.
+    temp_path = path + '.tmp'
+    with open(temp_path, mode='wb') as f:
+        f.write(header.ljust(DATA_START, b'\x00'))
+        f.write(_to_little_endian_(numbers).tobytes())
+        f.write(actions)
+    os.replace(temp_path, path)
+    return len(numbers)
+
+# Reads, and marks done, the instructions in a packed file.
+#
+#   with PackedInstructions('master.bin') as packed:
+#       numbers = packed.read_numbers('+')
+#       packed.mark_done(numbers[:100])
+class PackedInstructions:
+
+    # param: path str packed file to open.
+    # param: writable bool True to mark instructions done in place.
+    def __init__(self, path:str, writable:bool=False):
+        self.path     = path
+        self.writable = writable
+        self.file     = open(path, mode='r+b' if writable else 'rb')
+        self.map      = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        if len(self.map) < DATA_START or self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"'{path}' isn't a packed instruction file.")
+        fields = HEADER.unpack_from(self.map, 0)
+        if fields[1] != VERSION:
+            self.close()
+            raise ValueError(f"'{path}' is a version {fields[1]} packed instruction file, expected version {VERSION}.")
+        self.count  = fields[2]
+        self.ranges = dict((action, (fields[3 + 2 * i], fields[4 + 2 * i])) for (i, action) in enumerate(ACTIONS))
+        numbers_end = DATA_START + 8 * self.count
+        if len(self.map) < numbers_end + self.count:
+            self.close()
+            raise ValueError(f"'{path}' is truncated.")
+        self.numbers = memoryview(self.map)[DATA_START:numbers_end].cast('Q')
+        self.actions = memoryview(self.map)[numbers_end:numbers_end + self.count]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _numbers_(self, start:int, end:int) -> list:
+        if sys.byteorder == 'little':
+            return self.numbers[start:end].tolist()
+        numbers = array('Q', self.numbers[start:end].tobytes())
+        numbers.byteswap()
+        return numbers.tolist()
+
+    # Returns the numbers of an action, like InstructionManager.read_instruction_numbers().
+    # param: action str '+', '-', '?', '!', or ' '.
+    # return: list of numbers as strings, in order.
+    def read_numbers(self, action:str) -> list:
+        code = ord(action)
+        if action == '!':
+            # Done numbers are the '!' range and any marked done in place.
+            actions = bytes(self.actions)
+            if actions.count(DONE) == self.ranges['!'][1]:
+                (start, count) = self.ranges['!']
+                return list(str(number) for number in self._numbers_(start, start + count))
+            done = sorted(compress(self._numbers_(0, self.count), (byte == DONE for byte in actions)))
+            return list(str(number) for number in done)
+        (start, count) = self.ranges[action]
+        numbers = self._numbers_(start, start + count)
+        actions = bytes(self.actions[start:start + count])
+        if actions.count(code) != count:
+            numbers = compress(numbers, (byte == code for byte in actions))
+        return list(str(number) for number in numbers)
+
+    # Returns every instruction, like the lines of a text instruction file.
+    def instructions(self):
+        for (index, number) in enumerate(self._numbers_(0, self.count)):
+            yield f"{chr(self.actions[index])}{number}"
+
+    # Finds a number in an action's range.
+    # return: int index of the number, or -1 if it isn't there.
+    def _find_(self, action:str, number:int) -> int:
+        (low, high) = self.ranges[action]
+        high += low
+        while low < high:
+            middle = (low + high) // 2
+            if self._number_at_(middle) < number:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.ranges[action][0] + self.ranges[action][1] and self._number_at_(low) == number:
+            return low
+        return -1
+
+    def _number_at_(self, index:int) -> int:
+        if sys.byteorder == 'little':
+            return self.numbers[index]
+        return int.from_bytes(self.numbers[index].to_bytes(8, sys.byteorder), 'little')
+
+    # Marks instructions done, in place, by changing their action to '!'.
+    # Each change is one byte, so the cost is in proportion to the numbers
+    # marked, not the size of the file.
+    # param: numbers list of numbers, as strings or integers.
+    # param: actions str the actions the numbers may have. Default any.
+    # return: int count of instructions marked done.
+    def mark_done(self, numbers:list, actions:str='+-? ') -> int:
+        if not self.writable:
+            raise ValueError(f"'{self.path}' was opened read only.")
+        marked = 0
+        for number in numbers:
+            number = int(number)
+            for action in actions:
+                index = self._find_(action, number)
+                if index >= 0 and self.actions[index] != DONE:
+                    self.actions[index] = DONE
+                    marked += 1
+        return marked
+
+    def flush(self):
+        if self.writable:
+            self.map.flush()
+
+    def close(self):
+        if getattr(self, 'numbers', None) is not None:
+            self.numbers.release()
+            self.actions.release()
+            self.numbers = None
+            self.actions = None
+        if not self.map.closed:
+            self.flush()
+            self.map.close()
+        self.file.close()
+
+# Reads the instructions of a file, packed or text, one at a time.
+# param: path str instruction file.
+# return: generator of instructions like '+1234'.
+def iter_instructions(path:str):
+    if is_packed(path):
+        with PackedInstructions(path) as packed:
+            yield from packed.instructions()
+        return
+    with open_text(path, mode='r') as f:
+        for line in f:
+            line = line.rstrip()
+            if line:
+                yield line
+
+# Converts an instruction file from text to packed, or back.
+# param: source str instruction file, packed or text.
+# param: target str file to write, packed if it ends in '.bin'.
+# return: int count of instructions written.
+def convert(source:str, target:str) -> int:
+    if target.endswith(PACKED_EXT):
+        return write_packed(target, list(iter_instructions(source)))
+    count = 0
+    with open_text(target, mode='w') as f:
+        for instruction in iter_instructions(source):
+            f.write(instruction + linesep)
+            count += 1
+    return count
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("packed.tst")
+# EOF
@@ -0,0 +1,108 @@
+Test packed instruction files.
+------------------------------
+
+>>> from packed import write_packed, is_packed, PackedInstructions, iter_instructions, convert, DATA_START
+>>> import os
+
+Instructions are written in any order and sorted by action, then number.
+
+>>> write_packed('test_master.bin', ['+1234', '-99', '?5678', '+12', '!777', ' 4321', '+1234000000000'])
+7
+>>> is_packed('test_master.bin'), os.path.getsize('test_master.bin') == DATA_START + 7 * 9
+(True, True)
+>>> with PackedInstructions('test_master.bin') as packed:
+...     len(packed), packed.read_numbers('+'), packed.read_numbers('-'), packed.read_numbers('?'), packed.read_numbers('!'), packed.read_numbers(' ')
+(7, ['12', '1234', '1234000000000'], ['99'], ['5678'], ['777'], ['4321'])
+>>> list(iter_instructions('test_master.bin'))
+['+12', '+1234', '+1234000000000', '-99', '?5678', '!777', ' 4321']
+
+Numbers are marked done in place, one byte each, and then read as done.
+
+>>> with PackedInstructions('test_master.bin', writable=True) as packed:
+...     packed.mark_done(['1234', 99, '31337'])
+2
+>>> with PackedInstructions('test_master.bin') as packed:
+...     packed.read_numbers('+'), packed.read_numbers('-'), packed.read_numbers('!')
+(['12', '1234000000000'], [], ['99', '777', '1234'])
+
+A file opened to read can't be changed.
+
+>>> with PackedInstructions('test_master.bin') as packed:
+...     packed.mark_done(['12'])
+Traceback (most recent call last):
+...
+ValueError: 'test_master.bin' was opened read only.
+
+Text files aren't packed, and bad instructions aren't written.
+
+>>> with open('test_master.lst', mode='w') as f:
+...     _ = f.write('+1234\n?5678\n!42\n')
+>>> is_packed('test_master.lst'), is_packed('no_such_file.bin')
+(False, False)
+>>> write_packed('test_bad.bin', ['+12a'])
+Traceback (most recent call last):
+...
+ValueError: invalid literal for int() with base 10: '12a'
+>>> PackedInstructions('test_master.lst')
+Traceback (most recent call last):
+...
+ValueError: 'test_master.lst' isn't a packed instruction file.
+
+Files are converted to packed and back.
+
+>>> convert('test_master.lst', 'test_converted.bin'), convert('test_converted.bin', 'test_converted.lst')
+(3, 3)
+>>> with open('test_converted.lst') as f:
+...     f.read().splitlines()
+['+1234', '?5678', '!42']
+
+The instruction manager reads and writes packed files like text ones.
+
+>>> from listutils import InstructionManager
+>>> manager = InstructionManager('test_managed.bin')
+>>> manager.write_instructions(['+1234', '-5678', '?42'])
+>>> manager.is_packed(), manager.read_instruction_numbers('-')
+(True, ['5678'])
+
+The manager marks instructions done in place, in packed files, and in text
+files if it read them with in_place. Only the action of each line changes,
+so the file is the same size, and lines that aren't done are untouched.
+
+>>> manager.can_mark_in_place(), manager.mark_done(['5678', '42'])
+(True, 2)
+>>> manager.read_instruction_numbers('!')
+['42', '5678']
+>>> with open('test_in_place.lst', mode='w') as f:
+...     _ = f.write('+1234\n-5678\n 999\n+5678\n?42\n!7\n')
+>>> size = os.path.getsize('test_in_place.lst')
+>>> text = InstructionManager('test_in_place.lst', remap={'1234': '1000'}, in_place=True)
+>>> list(text.read_instruction_numbers(action) for action in '+-?!')
+[['1000', '5678'], ['5678'], ['42'], ['7']]
+>>> text.mark_done(['1000', '5678'])
+3
+>>> with open('test_in_place.lst') as f:
+...     f.read().splitlines()
+['!1234', '!5678', ' 999', '!5678', '?42', '!7']
+>>> os.path.getsize('test_in_place.lst') == size
+True
+
+Files that aren't sorted are marked too.
+
+>>> with open('test_in_place.lst', mode='w') as f:
+...     _ = f.write('+300\n+100\n+200\n+100\n')
+>>> text = InstructionManager('test_in_place.lst', in_place=True)
+>>> text.read_instruction_numbers('+')
+['300', '100', '200', '100']
+>>> text.mark_done(['100']), text.mark_done(['300'])
+(2, 1)
+>>> with open('test_in_place.lst') as f:
+...     f.read().splitlines()
+['!300', '!100', '+200', '!100']
+
+Compressed files can only be written again.
+
+>>> InstructionManager('test_in_place.lst.gz', in_place=True).can_mark_in_place()
+False
+>>> for name in ('test_master.bin', 'test_master.lst', 'test_converted.bin', 'test_converted.lst', 'test_managed.bin',
+...   'test_in_place.lst'):
+...     os.remove(name)
@@ -0,0 +1,181 @@
+###############################################################################
+#
+# Purpose: Plan the web service hits, time, and memory a run will take.
+# Date:    Mon Oct 26 15:07:38 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+from os import linesep
+from os.path import splitext
+from datetime import datetime
+try:
+    from lib.scheduler import BATCH_SIZES, DEFAULT_POLICY
+    from lib.compressed import open_text, plain_name, get_compression
+    from lib.packed import iter_instructions, is_packed
+    from lib.progress import format_duration
+except ModuleNotFoundError:
+    from scheduler import BATCH_SIZES, DEFAULT_POLICY
+    from compressed import open_text, plain_name, get_compression
+    from packed import iter_instructions, is_packed
+    from progress import format_duration
+
+# Seconds a hit is expected to take if there are no runs to go by. Hits
+# are sent several at a time, so this is less than one request's latency.
+DEFAULT_SECONDS_PER_HIT = 0.5
+# Peak memory --run uses for each instruction in the file, as measured
+# reading, scheduling, and merging a 100k instruction file.
+BYTES_PER_INSTRUCTION = 320
+# Runs in the history the rate is taken from.
+RECENT_RUNS = 10
+
+# Returns the hits needed to send a count of numbers of an action.
+def hits_for(action:str, count:int) -> int:
+    size = BATCH_SIZES[action]
+    return (count + size - 1) // size
+
+# Returns the seconds a hit took in recent runs, from their start and
+# finish times and the outcomes recorded.
+# param: history HistoryStore of the runs.
+# param: runs int recent runs to look at.
+# return: tuple of (float seconds a hit, int runs it is taken from), or
+#   (None, 0) if no finished run sent anything.
+def observed_seconds_per_hit(history, runs:int=RECENT_RUNS) -> tuple:
+    hits    = 0
+    seconds = 0.0
+    counted = 0
+    for run in history.get_runs(runs):
+        if not run['finished']:
+            continue
+        run_hits = sum(hits_for(action, sum(statuses.values()))
+            for (action, statuses) in history.run_summary(run['run_id']).items() if action in BATCH_SIZES)
+        if not run_hits:
+            continue
+        started  = datetime.strptime(run['started'], '%Y-%m-%d %H:%M:%S')
+        finished = datetime.strptime(run['finished'], '%Y-%m-%d %H:%M:%S')
+        hits    += run_hits
+        seconds += (finished - started).total_seconds()
+        counted += 1
+    if not hits:
+        return None, 0
+    return seconds / hits, counted
+
+# Plans a run of an instruction file.
+# param: counts dict of {action: count} as InstructionManager.count_instructions() returns.
+# param: hits_quota int optional hits a run may use, 'hitsQuota'.
+# param: hits_per_day int optional hits a day, 'hitsPerDay', or 'hitsQuota' if not given.
+# param: policy str order the actions are sent, 'hitsPolicy'.
+# param: seconds_per_hit float seconds a hit is expected to take.
+# return: dict of the plan, see format_plan().
+def make_plan(counts:dict, hits_quota:int=None, hits_per_day:int=None, policy:str=DEFAULT_POLICY,
+  seconds_per_hit:float=DEFAULT_SECONDS_PER_HIT) -> dict:
+    actions = {}
+    for action in policy:
+        if action in BATCH_SIZES:
+            hits = hits_for(action, counts.get(action, 0))
+            actions[action] = {'numbers': counts.get(action, 0), 'hits': hits, 'seconds': hits * seconds_per_hit}
+    total = sum(plan['hits'] for plan in actions.values())
+    per_day = hits_per_day if hits_per_day else hits_quota
+    return {
+        'actions': actions,
+        'hits': total,
+        'seconds': total * seconds_per_hit,
+        'seconds_per_hit': seconds_per_hit,
+        'hits_quota': hits_quota,
+        'fits': None if hits_quota is None else total <= int(hits_quota),
+        'hits_per_day': per_day,
+        'days': None if not per_day else (total + int(per_day) - 1) // int(per_day),
+        'memory': sum(counts.values()) * BYTES_PER_INSTRUCTION,
+        # Never sent, like done instructions, and actions left out of the policy.
+        'unsent': dict((action, count) for (action, count) in counts.items() if count and action not in actions),
+        'instructions': sum(counts.values()),
+    }
+
+# Returns the lines of a plan to print.
+def format_plan(plan:dict) -> list:
+    lines = []
+    for (action, step) in plan['actions'].items():
+        lines.append(f"'{action}' {step['numbers']} numbers, {step['hits']} hits, {format_duration(step['seconds'])}")
+    if plan['unsent']:
+        lines.append('not sent: ' + ', '.join(f"'{action}' {count}" for (action, count) in plan['unsent'].items()))
+    lines.append(f"total {plan['hits']} hits, {format_duration(plan['seconds'])} at {plan['seconds_per_hit']:.3f}s a hit")
+    if plan['fits'] is not None:
+        lines.append(f"hitsQuota {plan['hits_quota']}: " + ('fits' if plan['fits'] else f"doesn't fit, {plan['hits'] - int(plan['hits_quota'])} hits over"))
+    if plan['days'] is not None:
+        lines.append(f"{plan['days']} day{'s' if plan['days'] != 1 else ''} at {plan['hits_per_day']} hits a day")
+    lines.append(f"memory about {plan['memory'] / 1048576:.1f} MB for {plan['instructions']} instructions")
+    return lines
+
+# Returns the name of a day's instruction file, like 'master.day02.lst'
+# for 'master.lst'. Compressed files' days are compressed too, with gzip
+# in place of zip, and a packed file's days are text.
+def day_path(path:str, day:int) -> str:
+    (stem, ext) = splitext(plain_name(path))
+    if is_packed(path):
+        ext = '.lst'
+    compression = get_compression(path)
+    if compression == '.zip':
+        compression = '.gz'
+    return f"{stem}.day{day:02d}{ext}{compression}"
+
+# Splits an instruction file into a file for each day, each a day's hits
+# in policy order, as HitScheduler would schedule them a day at a time.
+# The file is read once. Instructions that aren't sent, like '!' and ' ',
+# are left out.
+# param: path str instruction file, text or packed.
+# param: counts dict of {action: count} in the file.
+# param: hits_per_day int hits a day.
+# param: policy str order the actions are sent.
+# return: list of the files written, in day order.
+def split_by_day(path:str, counts:dict, hits_per_day:int, policy:str=DEFAULT_POLICY) -> list:
+    hits_per_day = int(hits_per_day)
+    # The hit each action's numbers start at.
+    start = {}
+    hits  = 0
+    for action in policy:
+        if action in BATCH_SIZES:
+            start[action] = hits
+            hits += hits_for(action, counts.get(action, 0))
+    seen    = dict((action, 0) for action in start)
+    current = {}
+    files   = {}
+    written = []
+    try:
+        for instruction in iter_instructions(path):
+            action = instruction[:1]
+            if action not in start:
+                continue
+            day = (start[action] + seen[action] // BATCH_SIZES[action]) // hits_per_day + 1
+            seen[action] += 1
+            # Each action's days only go up, so a day's file is closed once
+            # no action is on it.
+            previous = current.get(action)
+            current[action] = day
+            if previous is not None and previous != day and previous not in current.values():
+                files.pop(previous).close()
+            if day not in files:
+                name = day_path(path, day)
+                files[day] = open_text(name, mode='a' if day in written else 'w')
+                if day not in written:
+                    written.append(day)
+            files[day].write(instruction + linesep)
+    finally:
+        for f in files.values():
+            f.close()
+    return list(day_path(path, day) for day in sorted(written))
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("planner.tst")
+# EOF
@@ -0,0 +1,76 @@
+Test planning a run.
+--------------------
+
+>>> from planner import make_plan, format_plan, split_by_day, day_path, observed_seconds_per_hit
+>>> from listutils import InstructionManager
+>>> import os
+
+The instruction manager counts each action in one pass.
+
+>>> with open('test_plan.lst', mode='w') as f:
+...     for n in range(1, 121):
+...         _ = f.write(f"+{n}\n")
+...     for n in range(200, 230):
+...         _ = f.write(f"?{n}\n")
+...     _ = f.write('-500\n!600\n 700\n')
+>>> counts = InstructionManager('test_plan.lst').count_instructions()
+>>> counts
+{'+': 120, '-': 1, '?': 30, '!': 1, ' ': 1}
+
+Checks cost a hit a number, sets and unsets a hit for up to 50.
+
+>>> plan = make_plan(counts, hits_quota=20, policy='-+?', seconds_per_hit=2.0)
+>>> for line in format_plan(plan):
+...     print(line)
+'-' 1 numbers, 1 hits, 0:00:02
+'+' 120 numbers, 3 hits, 0:00:06
+'?' 30 numbers, 30 hits, 0:01:00
+not sent: '!' 1, ' ' 1
+total 34 hits, 0:01:08 at 2.000s a hit
+hitsQuota 20: doesn't fit, 14 hits over
+2 days at 20 hits a day
+memory about 0.0 MB for 153 instructions
+>>> make_plan(counts, hits_quota=20, hits_per_day=40)['days']
+1
+
+The file is split into a day's hits each, in policy order, so each day's
+file can be run on its own day.
+
+>>> split_by_day('test_plan.lst', counts, 20, policy='-+?')
+['test_plan.day01.lst', 'test_plan.day02.lst']
+>>> for day in ('test_plan.day01.lst', 'test_plan.day02.lst'):
+...     plan = make_plan(InstructionManager(day).count_instructions(), policy='-+?')
+...     print(day, list((action, step['numbers'], step['hits']) for (action, step) in plan['actions'].items()))
+test_plan.day01.lst [('-', 1, 1), ('+', 120, 3), ('?', 16, 16)]
+test_plan.day02.lst [('-', 0, 0), ('+', 0, 0), ('?', 14, 14)]
+>>> day_path('master.lst.gz', 3), day_path('dumps/all.zip:master.lst', 1)
+('master.day03.lst.gz', 'dumps/master.day01.lst.gz')
+
+A packed file is split into text files.
+
+>>> from packed import convert
+>>> convert('test_plan.lst', 'test_plan.bin')
+153
+>>> packed_counts = InstructionManager('test_plan.bin').count_instructions()
+>>> packed_counts == counts
+True
+>>> split_by_day('test_plan.bin', packed_counts, 100)
+['test_plan.day01.lst']
+
+The rate is taken from the runs in the history.
+
+>>> from history import HistoryStore
+>>> from oclcreport import Outcome
+>>> history = HistoryStore('test_plan.db')
+>>> observed_seconds_per_hit(history)
+(None, 0)
+>>> _ = history.start_run('test_plan.lst', 'AAA')
+>>> history.write(list(Outcome(str(n), '+', 'success') for n in range(100)) + [Outcome('1', '?', 'set')])
+>>> history.finish_run()
+>>> _ = history.db.execute("UPDATE runs SET started = '2026-10-26 10:00:00', finished = '2026-10-26 10:00:30'")
+>>> observed_seconds_per_hit(history)
+(10.0, 1)
+>>> history.close()
+
+>>> for name in ('test_plan.lst', 'test_plan.day01.lst', 'test_plan.day02.lst', 'test_plan.bin', 'test_plan.db'):
+...     os.remove(name)
@@ -0,0 +1,245 @@
+###############################################################################
+#
+# Purpose: Profile the CPU time and memory of each phase of a run.
+# Date:    Fri Oct 23 14:02:51 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import sys
+import time
+import threading
+from os import linesep
+from os.path import basename
+from contextlib import contextmanager, nullcontext
+
+# The phases of a run, in the order they are reported.
+PHASES = ('parse', 'merge', 'upload', 'check', 'unset', 'set', 'write')
+
+# Formats a count of bytes, like '1.2 MiB'.
+def _size_str_(size:int) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024.0
+    return f"{size:.1f} GiB"
+
+# Samples the stacks of every thread, so time spent in worker threads, like
+# waiting on the network, shows up too. cProfile only sees the thread that
+# started it.
+class _Sampler:
+
+    def __init__(self, interval:float):
+        self.interval   = interval
+        self.samples    = 0
+        self.own_counts = {}
+        self.all_counts = {}
+        self.done       = threading.Event()
+        self.thread     = threading.Thread(target=self._run_, name='profile-sampler', daemon=True)
+
+    def _run_(self):
+        me = threading.get_ident()
+        while not self.done.wait(self.interval):
+            for (ident, frame) in sys._current_frames().items():
+                if ident == me:
+                    continue
+                self.samples += 1
+                seen = set()
+                leaf = True
+                while frame is not None:
+                    code = frame.f_code
+                    where = f"{basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+                    if leaf:
+                        self.own_counts[where] = self.own_counts.get(where, 0) + 1
+                        leaf = False
+                    if where not in seen:
+                        self.all_counts[where] = self.all_counts.get(where, 0) + 1
+                        seen.add(where)
+                    frame = frame.f_back
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.done.set()
+        self.thread.join()
+
+# Profiles named phases of a run: parse, merge, check, unset, set, and write.
+# Each phase is profiled with cProfile in the thread that runs it, sampled
+# across all threads, and traced with tracemalloc for its peak memory. The
+# profiles are written next to the log, '<prefix>.<phase>.prof' for pstats
+# or snakeviz, with a top-N summary of every phase in '<prefix>.profile.txt'.
+# A phase that runs more than once, like 'check' in a spool, adds up.
+#
+# Without a prefix the profiler is off, and a phase is a null context. The
+# profiling modules are only imported once a phase is profiled.
+#
+#   profiler = PhaseProfiler('oclc')
+#   with profiler.phase('merge'):
+#       ...
+#   profiler.close()
+class PhaseProfiler:
+
+    # param: prefix str path prefix of the files, or None to turn profiling off.
+    # param: top int lines of each summary.
+    # param: interval float seconds between samples of the threads' stacks.
+    # param: logger:Logger optional logging. The class will print if not supplied.
+    def __init__(self, prefix:str=None, top:int=20, interval:float=0.005, logger=None, debug:bool=False):
+        self.prefix   = prefix
+        self.top      = top
+        self.interval = interval
+        self.logger   = logger
+        self.debug    = debug
+        self.phases   = {}
+        self.active   = None
+        self.lock     = threading.Lock()
+
+    # Wrapper for the logger.
+    def print_or_log(self, message:str, to_stderr:bool=False):
+        if self.logger:
+            self.logger.logit(message, level='error' if to_stderr else 'info')
+        elif to_stderr:
+            sys.stderr.write(f"{message}" + linesep)
+        else:
+            print(f"{message}")
+
+    def is_enabled(self) -> bool:
+        return bool(self.prefix)
+
+    # Returns a context that profiles a phase. Phases don't nest: a phase
+    # started while another is running, in any thread, isn't profiled
+    # separately, its time counts to the running phase.
+    # param: name str phase name, like 'merge'.
+    def phase(self, name:str):
+        if not self.prefix:
+            return nullcontext()
+        with self.lock:
+            if self.active:
+                return nullcontext()
+            self.active = name
+        return self._profile_(name)
+
+    @contextmanager
+    def _profile_(self, name:str):
+        import cProfile
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        before = tracemalloc.take_snapshot()
+        sampler = _Sampler(self.interval)
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        sampler.start()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            sampler.stop()
+            seconds = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            grown = tracemalloc.take_snapshot().compare_to(before, 'lineno')
+            self._add_(name, profile, sampler, seconds, peak - base, grown)
+            with self.lock:
+                self.active = None
+
+    # Adds a run of a phase to its totals.
+    def _add_(self, name:str, profile, sampler:_Sampler, seconds:float, peak:int, grown:list):
+        import pstats
+        totals = self.phases.get(name)
+        if totals is None:
+            totals = {'calls': 0, 'seconds': 0.0, 'peak': 0, 'stats': None, 'samples': 0,
+                'own': {}, 'all': {}, 'grown': {}}
+            self.phases[name] = totals
+        totals['calls']   += 1
+        totals['seconds'] += seconds
+        totals['peak']     = max(totals['peak'], peak)
+        if totals['stats'] is None:
+            totals['stats'] = pstats.Stats(profile)
+        else:
+            totals['stats'].add(profile)
+        totals['samples'] += sampler.samples
+        for (counts, key) in ((sampler.own_counts, 'own'), (sampler.all_counts, 'all')):
+            for (where, count) in counts.items():
+                totals[key][where] = totals[key].get(where, 0) + count
+        for stat in grown:
+            if stat.size_diff > 0:
+                frame = stat.traceback[0]
+                where = f"{basename(frame.filename)}:{frame.lineno}"
+                totals['grown'][where] = totals['grown'].get(where, 0) + stat.size_diff
+
+    # Returns the phases profiled, with how many times each ran, the
+    # seconds they took, and their peak memory in bytes.
+    # return: dictionary of {phase: {'calls': int, 'seconds': float, 'peak': int}}.
+    def get_phases(self) -> dict:
+        return dict((name, {'calls': totals['calls'], 'seconds': totals['seconds'], 'peak': totals['peak']})
+            for (name, totals) in self._ordered_())
+
+    def _ordered_(self) -> list:
+        return sorted(self.phases.items(), key=lambda item: PHASES.index(item[0]) if item[0] in PHASES else len(PHASES))
+
+    # Returns the top-N summary of a phase.
+    def _summary_(self, name:str, totals:dict) -> str:
+        import io
+        lines = [f"=== phase '{name}': {totals['calls']} runs, {totals['seconds']:.3f}s, peak memory {_size_str_(totals['peak'])} above the start"]
+        stream = io.StringIO()
+        totals['stats'].stream = stream
+        totals['stats'].sort_stats('cumulative').print_stats(self.top)
+        lines.append(f"--- top {self.top} by cumulative time, in the thread that ran the phase")
+        lines.extend(line for line in stream.getvalue().splitlines() if line.strip())
+        lines.append(f"--- top {self.top} of {totals['samples']} samples, all threads, where the time was spent")
+        for (where, count) in sorted(totals['own'].items(), key=lambda item: -item[1])[:self.top]:
+            lines.append(f"{100.0 * count / max(1, totals['samples']):6.1f}%  {where}")
+        lines.append(f"--- top {self.top} lines by memory still held at the end of the phase")
+        for (where, size) in sorted(totals['grown'].items(), key=lambda item: -item[1])[:self.top]:
+            lines.append(f"{_size_str_(size):>12}  {where}")
+        return linesep.join(lines)
+
+    # Writes the profiles and the summary.
+    # return: list of paths written.
+    def write(self) -> list:
+        if not self.prefix or not self.phases:
+            return []
+        written = []
+        summaries = []
+        for (name, totals) in self._ordered_():
+            path = f"{self.prefix}.{name}.prof"
+            totals['stats'].dump_stats(path)
+            written.append(path)
+            summaries.append(self._summary_(name, totals))
+        path = f"{self.prefix}.profile.txt"
+        with open(path, encoding='utf-8', mode='w') as f:
+            f.write((linesep + linesep).join(summaries) + linesep)
+        written.append(path)
+        return written
+
+    # Writes the files, logs a line per phase, and stops tracing memory.
+    def close(self):
+        if not self.prefix:
+            return
+        written = self.write()
+        for (name, phase) in self.get_phases().items():
+            self.print_or_log(f"profile '{name}': {phase['calls']} runs, {phase['seconds']:.3f}s, peak memory {_size_str_(phase['peak'])}.")
+        if written:
+            self.print_or_log(f"wrote profiles to '{written[-1]}' and {len(written) - 1} '.prof' files.")
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("profiler.tst")
+# EOF
@@ -0,0 +1,58 @@
+Test profiling the phases of a run.
+-----------------------------------
+
+>>> from profiler import PhaseProfiler
+>>> import os
+>>> import time
+
+Off by default, a phase costs nothing.
+
+>>> profiler = PhaseProfiler()
+>>> profiler.is_enabled()
+False
+>>> with profiler.phase('merge'):
+...     _ = sorted(range(1000), reverse=True)
+>>> profiler.get_phases(), profiler.write()
+({}, [])
+
+With a prefix every phase is profiled, and runs of a phase add up.
+
+>>> profiler = PhaseProfiler('test_profile', top=5, interval=0.001)
+>>> def merge():
+...     return sorted(str(n) for n in range(20000))
+>>> for _ in range(2):
+...     with profiler.phase('merge'):
+...         numbers = merge()
+>>> with profiler.phase('check'):
+...     time.sleep(0.05)
+
+Phases don't nest, the inner phase counts to the outer one.
+
+>>> with profiler.phase('write'):
+...     with profiler.phase('merge'):
+...         pass
+>>> phases = profiler.get_phases()
+>>> list(phases), phases['merge']['calls'], phases['merge']['peak'] > 0
+(['merge', 'check', 'write'], 2, True)
+>>> phases['check']['seconds'] >= 0.05
+True
+
+Closing writes a profile per phase and the summary.
+
+>>> profiler.close() # doctest: +ELLIPSIS
+profile 'merge': 2 runs, ...
+profile 'check': 1 runs, ...
+profile 'write': 1 runs, ...
+wrote profiles to 'test_profile.profile.txt' and 3 '.prof' files.
+>>> with open('test_profile.profile.txt') as f:
+...     summary = f.read()
+>>> summary.startswith("=== phase 'merge': 2 runs")
+True
+>>> 'merge' in summary.split("=== phase 'check'")[0]
+True
+>>> import pstats
+>>> pstats.Stats('test_profile.merge.prof').total_calls > 0
+True
+>>> for name in ('merge', 'check', 'write'):
+...     os.remove(f"test_profile.{name}.prof")
+>>> os.remove('test_profile.profile.txt')
@@ -0,0 +1,152 @@
+###############################################################################
+#
+# Purpose: Report the progress of a run, and when it should finish.
+# Date:    Mon Oct 26 10:41:52 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import sys
+import time
+import threading
+from collections import deque
+try:
+    from lib.scheduler import BATCH_SIZES
+except ModuleNotFoundError:
+    from scheduler import BATCH_SIZES
+
+# Progress is an outcome sink, so it is told about every response as it is
+# handled, but it only counts them. A report is written every 'interval'
+# seconds, never per number:
+#
+#   + 1200/5000  - 50/50  ? 300/1000  hits 325/1000  6.20 hits/s  ETA 0:01:50
+#
+# On a terminal the report is one line, written over in place. Otherwise,
+# like under cron, it is logged as a line of its own, less often.
+class Progress:
+
+    # param: planned dict of {action: count of numbers scheduled}.
+    # param: hits_quota int optional hits the run may use.
+    # param: logger:Logger optional, where reports go if not on a terminal.
+    #   Reports are printed if not supplied.
+    # param: out file the terminal line is written to, default stderr.
+    # param: interactive bool True to write over one line. Default True if
+    #   'out' is a terminal.
+    # param: interval float seconds between reports. Default 1 on a
+    #   terminal, 60 otherwise.
+    # param: clock function that returns the time in seconds.
+    def __init__(self, planned:dict, hits_quota:int=None, logger=None, out=None, interactive:bool=None,
+      interval:float=None, clock=time.monotonic):
+        self.planned     = dict((action, count) for (action, count) in planned.items() if count)
+        self.hits_quota  = None if hits_quota is None else int(hits_quota)
+        self.logger      = logger
+        self.out         = out if out is not None else sys.stderr
+        self.interactive = interactive if interactive is not None else self.out.isatty()
+        self.interval    = interval if interval else (1.0 if self.interactive else 60.0)
+        self.clock       = clock
+        self.started     = clock()
+        self.done        = dict((action, 0) for action in self.planned)
+        self.errors      = 0
+        # (time, hits) of recent reports, for the current rate.
+        self.samples     = deque([(self.started, 0)], maxlen=10)
+        self.width       = 0
+        self.lock        = threading.Lock()
+        self.stopped     = threading.Event()
+        self.reporter    = None
+
+    # Counts outcomes as they are handled, see OclcReport.
+    # param: outcomes list of Outcome objects.
+    def write(self, outcomes:list):
+        with self.lock:
+            for outcome in outcomes:
+                if outcome.status == 'error':
+                    self.errors += 1
+                elif outcome.action in self.done:
+                    self.done[outcome.action] += 1
+
+    # Returns the hits used so far, a hit for each batch of numbers done.
+    def get_hits(self) -> int:
+        with self.lock:
+            return sum((count + BATCH_SIZES[action] - 1) // BATCH_SIZES[action] for (action, count) in self.done.items())
+
+    # Returns the hits the run is planned to use.
+    def get_planned_hits(self) -> int:
+        return sum((count + BATCH_SIZES[action] - 1) // BATCH_SIZES[action] for (action, count) in self.planned.items())
+
+    # Returns a one line report of the progress so far.
+    def render(self) -> str:
+        now  = self.clock()
+        hits = self.get_hits()
+        (since, hits_then) = self.samples[0]
+        self.samples.append((now, hits))
+        rate = (hits - hits_then) / (now - since) if now > since else 0.0
+        left = self.get_planned_hits() - hits
+        with self.lock:
+            counts = '  '.join(f"{action} {self.done[action]}/{self.planned[action]}" for action in self.planned)
+            errors = self.errors
+        line = f"{counts}  hits {hits}"
+        if self.hits_quota is not None:
+            line += f"/{self.hits_quota}"
+        line += f"  {rate:.2f} hits/s"
+        if left <= 0:
+            line += '  ETA 0:00:00'
+        elif rate > 0:
+            line += f"  ETA {format_duration(left / rate)}"
+        else:
+            line += '  ETA --:--:--'
+        if errors:
+            line += f"  {errors} errors"
+        return line
+
+    # Writes a report, over the last one on a terminal.
+    def report(self):
+        line = self.render()
+        if self.interactive:
+            # Spaces clear what is left of a longer line.
+            self.out.write('\r' + line.ljust(self.width))
+            self.out.flush()
+            self.width = len(line)
+        elif self.logger:
+            self.logger.logit(f"progress: {line}", include_timestamp=True)
+        else:
+            print(f"progress: {line}")
+
+    # Reports every 'interval' seconds until closed.
+    def start(self):
+        def keep_reporting():
+            while not self.stopped.wait(self.interval):
+                self.report()
+        self.reporter = threading.Thread(target=keep_reporting, name='progress', daemon=True)
+        self.reporter.start()
+
+    # Stops the reports and writes a last one.
+    def close(self):
+        self.stopped.set()
+        if self.reporter:
+            self.reporter.join()
+            self.reporter = None
+        self.report()
+        if self.interactive:
+            self.out.write('\n')
+            self.out.flush()
+
+# Returns seconds as 'H:MM:SS'.
+def format_duration(seconds:float) -> str:
+    seconds = int(seconds + 0.5)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("progress.tst")
+# EOF
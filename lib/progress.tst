@@ -0,0 +1,48 @@
+Test the progress of a run.
+---------------------------
+
+>>> from progress import Progress
+>>> from oclcreport import Outcome
+>>> import io
+
+Outcomes are counted as they are handled, and a report is only written
+when asked for, or every 'interval' seconds once started.
+
+>>> t = [0.0]
+>>> out = io.StringIO()
+>>> progress = Progress({'+': 100, '-': 0, '?': 10}, hits_quota=50, out=out, interactive=True, clock=lambda: t[0])
+>>> progress.get_planned_hits()
+12
+>>> progress.write(list(Outcome(str(n), '+', 'success') for n in range(60)))
+>>> progress.write([Outcome('7', '?', 'set'), Outcome('', '?', 'error', detail='HTTP 500')])
+>>> t[0] = 10.0
+>>> progress.render()
+'+ 60/100  ? 1/10  hits 3/50  0.30 hits/s  ETA 0:00:30  1 errors'
+
+Until something is done there is no rate to tell when it will finish.
+
+>>> Progress({'?': 10}, clock=lambda: t[0], out=out, interactive=True).render()
+'? 0/10  hits 0  0.00 hits/s  ETA --:--:--'
+
+On a terminal each report writes over the last.
+
+>>> progress.report()
+>>> t[0] = 20.0
+>>> progress.write(list(Outcome(str(n), '+', 'success') for n in range(40)))
+>>> progress.write(list(Outcome(str(n), '?', 'set') for n in range(9)))
+>>> progress.close()
+>>> out.getvalue().split('\r')[1:]
+['+ 60/100  ? 1/10  hits 3/50  0.30 hits/s  ETA 0:00:30  1 errors', '+ 100/100  ? 10/10  hits 12/50  0.60 hits/s  ETA 0:00:00  1 errors\n']
+
+Otherwise each report is a line in the log.
+
+>>> class Log:
+...     def logit(self, message, include_timestamp=False):
+...         print(message)
+>>> progress = Progress({'-': 500}, logger=Log(), out=io.StringIO(), clock=lambda: t[0])
+>>> progress.interactive, progress.interval
+(False, 60.0)
+>>> t[0] = 80.0
+>>> progress.write(list(Outcome(str(n), '-', 'success') for n in range(100)))
+>>> progress.close()
+progress: - 100/500  hits 2  0.03 hits/s  ETA 0:04:00
@@ -0,0 +1,208 @@
+###############################################################################
+#
+# Purpose: Keep count of web service hits per day and pace the requests.
+# Date:    Wed Oct 21 10:12:40 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+try:
+    from lib.history import open_database
+except ModuleNotFoundError:
+    from history import open_database
+
+# Raised when the institution has used all of its web service hits for the day.
+class QuotaExceeded(Exception):
+    pass
+
+# Returns today's UTC date, the day OCLC's daily limits are counted by.
+def utc_day() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+# Returns the seconds until the next UTC day, when the daily limits start over.
+# param: now datetime optional time to count from, default now.
+def seconds_to_next_day(now:datetime=None) -> float:
+    now = now if now else datetime.now(timezone.utc)
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+# Token bucket. Tokens are added at 'rate' per second up to 'capacity',
+# and every request takes one, so requests are paced at the rate with
+# bursts of at most 'capacity'.
+class TokenBucket:
+
+    # param: rate float tokens added per second.
+    # param: capacity float maximum tokens, default one second's worth, but at least 1.
+    # param: clock function that returns the time in seconds.
+    def __init__(self, rate:float, capacity:float=None, clock=time.monotonic):
+        self.rate     = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self.clock    = clock
+        self.tokens   = self.capacity
+        self.updated  = clock()
+        self.lock     = threading.Lock()
+
+    # Takes a token if one is available.
+    # return: float 0.0 if a token was taken, otherwise the seconds to wait for one.
+    def take(self) -> float:
+        with self.lock:
+            self.tokens, self.updated, wait = _take_token_(self.tokens, self.updated,
+                self.clock(), self.rate, self.capacity)
+            return wait
+
+    # Waits until a token is available and takes it.
+    # return: float seconds spent waiting.
+    def acquire(self) -> float:
+        waited = 0.0
+        while True:
+            wait = self.take()
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+# Refills a bucket for the time that has passed and takes a token.
+# return: tuple of the new token count, the new update time, and the seconds
+#   to wait, 0.0 if the token was taken.
+def _take_token_(tokens:float, updated:float, now:float, rate:float, capacity:float):
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1.0:
+        return tokens - 1.0, now, 0.0
+    return tokens, now, (1.0 - tokens) / rate
+
+# Persistent ledger of the web service hits an institution makes each UTC
+# day. Every hit OclcService makes is recorded before it is sent, and the
+# per-second token bucket is kept in the same database, so runs that
+# overlap, or follow each other, share one daily count and one pace.
+#
+# The check, the bucket update, and the count are done in one write
+# transaction, so two processes can't both take the last hit of the day.
+class QuotaLedger:
+
+    # param: db_path str path to the database, shared with the history.
+    #   Use ':memory:' for a ledger that only paces this run.
+    # param: institution str institutional symbol the hits are counted for.
+    # param: per_day int maximum hits per UTC day, or None for no limit.
+    # param: per_second float maximum hits per second, or None for no limit.
+    # param: burst float hits that can be sent at once after a pause,
+    #   default one second's worth.
+    def __init__(self, db_path:str, institution:str, per_day:int=None,
+      per_second:float=None, burst:float=None, debug:bool=False):
+        self.db_path     = db_path
+        self.institution = institution
+        self.per_day     = int(per_day) if per_day else None
+        self.per_second  = float(per_second) if per_second else None
+        self.burst       = float(burst) if burst else (max(1.0, self.per_second) if self.per_second else None)
+        self.debug       = debug
+        self.waited      = 0.0
+        self.lock        = threading.Lock()
+        self.db          = open_database(db_path)
+        with self.db:
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS quota (
+                    institution TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    endpoint TEXT NOT NULL,
+                    hits INTEGER NOT NULL,
+                    PRIMARY KEY (institution, day, endpoint));
+                CREATE TABLE IF NOT EXISTS buckets (
+                    institution TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL);
+            """)
+
+    # Counts the hits for a day. Caller holds the lock.
+    def _used_(self, day:str) -> int:
+        row = self.db.execute("SELECT SUM(hits) FROM quota WHERE institution = ? AND day = ?",
+            (self.institution, day)).fetchone()
+        return row[0] or 0
+
+    # Tries to take a hit in one transaction.
+    # return: float 0.0 if the hit was recorded, otherwise seconds to wait.
+    def _try_hit_(self, endpoint:str) -> float:
+        day = utc_day()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                if self.per_day is not None and self._used_(day) >= self.per_day:
+                    raise QuotaExceeded(f"{self.institution} has used all {self.per_day} web service hits for {day} (UTC).")
+                if self.per_second:
+                    now = time.time()
+                    row = self.db.execute("SELECT tokens, updated FROM buckets WHERE institution = ?",
+                        (self.institution,)).fetchone()
+                    tokens, updated = row if row else (self.burst, now)
+                    tokens, updated, wait = _take_token_(tokens, updated, now, self.per_second, self.burst)
+                    self.db.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                        (self.institution, tokens, updated))
+                    if wait:
+                        self.db.commit()
+                        return wait
+                self.db.execute("""INSERT INTO quota VALUES (?, ?, ?, 1)
+                    ON CONFLICT (institution, day, endpoint) DO UPDATE SET hits = hits + 1""",
+                    (self.institution, day, endpoint))
+                self.db.commit()
+                return 0.0
+            except BaseException:
+                self.db.rollback()
+                raise
+
+    # Waits for the rate limit, then records a hit.
+    # param: endpoint str name of the web service call, like 'set' or 'check'.
+    # return: float seconds spent waiting.
+    # raises: QuotaExceeded if the daily limit has been reached.
+    def acquire(self, endpoint:str='') -> float:
+        waited = 0.0
+        while True:
+            wait = self._try_hit_(endpoint)
+            if not wait:
+                self.waited += waited
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    # Returns the hits made on a day.
+    # param: day str 'YYYY-MM-DD', default today (UTC).
+    def used(self, day:str=None) -> int:
+        with self.lock:
+            return self._used_(day if day else utc_day())
+
+    # Returns the hits that are left today, or None if there is no daily limit.
+    def remaining(self):
+        if self.per_day is None:
+            return None
+        return max(0, self.per_day - self.used())
+
+    # Returns the hits made on a day by web service call.
+    # param: day str 'YYYY-MM-DD', default today (UTC).
+    # return: dictionary of {endpoint: hits, ...}
+    def get_usage(self, day:str=None) -> dict:
+        with self.lock:
+            return dict(self.db.execute("""SELECT endpoint, hits FROM quota
+                WHERE institution = ? AND day = ? ORDER BY endpoint""",
+                (self.institution, day if day else utc_day())).fetchall())
+
+    # Returns the total seconds this ledger has spent waiting for the rate limit.
+    def get_waited(self) -> float:
+        return self.waited
+
+    def close(self):
+        self.db.close()
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("quota.tst")
+# EOF
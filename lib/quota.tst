@@ -0,0 +1,88 @@
+Test the daily quota ledger and rate limiting.
+-----------------------------------------------
+
+>>> from quota import QuotaLedger, TokenBucket, QuotaExceeded, utc_day
+>>> import os
+>>> db = 'quota_test.db'
+>>> for f in (db, db + '-wal', db + '-shm'):
+...     if os.path.exists(f):
+...         os.remove(f)
+
+A token bucket starts full and then gives out tokens at its rate.
+
+>>> now = [0.0]
+>>> bucket = TokenBucket(2, capacity=2, clock=lambda: now[0])
+>>> bucket.take(), bucket.take(), bucket.take()
+(0.0, 0.0, 0.5)
+>>> now[0] = 0.5
+>>> bucket.take(), bucket.take()
+(0.0, 0.5)
+
+The ledger counts every hit by institution and UTC day.
+
+>>> ledger = QuotaLedger(db, 'OCPSB', per_day=5)
+>>> ledger.remaining()
+5
+>>> for endpoint in ('set', 'set', 'check'):
+...     ledger.acquire(endpoint)
+0.0
+0.0
+0.0
+>>> ledger.used(), ledger.remaining()
+(3, 2)
+>>> ledger.get_usage()
+{'check': 1, 'set': 2}
+>>> ledger.used('1999-01-01')
+0
+
+Other runs on the same day share the count, other institutions don't.
+
+>>> other_run = QuotaLedger(db, 'OCPSB', per_day=5)
+>>> other_run.acquire('unset')
+0.0
+>>> ledger.remaining()
+1
+>>> QuotaLedger(db, 'OTHER', per_day=5).remaining()
+5
+
+Once the day's hits are used up the ledger refuses more.
+
+>>> ledger.acquire('set')
+0.0
+>>> try:
+...     other_run.acquire('set') # doctest: +ELLIPSIS
+... except QuotaExceeded as ex:
+...     print(ex)
+OCPSB has used all 5 web service hits for ... (UTC).
+>>> ledger.used()
+5
+
+Without a daily limit there is no remaining count, but hits are still recorded.
+
+>>> QuotaLedger(db, 'OCPSB').remaining() is None
+True
+
+The per-second rate paces the hits.
+
+>>> paced = QuotaLedger(':memory:', 'OCPSB', per_second=20)
+>>> waits = list(paced.acquire('check') for _ in range(25))
+>>> waits[:20] == [0.0] * 20
+True
+>>> 0.1 < paced.get_waited() < 1.0
+True
+>>> paced.used()
+25
+
+A spent day's budget starts over at midnight UTC.
+
+>>> from quota import seconds_to_next_day
+>>> from datetime import datetime, timezone
+>>> seconds_to_next_day(datetime(2023, 4, 20, 23, 30, tzinfo=timezone.utc))
+1800.0
+>>> 0 < seconds_to_next_day() <= 86400
+True
+>>> ledger.close()
+>>> other_run.close()
+>>> for f in (db, db + '-wal', db + '-shm'):
+...     if os.path.exists(f):
+...         os.remove(f)
@@ -0,0 +1,121 @@
+###############################################################################
+#
+# Purpose: Remember OCLC number changes between runs.
+# Date:    Mon Oct 19 16:05:48 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import threading
+from datetime import datetime
+try:
+    from lib.history import open_database, DATE_FORMAT
+except ModuleNotFoundError:
+    from history import open_database, DATE_FORMAT
+
+# Persistent table of old to new OCLC numbers. When OCLC merges records it
+# reports the current number for the one we sent. Remembering that lets the
+# next run send the current number directly instead of paying for OCLC to
+# tell us again. Chains are collapsed as they are added, so if A was merged
+# into B, and later B into C, both A and B map to C.
+#
+# The table can be used as an OclcReport sink, in which case every outcome
+# that reports a different current number is added.
+class RemapTable:
+    def __init__(self, db_path:str, debug:bool=False):
+        self.db_path = db_path
+        self.debug   = debug
+        self.lock    = threading.Lock()
+        self.db      = open_database(db_path)
+        with self.db:
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS remap (
+                    old INTEGER PRIMARY KEY,
+                    new INTEGER NOT NULL,
+                    updated TEXT);
+                CREATE INDEX IF NOT EXISTS remap_new ON remap (new);
+            """)
+
+    # Follows a chain of remaps to the current number.
+    # param: number int OCLC number.
+    # return: int of the current number, which is the number itself if it
+    #   hasn't been remapped.
+    def _final_(self, number:int) -> int:
+        seen = set()
+        while number not in seen:
+            seen.add(number)
+            row = self.db.execute("SELECT new FROM remap WHERE old = ?", (number,)).fetchone()
+            if not row:
+                break
+            number = row[0]
+        return number
+
+    # Adds old to new number changes, collapsing chains.
+    # param: updates dict of {old: new, ...} OCLC numbers, like OclcReport.get_updated().
+    # return: int count of remaps added.
+    def add(self, updates:dict) -> int:
+        count = 0
+        now = datetime.now().strftime(DATE_FORMAT)
+        with self.lock, self.db:
+            for (old, new) in updates.items():
+                try:
+                    old = int(old)
+                    new = int(new)
+                except (TypeError, ValueError):
+                    continue
+                if old == new:
+                    continue
+                final = self._final_(new)
+                # A merge back to the original number would create a cycle.
+                if final == old:
+                    self.db.execute("DELETE FROM remap WHERE old = ?", (old,))
+                    continue
+                # Everything that was remapped to the old number now goes to the final number.
+                self.db.execute("UPDATE remap SET new = ?, updated = ? WHERE new = ?", (final, now, old))
+                self.db.execute("INSERT OR REPLACE INTO remap VALUES (?, ?, ?)", (old, final, now))
+                count += 1
+        if self.debug:
+            print(f"DEBUG: added {count} remaps to {self.db_path}")
+        return count
+
+    # Sink interface. Adds any outcome that reports a new current number.
+    # param: outcomes list of Outcome objects.
+    def write(self, outcomes:list):
+        self.add(dict((o.number, o.new_number) for o in outcomes
+            if o.status != 'error' and o.new_number and o.number != o.new_number))
+
+    # Returns the current number for an OCLC number.
+    # param: number str OCLC number.
+    # return: str of the current OCLC number.
+    def resolve(self, number:str) -> str:
+        try:
+            return str(self._final_(int(number)))
+        except (TypeError, ValueError):
+            return number
+
+    # Returns the whole table, which is small compared to the instruction lists.
+    # return: dict of {old: new, ...} as strings.
+    def as_dict(self) -> dict:
+        return dict((str(old), str(new)) for (old, new) in self.db.execute("SELECT old, new FROM remap"))
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM remap").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("remap.tst")
+# EOF
@@ -0,0 +1,62 @@
+Test the persistent OCLC number remap table.
+--------------------------------------------
+
+>>> from remap import RemapTable
+>>> from oclcreport import Outcome
+>>> from listutils import InstructionManager
+>>> import os
+>>> def clean_up():
+...     for f in ['test_remap.db', 'test_remap.db-wal', 'test_remap.db-shm']:
+...         if os.path.exists(f):
+...             os.remove(f)
+>>> clean_up()
+
+>>> remap = RemapTable('test_remap.db')
+>>> remap.add({'1': '2', '5': '5', 'junk': '7'})
+1
+>>> remap.resolve('1'), remap.resolve('3')
+('2', '3')
+
+Chains are collapsed as they are added, in either order.
+
+>>> remap.add({'2': '3'})
+1
+>>> sorted(remap.as_dict().items())
+[('1', '3'), ('2', '3')]
+>>> remap.add({'10': '11'})
+1
+>>> remap.add({'9': '10'})
+1
+>>> remap.resolve('9'), remap.resolve('10')
+('11', '11')
+
+A merge back to the original number removes the remap rather than looping.
+
+>>> remap.add({'3': '1'})
+0
+>>> remap.resolve('1'), remap.resolve('3')
+('3', '3')
+
+Outcomes that report a new current number are added when used as a sink.
+
+>>> remap.write([Outcome('20', '+', 'updated', '21'), Outcome('30', '+', 'success', '30'), Outcome('', '+', 'error')])
+>>> remap.resolve('20')
+'21'
+>>> len(remap)
+5
+
+The table is applied to instructions before they are sent.
+
+>>> instructor = InstructionManager('test_remap.lst', remap=remap.as_dict())
+>>> instructor.merge(['+1', '+3', '-9', '?20', '+40'])
+['-11', '?21', '+3', '+40']
+>>> sorted(instructor.get_remapped().items())
+[('1', '3'), ('20', '21'), ('9', '11')]
+>>> instructor.write_instructions(['+1', '+2', '+3', '-9'])
+>>> instructor.read_instruction_numbers('+')
+['3']
+>>> instructor.read_instruction_numbers('-')
+['11']
+>>> remap.close()
+>>> os.remove('test_remap.lst')
+>>> clean_up()
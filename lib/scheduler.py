@@ -0,0 +1,94 @@
+###############################################################################
+#
+# Purpose: Spend one web service hit budget across checks, unsets, and sets.
+# Date:    Tue Oct 20 13:48:30 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+
+# Numbers sent per web service hit. Checks take one number, sets and
+# unsets take up to 50.
+BATCH_SIZES = {'?': 1, '-': 50, '+': 50}
+# Deletes first so customers aren't sent to titles we don't have, then
+# sets, then checks.
+DEFAULT_POLICY = '-+?'
+
+# Plans which instructions to send within a budget of web service hits.
+# The budget is shared by all the operations and spent in the order of
+# the policy. Batches are packed full, so a hit is only spent on a partial
+# batch if it is the last batch of an operation. Whatever doesn't fit is
+# returned as pending to be carried over to the next run.
+class HitScheduler:
+
+    # param: budget int maximum web service hits, or None for no limit.
+    # param: policy str order the actions are scheduled, like '-+?'. Actions
+    #   that aren't in the policy are never scheduled.
+    # param: batch_sizes dict of numbers per hit for each action.
+    def __init__(self, budget:int=None, policy:str=DEFAULT_POLICY, batch_sizes:dict=None):
+        self.budget      = None if budget is None else max(0, int(budget))
+        self.policy      = ''.join(a for a in policy if a in BATCH_SIZES)
+        self.batch_sizes = dict(BATCH_SIZES)
+        if batch_sizes:
+            self.batch_sizes.update(batch_sizes)
+        self.hits        = {}
+
+    # Returns the order the actions are scheduled and should be run.
+    def get_policy(self) -> str:
+        return self.policy
+
+    # Returns the number of hits needed to send a list of numbers.
+    # param: action str '+', '-', or '?'.
+    # param: count int of numbers.
+    def hits_for(self, action:str, count:int) -> int:
+        size = self.batch_sizes[action]
+        return (count + size - 1) // size
+
+    # Splits the lists into what can be sent within the budget and what can't.
+    # param: lists dict of {action: [numbers], ...}.
+    # return: tuple of dicts ({action: [scheduled numbers]}, {action: [pending numbers]}).
+    def plan(self, lists:dict):
+        scheduled = {}
+        pending   = {}
+        remaining = self.budget
+        self.hits = {}
+        for action in BATCH_SIZES:
+            if action not in self.policy:
+                pending[action] = list(lists.get(action, []))
+                scheduled[action] = []
+        for action in self.policy:
+            numbers = list(lists.get(action, []))
+            needed  = self.hits_for(action, len(numbers))
+            if remaining is None or needed <= remaining:
+                take = len(numbers)
+                hits = needed
+            else:
+                # Only full batches, the operation won't be finished this run.
+                hits = remaining
+                take = remaining * self.batch_sizes[action]
+            scheduled[action] = numbers[:take]
+            pending[action]   = numbers[take:]
+            self.hits[action] = hits
+            if remaining is not None:
+                remaining -= hits
+        return scheduled, pending
+
+    # Returns the hits planned for each action by the last plan().
+    def get_hits(self) -> dict:
+        return self.hits
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("scheduler.tst")
+# EOF
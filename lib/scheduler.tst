@@ -0,0 +1,43 @@
+Test the web service hit scheduler.
+-----------------------------------
+
+>>> from scheduler import HitScheduler
+>>> sets   = list(str(n) for n in range(1000, 1120))
+>>> unsets = list(str(n) for n in range(2000, 2060))
+>>> checks = list(str(n) for n in range(3000, 3010))
+>>> lists  = {'+': sets, '-': unsets, '?': checks}
+
+Unsets take 2 hits (50 + 10), sets take 3 (50 + 50 + 20), and checks 10.
+
+>>> scheduler = HitScheduler(100)
+>>> scheduled, pending = scheduler.plan(lists)
+>>> scheduler.get_hits()
+{'-': 2, '+': 3, '?': 10}
+>>> [len(scheduled[a]) for a in '-+?'], [len(pending[a]) for a in '-+?']
+([60, 120, 10], [0, 0, 0])
+
+The budget is shared. With 4 hits all the unsets are sent, but only the
+full batches of sets; no hit is spent on a partial batch.
+
+>>> scheduled, pending = HitScheduler(4).plan(lists)
+>>> [len(scheduled[a]) for a in '-+?'], [len(pending[a]) for a in '-+?']
+([60, 100, 0], [0, 20, 10])
+>>> pending['+'][0]
+'1100'
+
+The policy controls the priority.
+
+>>> scheduler = HitScheduler(12, policy='?+-')
+>>> scheduled, pending = scheduler.plan(lists)
+>>> scheduler.get_hits()
+{'?': 10, '+': 2, '-': 0}
+>>> [len(scheduled[a]) for a in '-+?'], [len(pending[a]) for a in '-+?']
+([0, 100, 10], [60, 20, 0])
+
+Actions that aren't in the policy stay pending, and no budget means no limit.
+
+>>> scheduled, pending = HitScheduler(None, policy='+').plan(lists)
+>>> [len(scheduled[a]) for a in '-+?'], [len(pending[a]) for a in '-+?']
+([0, 120, 0], [60, 0, 10])
+>>> HitScheduler(0).plan(lists)[0]
+{'-': [], '+': [], '?': []}
@@ -0,0 +1,307 @@
+###############################################################################
+#
+# Purpose: Share the work of one instruction file among worker processes.
+# Date:    Thu Oct 22 15:40:09 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import threading
+from os import linesep
+from os.path import join, exists, basename, getmtime, splitext
+try:
+    from lib.listutils import InstructionManager
+    from lib.compressed import plain_name
+    from lib.packed import iter_instructions, PACKED_EXT
+except ModuleNotFoundError:
+    from listutils import InstructionManager
+    from compressed import plain_name
+    from packed import iter_instructions, PACKED_EXT
+
+MANIFEST = 'manifest.json'
+
+# A queue of shards of an instruction file in a directory that every worker
+# can reach, like an NFS mount. The coordinator splits the file into shards,
+# and workers lease them one at a time with lock files:
+#
+#   shards/master.00000.lst           a shard, still to do.
+#   shards/master.00000.lst.lock      the lease, holding the worker's id.
+#   shards/master.00000.lst.completed the shard's results, once published.
+#
+# A worker touches its lock file while it works on a shard. A lock that
+# hasn't been touched for 'lease_seconds' is expired, and the next worker to
+# look reclaims it. Results are published with an exclusive create, so if a
+# shard is run twice because a lease expired only the first results count,
+# and every done number is accounted for exactly once when the results are
+# merged. Lease times are compared to this host's clock, so the hosts' clocks
+# should be kept in sync.
+class ShardQueue:
+
+    # param: shard_dir str the shared directory.
+    # param: worker_id str unique name of this worker, default host and process id.
+    # param: lease_seconds float seconds without a heartbeat before a lease expires.
+    # param: logger:Logger optional logging. The class will print if not supplied.
+    def __init__(self, shard_dir:str, worker_id:str=None, lease_seconds:float=300.0,
+      logger=None, debug:bool=False):
+        self.shard_dir  = shard_dir
+        self.shards_dir = join(shard_dir, 'shards')
+        self.worker_id  = worker_id if worker_id else f"{socket.gethostname()}-{os.getpid()}"
+        self.work_dir   = join(shard_dir, 'work', self.worker_id)
+        self.lease_seconds = lease_seconds
+        self.logger     = logger
+        self.debug      = debug
+
+    # Wrapper for the logger.
+    def print_or_log(self, message:str, to_stderr:bool=False):
+        if self.logger:
+            self.logger.logit(message, level='error' if to_stderr else 'info', include_timestamp=True)
+        elif to_stderr:
+            sys.stderr.write(f"{message}" + linesep)
+        else:
+            print(f"{message}")
+
+    # Splits an instruction file into shards. The manifest is written last,
+    # so workers don't start on a half split file.
+    # param: instruction_file str path of the file, as written by --save_as.
+    # param: shard_size int instructions per shard.
+    # return: list of shard names.
+    def split(self, instruction_file:str, shard_size:int=10000) -> list:
+        os.makedirs(self.shards_dir, exist_ok=True)
+        stem = basename(plain_name(instruction_file))
+        if stem.endswith(('.lst', PACKED_EXT)):
+            stem = splitext(stem)[0]
+        names = []
+        shard = None
+        count = 0
+        for line in iter_instructions(instruction_file):
+            if not line.strip():
+                continue
+            if shard is None or count >= shard_size:
+                if shard:
+                    shard.close()
+                names.append(f"{stem}.{len(names):05d}.lst")
+                shard = open(join(self.shards_dir, names[-1]), encoding='ISO-8859-1', mode='w')
+                count = 0
+            shard.write(line.rstrip() + linesep)
+            count += 1
+        if shard:
+            shard.close()
+        manifest = {'source': instruction_file, 'shards': names, 'shard_size': shard_size,
+            'created': time.strftime('%Y-%m-%d %H:%M:%S')}
+        with open(join(self.shard_dir, MANIFEST + '.tmp'), mode='w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(join(self.shard_dir, MANIFEST + '.tmp'), join(self.shard_dir, MANIFEST))
+        self.print_or_log(f"split '{instruction_file}' into {len(names)} shards in '{self.shards_dir}'.")
+        return names
+
+    # Returns the manifest, or an empty dictionary if the file hasn't been split yet.
+    def get_manifest(self) -> dict:
+        path = join(self.shard_dir, MANIFEST)
+        if not exists(path):
+            return {}
+        with open(path, mode='r') as f:
+            return json.load(f)
+
+    # Returns the shards that don't have published results yet.
+    def pending(self) -> list:
+        return list(name for name in self.get_manifest().get('shards', [])
+            if not exists(join(self.shards_dir, name + '.completed')))
+
+    def is_complete(self) -> bool:
+        return bool(self.get_manifest()) and not self.pending()
+
+    # Leases the next shard that isn't completed or leased by a live worker.
+    # An expired lease is moved aside, which only one worker can do, before
+    # the lock is taken.
+    # return: str shard name, or None if there is nothing to lease.
+    def lease(self):
+        for name in self.pending():
+            lock = join(self.shards_dir, name + '.lock')
+            try:
+                if time.time() - getmtime(lock) > self.lease_seconds:
+                    os.rename(lock, f"{lock}.{self.worker_id}.expired")
+                    self.print_or_log(f"reclaimed the expired lease on '{name}'.")
+                    os.remove(f"{lock}.{self.worker_id}.expired")
+            except FileNotFoundError:
+                pass
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue
+            with os.fdopen(fd, mode='w') as f:
+                f.write(self.worker_id)
+            # Published while this worker was looking.
+            if exists(join(self.shards_dir, name + '.completed')):
+                self.release(name)
+                continue
+            return name
+        return None
+
+    # Returns True if this worker still holds the lease on a shard.
+    def holds(self, name:str) -> bool:
+        try:
+            with open(join(self.shards_dir, name + '.lock'), mode='r') as f:
+                return f.read() == self.worker_id
+        except FileNotFoundError:
+            return False
+
+    # Renews the lease on a shard.
+    # return: bool False if the lease was lost to another worker.
+    def heartbeat(self, name:str) -> bool:
+        if not self.holds(name):
+            return False
+        os.utime(join(self.shards_dir, name + '.lock'))
+        return True
+
+    # Gives up the lease on a shard, if this worker holds it.
+    def release(self, name:str):
+        if self.holds(name):
+            try:
+                os.remove(join(self.shards_dir, name + '.lock'))
+            except FileNotFoundError:
+                pass
+
+    # Publishes a shard's results. Only the first results of a shard count.
+    # param: name str shard name.
+    # param: completed_file str path of the results.
+    # return: bool True if the results were published.
+    def publish(self, name:str, completed_file:str) -> bool:
+        try:
+            fd = os.open(join(self.shards_dir, name + '.completed'), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, mode='wb') as out, open(completed_file, mode='rb') as src:
+            shutil.copyfileobj(src, out)
+        return True
+
+    # Replaces a shard with what is left of it, like an '.interrupted' file,
+    # so the next worker doesn't repeat the work done.
+    # param: name str shard name.
+    # param: remaining_file str path of the instructions left to do.
+    def requeue(self, name:str, remaining_file:str):
+        if self.holds(name):
+            shutil.copyfile(remaining_file, join(self.shards_dir, name + '.tmp'))
+            os.replace(join(self.shards_dir, name + '.tmp'), join(self.shards_dir, name))
+        self.release(name)
+
+    # Leases and processes shards until there are none left to lease, or
+    # until stopped. A heartbeat thread renews the lease while a shard is
+    # processed, and stops the shard if the lease is lost.
+    # param: process function that takes the path of a copy of the shard and
+    #   a threading.Event that stops it, and returns the path of the
+    #   '.completed' or '.interrupted' file it wrote.
+    # param: stop threading.Event that stops the worker.
+    # param: hold function that returns the seconds to wait before leasing
+    #   another shard, like until the next day's hits, or 0 to go on. The
+    #   worker stops rather than wait.
+    # return: int count of shards published by this worker.
+    def work(self, process, stop:threading.Event, hold=None) -> int:
+        published = 0
+        os.makedirs(self.work_dir, exist_ok=True)
+        while not stop.is_set():
+            if hold and hold():
+                self.print_or_log(f"{self.worker_id} has no web service hits left, leaving the shards for later.")
+                break
+            name = self.lease()
+            if name is None:
+                break
+            path = join(self.work_dir, name)
+            shutil.copyfile(join(self.shards_dir, name), path)
+            shard_stop = threading.Event()
+            lost = threading.Event()
+            finished = threading.Event()
+            # Renews the lease, and passes on a stop.
+            def beat():
+                last = time.time()
+                while not finished.wait(min(1.0, self.lease_seconds / 3)):
+                    if stop.is_set():
+                        shard_stop.set()
+                    if time.time() - last >= self.lease_seconds / 3:
+                        last = time.time()
+                        if not self.heartbeat(name):
+                            lost.set()
+                            shard_stop.set()
+            heart = threading.Thread(target=beat, name=f"heartbeat-{name}", daemon=True)
+            heart.start()
+            self.print_or_log(f"{self.worker_id} leased '{name}'.")
+            try:
+                written = process(path, shard_stop)
+            except Exception as ex:
+                self.print_or_log(f"failed to process '{name}': {ex}", to_stderr=True)
+                written = None
+            finally:
+                finished.set()
+                heart.join()
+            if lost.is_set() or not self.holds(name):
+                self.print_or_log(f"lost the lease on '{name}', its results are not published.", to_stderr=True)
+            elif written and written.endswith('.completed') and exists(written):
+                if self.publish(name, written):
+                    published += 1
+                    self.print_or_log(f"{self.worker_id} published '{name}'.")
+                else:
+                    self.print_or_log(f"'{name}' was already published, its results are not counted again.")
+                self.release(name)
+            elif written and exists(written):
+                self.requeue(name, written)
+                self.print_or_log(f"requeued what is left of '{name}'.")
+                # The shard was interrupted, so this worker is done.
+                break
+            else:
+                self.release(name)
+        return published
+
+    # Waits until every shard is published, reclaiming expired leases by
+    # working on them.
+    # param: process same as work().
+    # param: stop threading.Event that stops the waiting.
+    # param: poll float seconds between checks.
+    # param: hold same as work(). Waits out the hold instead of stopping.
+    # return: bool True if every shard is published.
+    def wait_for_all(self, process, stop:threading.Event, poll:float=5.0, hold=None) -> bool:
+        while not stop.is_set() and not self.is_complete():
+            self.work(process, stop, hold=hold)
+            if not self.is_complete():
+                stop.wait(max(poll, hold() if hold else 0))
+        return self.is_complete()
+
+    # Merges the published results of every shard into one file.
+    # param: output_file str path of the merged '.completed' file.
+    # param: packed bool True to write a packed file, see packed.py.
+    # return: int count of instructions written.
+    def merge(self, output_file:str, packed:bool=None) -> int:
+        lists = []
+        for name in self.get_manifest().get('shards', []):
+            path = join(self.shards_dir, name + '.completed')
+            if exists(path):
+                with open(path, encoding='ISO-8859-1', mode='r') as f:
+                    lists.append(list(line.rstrip() for line in f if line.strip()))
+            else:
+                # Never run, so all still to do.
+                with open(join(self.shards_dir, name), encoding='ISO-8859-1', mode='r') as f:
+                    lists.append(list(line.rstrip() for line in f if line.strip()))
+        instruction_manager = InstructionManager(output_file, debug=self.debug, packed=packed)
+        merged = instruction_manager.merge(*lists)
+        instruction_manager.write_instructions(merged)
+        return len(merged)
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("shard.tst")
+# EOF
@@ -0,0 +1,114 @@
+Test sharing an instruction file among workers.
+-----------------------------------------------
+
+>>> from shard import ShardQueue
+>>> import os
+>>> import time
+>>> import shutil
+>>> import threading
+>>> from os.path import join, exists
+>>> shard_dir = 'test_shards'
+>>> if exists(shard_dir):
+...     shutil.rmtree(shard_dir)
+>>> with open('test_master.lst', encoding='ISO-8859-1', mode='w') as f:
+...     for n in range(1000, 1010):
+...         _ = f.write(f"+{n}\n")
+...     _ = f.write("!2000\n-3000\n")
+
+The coordinator splits the file into shards.
+
+>>> coordinator = ShardQueue(shard_dir, worker_id='coordinator')
+>>> coordinator.split('test_master.lst', shard_size=5)
+split 'test_master.lst' into 3 shards in 'test_shards/shards'.
+['test_master.00000.lst', 'test_master.00001.lst', 'test_master.00002.lst']
+>>> coordinator.is_complete()
+False
+
+Two workers never hold the same shard.
+
+>>> a = ShardQueue(shard_dir, worker_id='a', lease_seconds=60)
+>>> b = ShardQueue(shard_dir, worker_id='b', lease_seconds=60)
+>>> a.lease(), b.lease(), a.holds('test_master.00001.lst'), b.holds('test_master.00001.lst')
+('test_master.00000.lst', 'test_master.00001.lst', False, True)
+
+A lease that isn't renewed expires and is reclaimed.
+
+>>> lock = join(shard_dir, 'shards', 'test_master.00001.lst.lock')
+>>> os.utime(lock, (time.time() - 120, time.time() - 120))
+>>> a.lease()
+reclaimed the expired lease on 'test_master.00001.lst'.
+'test_master.00001.lst'
+>>> b.heartbeat('test_master.00001.lst'), a.heartbeat('test_master.00001.lst')
+(False, True)
+
+Only the first results of a shard are published.
+
+>>> with open('test_results.completed', mode='w') as f:
+...     _ = f.write('!1005\n!1006\n!1007\n!1008\n!1009\n')
+>>> a.publish('test_master.00001.lst', 'test_results.completed')
+True
+>>> b.publish('test_master.00001.lst', 'test_results.completed')
+False
+>>> a.release('test_master.00001.lst')
+>>> a.release('test_master.00000.lst')
+>>> coordinator.pending()
+['test_master.00000.lst', 'test_master.00002.lst']
+
+Workers process shards until there are none left to lease. The process
+function runs a copy of the shard and returns the results file it wrote.
+
+>>> def process(path, stop):
+...     with open(path, encoding='ISO-8859-1', mode='r') as f:
+...         lines = f.readlines()
+...     with open(path + '.completed', encoding='ISO-8859-1', mode='w') as f:
+...         for line in lines:
+...             _ = f.write('!' + line[1:])
+...     return path + '.completed'
+>>> stop = threading.Event()
+>>> a.work(process, stop)
+a leased 'test_master.00000.lst'.
+a published 'test_master.00000.lst'.
+a leased 'test_master.00002.lst'.
+a published 'test_master.00002.lst'.
+2
+>>> coordinator.is_complete()
+True
+
+The results are merged into one file.
+
+>>> coordinator.merge('test_master.lst.completed')
+12
+>>> with open('test_master.lst.completed', encoding='ISO-8859-1', mode='r') as f:
+...     print(f.read().split())
+['!1000', '!1001', '!1002', '!1003', '!1004', '!1005', '!1006', '!1007', '!1008', '!1009', '!2000', '!3000']
+
+An interrupted shard is replaced by what is left of it.
+
+>>> shutil.rmtree(shard_dir)
+>>> _ = coordinator.split('test_master.lst', shard_size=20)
+split 'test_master.lst' into 1 shards in 'test_shards/shards'.
+>>> def interrupted(path, stop):
+...     with open(path + '.interrupted', encoding='ISO-8859-1', mode='w') as f:
+...         _ = f.write('!1000\n+1001\n')
+...     return path + '.interrupted'
+>>> a.work(interrupted, stop)
+a leased 'test_master.00000.lst'.
+requeued what is left of 'test_master.00000.lst'.
+0
+>>> with open(join(shard_dir, 'shards', 'test_master.00000.lst'), encoding='ISO-8859-1', mode='r') as f:
+...     print(f.read().split())
+['!1000', '+1001']
+>>> coordinator.pending()
+['test_master.00000.lst']
+
+Once the day's hits are spent a worker stops without leasing a shard, so
+none is published with its instructions still to do.
+
+>>> a.work(process, stop, hold=lambda: 3600.0)
+a has no web service hits left, leaving the shards for later.
+0
+>>> coordinator.pending(), coordinator.is_complete()
+(['test_master.00000.lst'], False)
+>>> shutil.rmtree(shard_dir)
+>>> for f in ('test_master.lst', 'test_master.lst.completed', 'test_results.completed'):
+...     os.remove(f)
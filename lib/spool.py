@@ -0,0 +1,182 @@
+###############################################################################
+#
+# Purpose: Process instruction files as they arrive in a spool directory.
+# Date:    Thu Oct 22 09:26:51 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import os
+import sys
+import time
+import fnmatch
+import threading
+from os import linesep
+from os.path import join, exists, basename
+try:
+    from lib.compressed import output_path, COMPRESSIONS
+except ModuleNotFoundError:
+    from compressed import output_path, COMPRESSIONS
+
+# Files with these endings are results, not instructions.
+RESULT_SUFFIXES = ('.completed', '.interrupted', '.updated', '.upload')
+# Results of compressed files are compressed, like 'name.lst.completed.gz'.
+RESULT_ENDINGS  = RESULT_SUFFIXES + tuple(suffix + compression for suffix in RESULT_SUFFIXES for compression in COMPRESSIONS)
+# Results of a file that wasn't finished.
+INTERRUPTED_ENDINGS = ('.interrupted',) + tuple('.interrupted' + compression for compression in COMPRESSIONS)
+
+# Watches a spool directory for instruction files, as written by --save_as,
+# and hands them to a function one at a time, oldest first. A file is
+# claimed by moving it into the 'work' subdirectory, so two watchers on the
+# same spool never run the same file, and a file is only claimed once it
+# hasn't changed for 'settle' seconds, so it isn't read while being written.
+# When it is done, the file and its results, like 'name.lst.completed', are
+# moved to the 'done' subdirectory. If it wasn't finished, what is left of
+# it, its '.interrupted' file, goes back in the spool under its own name.
+#
+#   spool = SpoolWatcher('/var/spool/oclc')
+#   spool.serve(lambda path: run_instructions(path, ...), stop)
+class SpoolWatcher:
+
+    # param: spool_dir str directory to watch.
+    # param: pattern str file name pattern of instruction files. Default '*.lst'.
+    # param: settle float seconds a file must be unchanged before it is claimed.
+    # param: poll float seconds between looks at the spool when it is empty.
+    # param: logger:Logger optional logging. The class will print if not supplied.
+    def __init__(self, spool_dir:str, pattern:str='*.lst', settle:float=5.0, poll:float=2.0,
+      logger=None, debug:bool=False):
+        self.spool_dir = spool_dir
+        self.pattern   = pattern
+        self.settle    = settle
+        self.poll      = poll
+        self.logger    = logger
+        self.debug     = debug
+        self.work_dir  = join(spool_dir, 'work')
+        self.done_dir  = join(spool_dir, 'done')
+        self.processed = 0
+        os.makedirs(self.work_dir, exist_ok=True)
+        os.makedirs(self.done_dir, exist_ok=True)
+
+    # Wrapper for the logger.
+    def print_or_log(self, message:str, to_stderr:bool=False):
+        if self.logger:
+            self.logger.logit(message, level='error' if to_stderr else 'info', include_timestamp=True)
+        elif to_stderr:
+            sys.stderr.write(f"{message}" + linesep)
+        else:
+            print(f"{message}")
+
+    # Lists the instruction files ready to be claimed, oldest first.
+    # return: list of file names in the spool directory.
+    def ready(self) -> list:
+        now = time.time()
+        files = []
+        with os.scandir(self.spool_dir) as entries:
+            for entry in entries:
+                if not entry.is_file() or entry.name.endswith(RESULT_ENDINGS):
+                    continue
+                if not fnmatch.fnmatch(entry.name, self.pattern):
+                    continue
+                mtime = entry.stat().st_mtime
+                if now - mtime >= self.settle:
+                    files.append((mtime, entry.name))
+        return list(name for (mtime, name) in sorted(files))
+
+    # Claims the oldest ready file by moving it into the work directory.
+    # return: str path of the claimed file, or None if there isn't one.
+    def claim(self):
+        for name in self.ready():
+            path = join(self.work_dir, name)
+            try:
+                os.rename(join(self.spool_dir, name), path)
+            except FileNotFoundError:
+                # Another watcher got it first.
+                continue
+            return path
+        return None
+
+    # Moves a claimed file and its results to the done directory.
+    # param: path str path of the claimed file.
+    # return: list of paths in the done directory.
+    def finish(self, path:str) -> list:
+        moved = []
+        results = [path] + list(output_path(path, suffix, compress=compress)
+            for suffix in RESULT_SUFFIXES for compress in (True, False))
+        for result in dict.fromkeys(results):
+            if exists(result):
+                target = join(self.done_dir, basename(result))
+                os.replace(result, target)
+                moved.append(target)
+        return moved
+
+    # Puts what is left of a claimed file back in the spool, under the
+    # file's name, and moves any other results to the done directory.
+    # param: path str path of the claimed file.
+    # param: remaining_file str path of the instructions left to do.
+    # return: str path of the file in the spool.
+    def requeue(self, path:str, remaining_file:str) -> str:
+        target = join(self.spool_dir, basename(path))
+        os.replace(remaining_file, target)
+        if exists(path):
+            os.remove(path)
+        self.finish(path)
+        return target
+
+    # Processes files until stopped. A file that is being processed when
+    # stop is set is left to the function to finish or save, then the
+    # loop ends.
+    # param: process function that takes the path of a claimed file, and
+    #   returns the path of the '.completed' or '.interrupted' file it wrote.
+    # param: stop threading.Event that ends the loop.
+    # param: once bool True to return when the spool is empty.
+    # param: hold function that returns the seconds to wait before claiming
+    #   another file, like until the next day's hits, or 0 to go on.
+    # return: int count of files processed.
+    def serve(self, process, stop:threading.Event, once:bool=False, hold=None) -> int:
+        self.print_or_log(f"watching '{self.spool_dir}' for '{self.pattern}' files.")
+        while not stop.is_set():
+            wait = hold() if hold else 0
+            if wait:
+                if once:
+                    break
+                self.print_or_log(f"no web service hits left, waiting {wait:.0f} seconds before claiming more files.")
+                stop.wait(wait)
+                continue
+            path = self.claim()
+            if path is None:
+                if once:
+                    break
+                stop.wait(self.poll)
+                continue
+            self.print_or_log(f"processing '{basename(path)}'.")
+            written = None
+            try:
+                written = process(path)
+            except Exception as ex:
+                self.print_or_log(f"failed to process '{basename(path)}': {ex}", to_stderr=True)
+            if written and written.endswith(INTERRUPTED_ENDINGS) and exists(written):
+                self.requeue(path, written)
+                self.print_or_log(f"put what is left of '{basename(path)}' back in the spool.")
+            else:
+                for moved in self.finish(path):
+                    if self.debug:
+                        self.print_or_log(f"moved '{moved}'.")
+            self.processed += 1
+        self.print_or_log(f"stopped watching '{self.spool_dir}' after {self.processed} files.")
+        return self.processed
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("spool.tst")
+# EOF
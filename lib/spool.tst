@@ -0,0 +1,103 @@
+Test processing instruction files from a spool directory.
+---------------------------------------------------------
+
+>>> from spool import SpoolWatcher
+>>> import os
+>>> import shutil
+>>> import threading
+>>> from os.path import join
+>>> spool_dir = 'test_spool'
+>>> if os.path.exists(spool_dir):
+...     shutil.rmtree(spool_dir)
+>>> os.makedirs(spool_dir)
+>>> for (name, age) in (('b.lst', 200), ('a.lst', 100), ('notes.txt', 300), ('old.lst.completed', 300), ('new.lst', 0)):
+...     with open(join(spool_dir, name), mode='w') as f:
+...         _ = f.write('+12345\n')
+...     t = os.path.getmtime(join(spool_dir, name)) - age
+...     os.utime(join(spool_dir, name), (t, t))
+
+Only instruction files that have settled are ready, oldest first.
+
+>>> spool = SpoolWatcher(spool_dir, settle=5.0, poll=0.1)
+>>> spool.ready()
+['b.lst', 'a.lst']
+
+A claimed file moves into the work directory.
+
+>>> path = spool.claim()
+>>> path == join(spool_dir, 'work', 'b.lst'), spool.ready()
+(True, ['a.lst'])
+
+The file and its results move to the done directory when it is finished.
+
+>>> with open(path + '.completed', mode='w') as f:
+...     _ = f.write('!12345\n')
+>>> len(spool.finish(path))
+2
+>>> sorted(os.listdir(join(spool_dir, 'done')))
+['b.lst', 'b.lst.completed']
+
+Serve hands each file to the process function.
+
+>>> def process(path):
+...     with open(path + '.completed', mode='w') as f:
+...         _ = f.write('!12345\n')
+>>> stop = threading.Event()
+>>> spool.serve(process, stop, once=True)
+watching 'test_spool' for '*.lst' files.
+processing 'a.lst'.
+stopped watching 'test_spool' after 1 files.
+1
+>>> sorted(os.listdir(join(spool_dir, 'done')))
+['a.lst', 'a.lst.completed', 'b.lst', 'b.lst.completed']
+
+A stop ends the loop once the current file is done.
+
+>>> def process_and_stop(path):
+...     stop.set()
+...     process(path)
+>>> t = os.path.getmtime(join(spool_dir, 'new.lst')) - 100
+>>> os.utime(join(spool_dir, 'new.lst'), (t, t))
+>>> stop = threading.Event()
+>>> spool.serve(process_and_stop, stop)
+watching 'test_spool' for '*.lst' files.
+processing 'new.lst'.
+stopped watching 'test_spool' after 2 files.
+2
+>>> os.listdir(join(spool_dir, 'work'))
+[]
+
+A file that isn't finished, like one the day's hits ran out on, goes back
+in the spool as what is left of it, and its other results go to done.
+
+>>> def process_some(path):
+...     with open(path + '.interrupted', mode='w') as f:
+...         _ = f.write('!12345\n?67890\n')
+...     with open(path + '.updated', mode='w') as f:
+...         _ = f.write('=001  12345\n')
+...     return path + '.interrupted'
+>>> with open(join(spool_dir, 'part.lst'), mode='w') as f:
+...     _ = f.write('+12345\n?67890\n')
+>>> os.utime(join(spool_dir, 'part.lst'), (t, t))
+>>> spool.serve(process_some, threading.Event(), once=True)
+watching 'test_spool' for '*.lst' files.
+processing 'part.lst'.
+put what is left of 'part.lst' back in the spool.
+stopped watching 'test_spool' after 3 files.
+3
+>>> with open(join(spool_dir, 'part.lst')) as f:
+...     f.read()
+'!12345\n?67890\n'
+>>> os.listdir(join(spool_dir, 'work')), 'part.lst.updated' in os.listdir(join(spool_dir, 'done'))
+([], True)
+
+While a hold, like waiting for the next day's hits, is on no files are claimed.
+
+>>> os.utime(join(spool_dir, 'part.lst'), (t, t))
+>>> spool.serve(process, threading.Event(), once=True, hold=lambda: 3600.0)
+watching 'test_spool' for '*.lst' files.
+stopped watching 'test_spool' after 3 files.
+3
+>>> spool.ready()
+['part.lst']
+>>> shutil.rmtree(spool_dir)
@@ -0,0 +1,156 @@
+###############################################################################
+#
+# Purpose: Trace where the time of each web service call goes.
+# Date:    Tue Oct 27 09:52:14 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import os
+import json
+import time
+import threading
+from itertools import count
+
+# A span times one piece of work, like a token refresh or a request, and
+# carries attributes like the endpoint and status code. Spans opened while
+# another is open in the same thread are its children.
+#
+#   with tracer.span('request', endpoint='set') as span:
+#       response = session.post(url)
+#       span.set(status=response.status_code)
+#
+# Each span is written to the trace file as a line of JSON when it ends,
+# as a Chrome trace 'complete' event, so the file can be loaded into
+# Perfetto or chrome://tracing once the lines are put in a list, see
+# scripts/trace_to_chrome.py. Times are in microseconds.
+class Span:
+
+    def __init__(self, tracer, name:str, attributes:dict):
+        self.tracer     = tracer
+        self.name       = name
+        self.attributes = attributes
+        self.span_id    = next(tracer.ids)
+        self.parent_id  = None
+
+    # Adds or replaces attributes.
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        stack = self.tracer.stack()
+        if stack:
+            self.parent_id = stack[-1].span_id
+        stack.append(self)
+        self.started = time.time()
+        self.clock   = time.perf_counter()
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        duration = time.perf_counter() - self.clock
+        self.tracer.stack().pop()
+        if kind is not None:
+            self.attributes['error'] = f"{kind.__name__}: {value}"
+        self.tracer.write(self, duration)
+        return False
+
+# Stands in for a span when tracing is off, so the code that is traced
+# costs a method call and nothing is timed or written.
+class _NoSpan:
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+# Writes spans to a JSON lines file.
+class Tracer:
+
+    # param: path str trace file. Spans are added to the end of it.
+    def __init__(self, path:str):
+        self.path   = path
+        self.out    = open(path, encoding='utf-8', mode='a')
+        self.pid    = os.getpid()
+        self.ids    = count(1)
+        self.local  = threading.local()
+        self.lock   = threading.Lock()
+        self.closed = False
+
+    # Returns True, tracing is on.
+    def __bool__(self) -> bool:
+        return True
+
+    # Returns the spans open in this thread.
+    def stack(self) -> list:
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    # Starts a span, to use as a context manager.
+    # param: name str what is being done, like 'token' or 'request'.
+    # param: attributes keyword values to record with the span.
+    def span(self, name:str, **attributes) -> Span:
+        return Span(self, name, attributes)
+
+    # Writes a span that has ended.
+    def write(self, span:Span, duration:float):
+        args = dict((key, value) for (key, value) in span.attributes.items() if value is not None)
+        args['span_id'] = span.span_id
+        if span.parent_id is not None:
+            args['parent_id'] = span.parent_id
+        event = {'name': span.name, 'ph': 'X', 'ts': int(span.started * 1e6), 'dur': int(duration * 1e6),
+            'pid': self.pid, 'tid': threading.get_ident(), 'args': args}
+        line = json.dumps(event, separators=(',', ':'), default=str) + '\n'
+        with self.lock:
+            if not self.closed:
+                self.out.write(line)
+
+    def close(self):
+        with self.lock:
+            if not self.closed:
+                self.closed = True
+                self.out.close()
+
+# Used when tracing is off.
+class NullTracer:
+
+    def __bool__(self) -> bool:
+        return False
+
+    def span(self, name:str, **attributes) -> _NoSpan:
+        return _NO_SPAN
+
+    def close(self):
+        pass
+
+NULL_TRACER = NullTracer()
+
+# Reads the spans in a trace file.
+# param: path str JSON lines trace file.
+# return: list of span dictionaries, in the order they ended.
+def read_spans(path:str) -> list:
+    with open(path, encoding='utf-8', mode='r') as f:
+        return list(json.loads(line) for line in f if line.strip())
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testfile("tracing.tst")
+# EOF
@@ -0,0 +1,74 @@
+Test tracing spans.
+-------------------
+
+>>> from tracing import Tracer, NULL_TRACER, read_spans
+>>> import os
+>>> import threading
+
+A span is written when it ends, with its attributes, and spans opened in
+another span are its children.
+
+>>> tracer = Tracer('test_trace.jsonl')
+>>> with tracer.span('batch', batch_size=50, retry=0):
+...     with tracer.span('token'):
+...         pass
+...     with tracer.span('request', endpoint='set', batch_size=50) as span:
+...         span.set(status=207)
+>>> tracer.close()
+>>> spans = read_spans('test_trace.jsonl')
+>>> list((span['name'], span['args']) for span in spans)
+[('token', {'span_id': 2, 'parent_id': 1}), ('request', {'endpoint': 'set', 'batch_size': 50, 'status': 207, 'span_id': 3, 'parent_id': 1}), ('batch', {'batch_size': 50, 'retry': 0, 'span_id': 1})]
+
+They are Chrome trace 'complete' events, times in microseconds, so a
+parent starts before and ends after its children.
+
+>>> (token, request, batch) = spans
+>>> set(batch.keys()) == {'name', 'ph', 'ts', 'dur', 'pid', 'tid', 'args'}, batch['ph'], batch['pid'] == os.getpid()
+(True, 'X', True)
+>>> batch['ts'] <= token['ts'] <= request['ts'], request['ts'] + request['dur'] <= batch['ts'] + batch['dur'] + 1
+(True, True)
+
+An error is recorded, and raised as usual.
+
+>>> tracer = Tracer('test_trace.jsonl')
+>>> with tracer.span('request', endpoint='check'):
+...     raise OSError('connection reset')
+Traceback (most recent call last):
+...
+OSError: connection reset
+>>> tracer.close()
+>>> read_spans('test_trace.jsonl')[-1]['args']
+{'endpoint': 'check', 'error': 'OSError: connection reset', 'span_id': 1}
+
+Each thread has its own parents. Spans are added to the end of the file.
+
+>>> tracer = Tracer('test_trace.jsonl')
+>>> def work():
+...     with tracer.span('batch'):
+...         with tracer.span('request'):
+...             pass
+>>> with tracer.span('run'):
+...     threads = list(threading.Thread(target=work) for _ in range(4))
+...     for thread in threads:
+...         thread.start()
+...     for thread in threads:
+...         thread.join()
+>>> tracer.close()
+>>> spans = read_spans('test_trace.jsonl')[4:]
+>>> sorted(set(span['args'].get('parent_id') for span in spans if span['name'] == 'batch'))
+[None]
+>>> ids = dict((span['args']['span_id'], span['tid']) for span in spans)
+>>> all(ids[span['args']['parent_id']] == span['tid'] for span in spans if span['name'] == 'request')
+True
+
+When tracing is off nothing is timed or written, and a span costs about
+as little as a method call.
+
+>>> bool(NULL_TRACER), bool(tracer)
+(False, True)
+>>> with NULL_TRACER.span('request', endpoint='set') as span:
+...     span.set(status=200)
+>>> import timeit
+>>> timeit.timeit(lambda: NULL_TRACER.span('request', endpoint='set').__enter__(), number=100000) < 0.5
+True
+>>> os.remove('test_trace.jsonl')
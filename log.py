@@ -1,16 +1,126 @@
 from datetime import datetime
 import sys
+import atexit
+import queue
+import threading
 
 # Basic logger.
+# In buffered mode messages are queued and a background thread writes them
+# in batches to the console and to a log file that it keeps open, flushing
+# every 'flush_interval' seconds, on error messages, and when the logger is
+# closed. The log format is the same in either mode.
 class Logger:
-    
-    def __init__(self, log_file:str, debug:bool=False):
+
+    def __init__(self, log_file:str, debug:bool=False, buffered:bool=False, flush_interval:float=1.0):
         self.log = log_file
         self.debug = debug
         self.date_format = '%Y-%m-%d %H:%M:%S'
+        self.buffered = buffered
+        self.flush_interval = flush_interval
+        self.queue = None
+        self.writer = None
+        if self.buffered:
+            self.queue = queue.Queue()
+            self.writer = threading.Thread(target=self._drain_, name='log-writer', daemon=True)
+            self.writer.start()
+            atexit.register(self.close)
+
+    # Writes messages to the console and the log file, or queues them
+    # for the writer thread if the logger is buffered.
+    # param: entries list of (is_error, message) tuples.
+    # param: flush bool True to wait until the messages are written.
+    def _write_(self, entries:list, flush:bool=False):
+        if self.buffered and self.writer.is_alive():
+            self.queue.put(entries)
+            if flush:
+                self.flush()
+            return
+        with open(self.log, encoding='ISO-8859-1', errors='replace', mode='a') as log:
+            self._write_entries_(log, entries)
+
+    # Writes messages to an open log file and the console. Characters the
+    # log's encoding doesn't have are written as '?'.
+    # param: log open log file.
+    # param: entries list of (is_error, message) tuples.
+    def _write_entries_(self, log, entries:list):
+        for (is_error, msg) in entries:
+            log.write(f"{msg}\n")
+            if is_error:
+                sys.stderr.write(f"{msg}\n")
+            else:
+                sys.stdout.write(f"{msg}\n")
+
+    # Background thread that writes batches of queued messages with a single
+    # open log file handle. A message that can't be written doesn't stop
+    # it, and anything queued after close() is still written.
+    def _drain_(self):
+        with open(self.log, encoding='ISO-8859-1', errors='replace', mode='a') as log:
+            running = True
+            while running:
+                try:
+                    batch = [self.queue.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    log.flush()
+                    sys.stdout.flush()
+                    continue
+                # Take whatever else has arrived in the meantime.
+                while True:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                for item in batch:
+                    if item is None:
+                        running = False
+                    else:
+                        self._handle_(log, item)
+            # Messages queued just as the logger closed.
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    self._handle_(log, item)
+            log.flush()
+            sys.stdout.flush()
+
+    # Writes a queued item, either a list of messages or a flush Event,
+    # which is always set.
+    def _handle_(self, log, item):
+        try:
+            if isinstance(item, threading.Event):
+                log.flush()
+                sys.stdout.flush()
+                sys.stderr.flush()
+            else:
+                self._write_entries_(log, item)
+        except Exception as ex:
+            sys.stderr.write(f"*error, log writer failed: {ex}\n")
+        finally:
+            if isinstance(item, threading.Event):
+                item.set()
+
+    # Waits until all queued messages are written. Does nothing if
+    # the logger isn't buffered, and stops waiting if the writer thread
+    # has stopped.
+    def flush(self):
+        if self.buffered and self.writer.is_alive():
+            done = threading.Event()
+            self.queue.put(done)
+            while not done.wait(self.flush_interval):
+                if not self.writer.is_alive():
+                    break
+
+    # Writes any queued messages and stops the writer thread. Further
+    # messages are written directly.
+    def close(self):
+        if self.buffered and self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
 
     # Logs entries with timestamps.
-    # param: message str to write to log. 
+    # param: message str to write to log.
     # param: level string values can be 'error', 'info'. Default 'info'.
     # return: the time-stamped, formatted error message as was written to the log.
     def logit(self, message:str, level:str='info', include_timestamp:bool=False):
@@ -19,38 +129,27 @@ class Logger:
             time_str = f"[{datetime.now().strftime(self.date_format)}] "
         if level == 'error':
             msg = f"{time_str}*error, {message}"
-            sys.stderr.write(f"{msg}\n")
+            self._write_([(True, msg)], flush=True)
         else:
             msg = f"{time_str}{message}"
-            sys.stdout.write(f"{msg}\n")
-        with open(self.log, encoding='ISO-8859-1', mode='a') as log:
-            log.write(f"{msg}\n")
-        log.close()
+            self._write_([(False, msg)])
 
-    # Logs multiple results. 
-    # param: list of message strings. 
+    # Logs multiple results.
+    # param: list of message strings.
     # param: level string level of reporting either 'error', 'info'. Default 'info'.
     # return: List of logged strings.
     def logem(self, messages:list, level:str='info', include_timestamp:bool=False):
         time_str = ''
         if include_timestamp:
             time_str = f"[{datetime.now().strftime(self.date_format)}] "
-        with open(self.log, encoding='ISO-8859-1', mode='a') as log:
-            if level == 'error':
-                for message in messages:
-                    msg = f"{time_str}*error, {message}"
-                    log.write(f"{msg}\n")
-                    sys.stderr.write(f"{msg}\n")
-            else:
-                for message in messages:
-                    msg = f"{time_str}{message}"
-                    log.write(f"{msg}\n")
-                    sys.stdout.write(f"{msg}\n")
-        log.close()
+        if level == 'error':
+            self._write_(list((True, f"{time_str}*error, {message}") for message in messages), flush=True)
+        else:
+            self._write_(list((False, f"{time_str}{message}") for message in messages))
 
     def get_log_file(self):
         return self.log
 
 if __name__ == "__main__":
     import doctest
-    doctest.testfile("clog.tst")
\ No newline at end of file
+    doctest.testfile("log.tst")
@@ -1,7 +1,9 @@
-    
 Test if the following messages are written to the log file.
 
->>> from clog import Logger
+>>> from log import Logger
+>>> import os
+>>> if os.path.exists('test.log'):
+...     os.remove('test.log')
 
 Test logit
 ----------
@@ -13,4 +15,44 @@ Hello World!
 >>> log.logem(msgs, include_timestamp=False)
 Hello 
 World!
-    
\ No newline at end of file
+
+Test buffered logging
+---------------------
+
+Messages are written by a background thread, but the log file is the same.
+
+>>> blog = Logger('test_buffered.log', buffered=True, flush_interval=0.1)
+>>> blog.logit("Hello World!", include_timestamp=False)
+>>> blog.logem(msgs, include_timestamp=False)
+>>> blog.flush()
+Hello World!
+Hello 
+World!
+>>> blog.logit("Goodbye")
+>>> blog.close()
+Goodbye
+>>> with open('test.log', encoding='ISO-8859-1') as a, open('test_buffered.log', encoding='ISO-8859-1') as b:
+...     a.read() + 'Goodbye\n' == b.read()
+True
+
+After closing messages are written directly.
+
+>>> blog.logit("Still here")
+Still here
+
+Characters the log's encoding doesn't have are written as '?', and the
+writer thread keeps going.
+
+>>> ulog = Logger('test_unicode.log', buffered=True, flush_interval=0.1)
+>>> ulog.logem(["snow ☃"])
+>>> ulog.logit("after the snow", level='error')
+snow ☃
+>>> ulog.writer.is_alive()
+True
+>>> ulog.close()
+>>> with open('test_unicode.log', encoding='ISO-8859-1') as f:
+...     f.read()
+'snow ?\n*error, after the snow\n'
+>>> os.remove('test.log')
+>>> os.remove('test_buffered.log')
+>>> os.remove('test_unicode.log')
@@ -18,15 +18,23 @@
 # limitations under the License.
 #
 ###############################################################################
+# Type annotations aren't evaluated, so the classes they name are only
+# imported where they are used.
+from __future__ import annotations
+import os
 import sys
-from os.path import join, dirname, exists
-import yaml
+import signal
+import time
+import threading
+from os.path import join, dirname, exists, splitext
 import argparse
-from lib.oclcws import OclcService
-from lib.oclcreport import OclcReport
 from log import Logger
 from lib.listutils import Lister, InstructionManager
-# from lib.flat2marcxml import MarcXML
+from lib.compressed import output_path
+# Everything else is imported by the functions and options that use it, so
+# a merge with --save_as never loads the web service's 'requests' stack, and
+# --help and --version load next to nothing. scripts/importtime.py guards
+# the start up time of each.
 
 VERSION='3.02.00'
 
@@ -34,6 +42,7 @@ VERSION='3.02.00'
 # param: path of the yaml file. 
 # return: dictionary of settings, or an empty dict if there was an error.
 def _load_yaml_(yaml_path:str) -> dict:
+    import yaml
     yaml_file = join(dirname(__file__), yaml_path)
     config = {}
     if exists(yaml_file):
@@ -54,48 +63,57 @@ def _load_yaml_(yaml_path:str) -> dict:
 # param: Remaining records, count of records that didn't get processed. This 
 #   can be non-zero if the web service is interupted or you exceed quota of 
 #   web service calls.
+# param: Skipped records, count of records that weren't sent because the
+#   local holdings mirror shows they are already done.
 # return: none
-def print_tally(action:str, tally:dict, logger:Logger, remaining:int=0):
+def print_tally(action:str, tally:dict, logger:Logger, remaining:int=0, skipped:int=0):
     msg =  f"operation '{action}' results.\n"
-    msg += f"          succeeded: {tally['success']}\n"
-    msg += f"           warnings: {tally['warnings']}\n"
-    msg += f"             errors: {tally['errors']}\n"
+    msg += f"          succeeded: {tally.get('success', 0)}\n"
+    msg += f"           warnings: {tally.get('warnings', 0)}\n"
+    msg += f"             errors: {tally.get('errors', 0)}\n"
     if remaining and remaining > 0:
-        msg += f"unprocessed records: {remainig}\n"
-    msg += f"      total records: {tally['total']}"
+        msg += f"unprocessed records: {remaining}\n"
+    if skipped and skipped > 0:
+        msg += f"  skipped (no-op)  : {skipped}\n"
+    msg += f"      total records: {tally.get('total', 0)}"
     logger.logit(f"{msg}", include_timestamp=False)
 
-# Creates an institutional-specific bib record. 
-# param: list of records as lists of FLAT strings, where FLAT refers to 
-#  SirsiDynix's Symphony FLAT record format.
-# def upload_bib_record(
-#   flat_records:list, 
-#   configs:dict, 
-#   logger:Logger, 
-#   debug:bool=False):
-#     if not flat_records:
-#         print_tally('bib upload', {}, logger)
-#         return
-#     # TODO: This request throws an error on the test sandbox. I have submitted a query
-#     # to OCLC to determine why, but have not heard back yet. April 06, 2023.
-#     ws = OclcService(configs, debug=debug)
-#     report = OclcReport(debug=debug)
-#     left_over_record_count = 0
-#     for flat_record in flat_records:
-#         xml_record = MarcXML(flat_record)
-#         if debug:
-#             print(f"DEBUG HERE xml: {xml_record}")
-#         response = ws.create_intitution_level_bib_record(xml_record.as_bytes(), debug=debug)
-#         # response = ws.validate_add_bib_record(xml_record.as_bytes(), debug=debug)
-#         if debug:
-#             print(f"DEBUG HERE response: {response}")
-#         if not report.create_bib_response(response, debug=debug):
-#             left_over_record_count = len(flat_records)
-#             msg = f"The web service stopped while uploading XML holdings.\nThe last record processed was {flat_record}\n\n"
-#             logger.logit(msg, level='error', include_timestamp=True)
-#             break
-#     r_dict = report.get_bib_load_results()
-#     print_tally('bib upload', r_dict, logger)
+# Creates institution-level bib records for the flat records that don't
+# have OCLC numbers. The new OCLC numbers are written to '<flat>.updated'
+# for 'catalogmerge', and each record's outcome to '<flat>.upload' so
+# the upload can be resumed.
+# param: flat_file:str path to the Symphony flat file.
+# param: tcns:list TCNs of records without OCLC numbers.
+# param: configs:dict of settings from the YAML file.
+# param: Logger.
+# param: workers:int number of concurrent uploads.
+# param: debug True for debug information.
+# param: ledger optional QuotaLedger that paces and counts the hits.
+# param: tracer optional Tracer of the web service calls.
+# return: dictionary of TCNs and their new OCLC numbers.
+def upload_bib_records(
+  flat_file:str,
+  tcns:list,
+  configs:dict,
+  logger:Logger,
+  workers:int=4,
+  debug:bool=False,
+  ledger=None,
+  metrics:Metrics=None,
+  tracer=None):
+    from lib.oclcws import OclcService
+    from lib.oclcreport import OclcReport
+    from lib.bibupload import BibUploader
+    if not tcns:
+        print_tally('bib upload', {}, logger)
+        return {}
+    ws = OclcService(configs, debug=debug, ledger=ledger, metrics=metrics, tracer=tracer)
+    report = OclcReport(debug=debug)
+    uploader = BibUploader(flat_file, tcns, ws, report, logger=logger, workers=workers,
+        branch=configs['service'].get('branchName', ''), debug=debug)
+    r_dict = uploader.run()
+    print_tally('bib upload', r_dict, logger)
+    return uploader.get_created()
 
 # Adds or sets the institutional holdings.
 # param: oclc number list of holdings to set.
@@ -103,37 +121,69 @@ def print_tally(action:str, tally:dict, logger:Logger, remaining:int=0):
 #   a given server. 
 # param: Logger. 
 # param: debug True for debug information.
+# param: sink optional list of sinks for per-number outcomes.
+# param: log_results False to only write per-number results to the log
+#   when debugging.
+# param: skipped count of numbers that didn't need setting.
+# param: ledger optional QuotaLedger that paces and counts the hits.
+# param: limit optional AdaptiveLimit on concurrent requests. Default one at a time.
+# param: ws optional OclcService to reuse.
+# param: stop optional threading.Event that stops the sending between batches.
+# param: pool optional ThreadPoolExecutor shared with other jobs.
+# param: deadline optional Deadline that stops the sending in time to finish.
+# param: hits optional int most hits to spend, retries included. Numbers
+#   that don't fit are left in the list.
 # return: None
 def add_holdings(
   oclc_numbers:list, 
   configs:dict, 
   logger:Logger, 
-  debug:bool=False):
+  debug:bool=False,
+  sink=None,
+  log_results:bool=True,
+  skipped:int=0,
+  ledger=None,
+  limit:AdaptiveLimit=None,
+  ws:OclcService=None,
+  stop=None,
+  pool=None,
+  deadline=None,
+  hits:int=None):
+    from lib.oclcws import OclcService
+    from lib.oclcreport import OclcReport
+    from lib.scheduler import BATCH_SIZES
+    from lib.quota import QuotaExceeded
+    from lib.concurrency import AdaptiveLimit, send_batches
     if not oclc_numbers:
-        print_tally('add / set', {}, logger)
-        return
-    # Create a web service object. 
-    ws = OclcService(configs, debug=debug)
-    report = OclcReport(debug=debug)
+        print_tally('add / set', {}, logger, skipped=skipped)
+        return [], {}
+    # Create a web service object if one isn't shared.
+    if ws is None:
+        ws = OclcService(configs, debug=debug, ledger=ledger)
+    report = OclcReport(debug=debug, sink=sink)
     done_list = []
-    updated_dict = {}
-    while oclc_numbers:
-        param_str, status_code, content = ws.set_institution_holdings(oclc_numbers)
-        done = param_str.split(',')
-        last_oclc_number = ''
-        if done:
-            last_oclc_number = done[-1]
-        went_okay, messages = report.set_response(code=status_code, json_data=content, debug=debug)
-        if went_okay:
-            logger.logem(messages)
-            updated_dict = report.get_updated()
-        else:
-            msg = f"The web service stopped while setting holdings:\n{last_oclc_number}"
+    # Handles each response in the order they arrive. Returns False to stop sending.
+    def handle(batch:list, param_str:str, status_code:int, content) -> bool:
+        # HTTP errors are reported as a bare False.
+        with ws.tracer.span('report', action='+', batch_size=len(batch), status=status_code):
+            went_okay, messages = report.set_response(code=status_code, json_data=content, debug=debug) or (False, [])
+        if not went_okay:
+            msg = f"The web service stopped while setting holdings:\n{batch[-1]}"
             logger.logit(msg, level='error', include_timestamp=True)
-            break
-        done_list.extend(done)
+            return False
+        if log_results or debug:
+            logger.logem(messages)
+        done_list.extend(param_str.split(','))
+        return True
+    if limit is None:
+        limit = AdaptiveLimit(initial=1, maximum=1)
+    try:
+        send_batches(lambda numbers: ws.set_institution_holdings(numbers), oclc_numbers, BATCH_SIZES['+'], limit, handle, stop=stop, pool=pool, metrics=ws.metrics, deadline=deadline, tracer=ws.tracer, hits=hits)
+    except QuotaExceeded as ex:
+        logger.logit(f"{ex}", level='error', include_timestamp=True)
+    updated_dict = report.get_updated()
     r_dict = report.get_set_holdings_results()
-    print_tally('add / set', r_dict, logger)
+    print_tally('add / set', r_dict, logger, skipped=skipped)
     return done_list, updated_dict
 
 # Checks list of OCLC control numbers as part of the institutional holdings.
@@ -142,33 +192,63 @@ def add_holdings(
 #   a given server.
 # param: Logger. 
 # param: debug True for debug information.
+# param: sink optional list of sinks for per-number outcomes.
+# param: log_results False to only log per-number results when debugging.
+# param: ledger optional QuotaLedger that paces and counts the hits.
+# param: limit optional AdaptiveLimit on concurrent requests. Default one at a time.
+# param: ws optional OclcService to reuse.
+# param: stop optional threading.Event that stops the sending between batches.
+# param: pool optional ThreadPoolExecutor shared with other jobs.
+# param: deadline optional Deadline that stops the sending in time to finish.
+# param: hits optional int most hits to spend, retries included. Numbers
+#   that don't fit are left in the list.
 # return: List of done OCLC numbers.
 def check_institutional_holdings(
   oclc_numbers:list, 
   configs:dict, 
   logger:Logger, 
-  debug:bool=False):
+  debug:bool=False,
+  sink=None,
+  log_results:bool=True,
+  ledger=None,
+  limit:AdaptiveLimit=None,
+  ws:OclcService=None,
+  stop=None,
+  pool=None,
+  deadline=None,
+  hits:int=None):
+    from lib.oclcws import OclcService
+    from lib.oclcreport import OclcReport
+    from lib.scheduler import BATCH_SIZES
+    from lib.quota import QuotaExceeded
+    from lib.concurrency import AdaptiveLimit, send_batches
     if not oclc_numbers:
         print_tally('check', {}, logger)
-        return
-    # Create a web service object. 
-    ws = OclcService(configs, debug=debug)
-    report = OclcReport(debug=debug)
+        return []
+    # Create a web service object if one isn't shared.
+    if ws is None:
+        ws = OclcService(configs, debug=debug, ledger=ledger)
+    report = OclcReport(debug=debug, sink=sink)
     done_list = []
-    while oclc_numbers:
-        param_str, status_code, content = ws.check_institution_holdings(oclc_numbers, debug=debug)
-        done = param_str.split(',')
-        last_oclc_number = ''
-        if done:
-            last_oclc_number = done[-1]
-        went_okay, messages = report.check_holdings_response(code=status_code, json_data=content, debug=debug)
-        if went_okay:
-            logger.logem(messages)
-        else:
-            msg = f"The web service stopped while checking numbers:\n{last_oclc_number}"
+    # Handles each response in the order they arrive. Returns False to stop sending.
+    def handle(batch:list, param_str:str, status_code:int, content) -> bool:
+        # HTTP errors are reported as a bare False.
+        with ws.tracer.span('report', action='?', batch_size=len(batch), status=status_code):
+            went_okay, messages = report.check_holdings_response(code=status_code, json_data=content, debug=debug) or (False, [])
+        if not went_okay:
+            msg = f"The web service stopped while checking numbers:\n{batch[-1]}"
             logger.logit(msg, level='error', include_timestamp=True)
-            break
-        done_list.extend(done)
+            return False
+        if log_results or debug:
+            logger.logem(messages)
+        done_list.extend(param_str.split(','))
+        return True
+    if limit is None:
+        limit = AdaptiveLimit(initial=1, maximum=1)
+    try:
+        send_batches(lambda numbers: ws.check_institution_holdings(numbers, debug=debug), oclc_numbers, BATCH_SIZES['?'], limit, handle, stop=stop, pool=pool, metrics=ws.metrics, deadline=deadline, tracer=ws.tracer, hits=hits)
+    except QuotaExceeded as ex:
+        logger.logit(f"{ex}", level='error', include_timestamp=True)
     r_dict = report.get_check_holdings_results()
     print_tally('holdings', r_dict, logger)
     return done_list
@@ -179,37 +259,377 @@ def check_institutional_holdings(
 #   a given server.
 # param: Logger. 
 # param: debug True for debug information.
+# param: sink optional list of sinks for per-number outcomes.
+# param: log_results False to only log per-number results when debugging.
+# param: skipped count of numbers that didn't need unsetting.
+# param: ledger optional QuotaLedger that paces and counts the hits.
+# param: limit optional AdaptiveLimit on concurrent requests. Default one at a time.
+# param: ws optional OclcService to reuse.
+# param: stop optional threading.Event that stops the sending between batches.
+# param: pool optional ThreadPoolExecutor shared with other jobs.
+# param: deadline optional Deadline that stops the sending in time to finish.
+# param: hits optional int most hits to spend, retries included. Numbers
+#   that don't fit are left in the list.
 # return: None
 def delete_holdings(
   oclc_numbers:list, 
   configs:dict, 
   logger:Logger, 
-  debug:bool=False):
+  debug:bool=False,
+  sink=None,
+  log_results:bool=True,
+  skipped:int=0,
+  ledger=None,
+  limit:AdaptiveLimit=None,
+  ws:OclcService=None,
+  stop=None,
+  pool=None,
+  deadline=None,
+  hits:int=None):
+    from lib.oclcws import OclcService
+    from lib.oclcreport import OclcReport
+    from lib.scheduler import BATCH_SIZES
+    from lib.quota import QuotaExceeded
+    from lib.concurrency import AdaptiveLimit, send_batches
     if not oclc_numbers:
-        print_tally('delete / unset', {}, logger)
-        return
-    # Create a web service object. 
-    ws = OclcService(configs, debug=debug)
-    report = OclcReport(debug=debug)
+        print_tally('delete / unset', {}, logger, skipped=skipped)
+        return []
+    # Create a web service object if one isn't shared.
+    if ws is None:
+        ws = OclcService(configs, debug=debug, ledger=ledger)
+    report = OclcReport(debug=debug, sink=sink)
     done_list = []
-    while oclc_numbers:
-        param_str, status_code, content = ws.unset_institution_holdings(oclc_numbers, debug=debug)
-        done = param_str.split(',')
-        last_oclc_number = ''
-        if done:
-            last_oclc_number = done[-1]
-        went_okay, messages = report.delete_response(code=status_code, json_data=content, debug=debug)
-        if went_okay:
-            logger.logem(messages)
-        else:
-            msg = f"The web service stopped while deleting holdings:\n{last_oclc_number}"
+    # Handles each response in the order they arrive. Returns False to stop sending.
+    def handle(batch:list, param_str:str, status_code:int, content) -> bool:
+        # HTTP errors are reported as a bare False.
+        with ws.tracer.span('report', action='-', batch_size=len(batch), status=status_code):
+            went_okay, messages = report.delete_response(code=status_code, json_data=content, debug=debug) or (False, [])
+        if not went_okay:
+            msg = f"The web service stopped while deleting holdings:\n{batch[-1]}"
             logger.logit(msg, level='error', include_timestamp=True)
-            break
-        done_list.extend(done)
+            return False
+        if log_results or debug:
+            logger.logem(messages)
+        done_list.extend(param_str.split(','))
+        return True
+    if limit is None:
+        limit = AdaptiveLimit(initial=1, maximum=1)
+    try:
+        send_batches(lambda numbers: ws.unset_institution_holdings(numbers, debug=debug), oclc_numbers, BATCH_SIZES['-'], limit, handle, stop=stop, pool=pool, metrics=ws.metrics, deadline=deadline, tracer=ws.tracer, hits=hits)
+    except QuotaExceeded as ex:
+        logger.logit(f"{ex}", level='error', include_timestamp=True)
     r_dict = report.get_delete_holdings_results()
-    print_tally('delete / unset', r_dict, logger)
+    print_tally('delete / unset', r_dict, logger, skipped=skipped)
     return done_list
 
+# Runs the instructions in a file, as written by --save_as. The work done
+# and the instructions still to do are written to '<run_file>.completed',
+# or '<run_file>.interrupted' if the run was interrupted or stopped. A
+# compressed run file's results are compressed too, like 'x.lst.completed.gz'.
+# param: run_file str path to the instruction file.
+# param: configs dict of settings from the YAML file.
+# param: logger Logger.
+# param: debug True for debug information.
+# param: outcomes optional file to write per-number results to instead of the log.
+# param: force True to send instructions the holdings mirror shows are already done.
+# param: lister optional Lister of the flat file to write updated numbers to.
+# param: ws optional OclcService to reuse, one is created otherwise.
+# param: ledger optional QuotaLedger that paces and counts the hits.
+# param: limit optional AdaptiveLimit to reuse, one is created otherwise.
+# param: stop optional threading.Event that stops the run between batches.
+# param: pool optional ThreadPoolExecutor shared with other jobs.
+# param: metrics optional Metrics that counts and times the run.
+# param: profiler optional PhaseProfiler that profiles each phase of the run.
+# param: in_place True to mark the done instructions '!' in run_file itself
+#   and rename it '.completed' or '.interrupted'. Instructions that aren't
+#   done are left as they are, so ' ' and duplicate lines stay too.
+# param: deadline optional Deadline. No batch is sent that wouldn't finish
+#   before it, and the run is saved as '.interrupted' if any were held back.
+# param: progress True to report the numbers done, hits, rate, and ETA as
+#   the run goes, see lib/progress.py.
+# param: progress_interval float optional seconds between progress reports.
+# param: tracer optional Tracer of the web service calls, if ws isn't given.
+# param: requeue True to save a run that couldn't send everything within
+#   the hits budget as '.interrupted', so a spool or shard puts it back,
+#   instead of '.completed' with the rest still to do.
+# return: str path of the '.completed' or '.interrupted' file written.
+def run_instructions(
+  run_file:str,
+  configs:dict,
+  logger:Logger,
+  debug:bool=False,
+  outcomes:str=None,
+  force:bool=False,
+  lister:Lister=None,
+  ws:OclcService=None,
+  ledger:QuotaLedger=None,
+  limit:AdaptiveLimit=None,
+  stop=None,
+  pool=None,
+  metrics:Metrics=None,
+  profiler:PhaseProfiler=None,
+  in_place:bool=False,
+  deadline=None,
+  progress:bool=False,
+  progress_interval:float=None,
+  tracer=None,
+  requeue:bool=False) -> str:
+    from lib.oclcws import OclcService
+    from lib.oclcreport import OutcomeSink
+    from lib.history import HistoryStore
+    from lib.remap import RemapTable
+    from lib.holdings import HoldingsMirror
+    from lib.scheduler import HitScheduler, DEFAULT_POLICY
+    from lib.concurrency import AdaptiveLimit
+    from lib.profiler import PhaseProfiler
+    if profiler is None:
+        profiler = PhaseProfiler()
+    # OCLC numbers that OCLC reported as changed in previous runs.
+    remap_table = None
+    remap_dict  = {}
+    if configs.get('database'):
+        remap_table = RemapTable(configs.get('database'), debug=debug)
+        remap_dict  = remap_table.as_dict()
+    # Load instruction list specified by run_file. 
+    instruction_manager = InstructionManager(run_file, debug=debug, remap=remap_dict, metrics=metrics, in_place=in_place)
+    parse_started = time.monotonic()
+    with profiler.phase('parse'):
+        set_holdings_lst    = instruction_manager.read_instruction_numbers('+')
+        unset_holdings_lst  = instruction_manager.read_instruction_numbers('-')
+        check_holdings_lst  = instruction_manager.read_instruction_numbers('?')
+        # If there are done items in the file, mark them done for when we write to '.completed'.
+        done_lst            = list('!' + num for num in instruction_manager.read_instruction_numbers('!'))
+    remapped            = instruction_manager.get_remapped()
+    if deadline:
+        # Saving what is left takes about as long as reading it did.
+        deadline.reserve(time.monotonic() - parse_started)
+    # The results of a packed file are packed too.
+    packed              = instruction_manager.is_packed()
+    # Only instructions done in this run are marked in place.
+    already_done        = len(done_lst)
+    run_manager         = instruction_manager
+    if in_place and not run_manager.can_mark_in_place():
+        logger.logit(f"can't mark '{run_file}' done in place, it is compressed or a pipe, writing it instead.")
+        in_place = False
+    if remapped:
+        logger.logit(f"replaced {len(remapped)} OCLC numbers with their current numbers.")
+    # Drop instructions the local holdings mirror shows are already done at OCLC.
+    mirror = None
+    skipped_set_lst   = []
+    skipped_unset_lst = []
+    if configs.get('database'):
+        mirror = HoldingsMirror(configs.get('database'), debug=debug)
+        if not force:
+            set_holdings_lst, skipped_set_lst     = mirror.filter('+', set_holdings_lst)
+            unset_holdings_lst, skipped_unset_lst = mirror.filter('-', unset_holdings_lst)
+            done_lst.extend(list('!' + num for num in skipped_set_lst + skipped_unset_lst))
+    sink = []
+    if outcomes:
+        sink.append(OutcomeSink(outcomes))
+    if configs.get('database'):
+        history = HistoryStore(configs.get('database'), debug=debug)
+        history.start_run(run_file, configs['service'].get('institutionalSymbol', ''))
+        sink.append(history)
+    if remap_table:
+        # Remember any numbers OCLC reports as changed for the next run.
+        sink.append(remap_table)
+    if mirror:
+        sink.append(mirror)
+    # Spend the hits quota across all the operations, the rest is pending.
+    hits_quota = configs.get('hitsQuota')
+    # The day's remaining hits, if less, limit this run too.
+    if ledger and ledger.remaining() is not None:
+        hits_quota = ledger.remaining() if hits_quota is None else min(int(hits_quota), ledger.remaining())
+    scheduler = HitScheduler(hits_quota, policy=configs.get('hitsPolicy', DEFAULT_POLICY))
+    scheduled, pending = scheduler.plan({'+': set_holdings_lst, '-': unset_holdings_lst, '?': check_holdings_lst})
+    set_holdings_lst   = scheduled['+']
+    unset_holdings_lst = scheduled['-']
+    check_holdings_lst = scheduled['?']
+    pending_lst = list(action + num for action in pending for num in pending[action])
+    # Instructions the budget left for a later run, not counting actions
+    # the policy never sends.
+    over_budget = any(pending[action] for action in scheduler.get_policy())
+    hits = scheduler.get_hits()
+    # Retries spend hits too, so with a quota each operation stops at the
+    # hits planned for it and what is left stays to do.
+    planned = dict(hits) if hits_quota is not None else {}
+    logger.logit(f"scheduled {sum(hits.values())} hits of {hits_quota} quota: " + ', '.join(f"'{a}' {hits.get(a, 0)}" for a in scheduler.get_policy()) + f", {len(pending_lst)} instructions pending.")
+    if progress:
+        from lib.progress import Progress
+        reporter = Progress(dict((action, len(scheduled[action])) for action in scheduler.get_policy()),
+            hits_quota=hits_quota, logger=logger, interval=progress_interval)
+        reporter.start()
+        # Closed with the other sinks.
+        sink.append(reporter)
+    # Requests in flight start at one and adapt to how OCLC responds.
+    if limit is None:
+        limit = AdaptiveLimit(initial=1, maximum=configs.get('maxConcurrency', 4),
+            latency_target=configs.get('latencyTarget'), logger=logger, debug=debug)
+    # One web service, and its connections, for all the operations.
+    if ws is None:
+        ws = OclcService(configs, debug=debug, ledger=ledger, metrics=metrics, tracer=tracer)
+    run_file_written = output_path(run_file, '.completed')
+    # Call the web service with the appropriate list, and capture results.
+    try:
+        if debug:
+            sys.stderr.write(f"set: {set_holdings_lst[:3]}...\nunset: {unset_holdings_lst[:3]}...\ncheck: {check_holdings_lst[:3]}...\n")
+        for action in scheduler.get_policy():
+            if (stop and stop.is_set()) or (deadline and deadline.is_reached()):
+                break
+            if action == '?' and check_holdings_lst:
+                with profiler.phase('check'):
+                    done = check_institutional_holdings(check_holdings_lst, configs=configs, logger=logger, debug=debug, sink=sink, log_results=not outcomes, ledger=ledger, limit=limit, ws=ws, stop=stop, pool=pool, deadline=deadline, hits=planned.get('?'))
+                done_lst.extend(list('!' + num for num in done))
+            elif action == '-' and (unset_holdings_lst or skipped_unset_lst):
+                with profiler.phase('unset'):
+                    done = delete_holdings(unset_holdings_lst, configs=configs, logger=logger, debug=debug, sink=sink, log_results=not outcomes, skipped=len(skipped_unset_lst), ledger=ledger, limit=limit, ws=ws, stop=stop, pool=pool, deadline=deadline, hits=planned.get('-'))
+                done_lst.extend(list('!' + num for num in done))
+            elif action == '+' and (set_holdings_lst or skipped_set_lst):
+                with profiler.phase('set'):
+                    done, updated = add_holdings(set_holdings_lst, configs=configs, logger=logger, debug=debug, sink=sink, log_results=not outcomes, skipped=len(skipped_set_lst), ledger=ledger, limit=limit, ws=ws, stop=stop, pool=pool, deadline=deadline, hits=planned.get('+'))
+                done_lst.extend(list('!' + num for num in done))
+                # Numbers that were remapped before sending need their records updated too.
+                # Write out any updated oclc numbers to flat slim.
+                # TODO: Currently one must use the --add --save_as AND --run 
+                # for the lister below to have a valid flatLister. 
+                # Can this be made simpler?? Can we use --flat or 
+                updated = {**dict((old, updated.get(new, new)) for (old, new) in remapped.items()), **updated}
+                if updated and lister:
+                    lister.write_updates(updated)
+
+        logger.logit(f"concurrency limit {limit.get_limit()} after {len(limit.get_decisions())} changes.")
+        # A stopped run, or one out of time, is saved like an interrupted one.
+        if (stop and stop.is_set()) or (deadline and deadline.is_reached()):
+            run_file_written = output_path(run_file, '.interrupted')
+        # So is one out of hits, if it is to be put back and run again. The
+        # scheduled numbers the web service didn't get to are still in the lists.
+        out_of_hits = requeue and (over_budget or (ledger and ledger.remaining() == 0
+            and bool(set_holdings_lst or unset_holdings_lst or check_holdings_lst)))
+        if out_of_hits:
+            run_file_written = output_path(run_file, '.interrupted')
+        if in_place:
+            with profiler.phase('write'):
+                _mark_done_in_place_(run_manager, done_lst[already_done:], run_file_written, logger)
+        else:
+            # Write out the lists. The web service calls remove numbers from the lists
+            # as they are sent, so what is left, plus what didn't fit in the quota,
+            # is still to do.
+            instruction_manager = InstructionManager(run_file_written, debug=debug, metrics=metrics, packed=packed)
+            set_holdings_lst   = list('+' + num for num in set_holdings_lst)
+            unset_holdings_lst = list('-' + num for num in unset_holdings_lst)
+            check_holdings_lst = list('?' + num for num in check_holdings_lst)
+            with profiler.phase('merge'):
+                completed_list = instruction_manager.merge(set_holdings_lst, unset_holdings_lst, check_holdings_lst, pending_lst, done_lst)
+            # Output the completed save_as list, including instructions beyond quota.
+            with profiler.phase('write'):
+                instruction_manager.write_instructions(completed_list)
+        if stop and stop.is_set():
+            logger.logit(f"stopped, saved work done to '{run_file_written}'.", include_timestamp=True)
+        elif deadline and deadline.is_reached():
+            logger.logit(f"out of time, saved work done to '{run_file_written}'.", include_timestamp=True)
+        elif out_of_hits:
+            logger.logit(f"out of hits, saved work done to '{run_file_written}'.", include_timestamp=True)
+        else:
+            logger.logit('done', include_timestamp=True)
+    except KeyboardInterrupt:
+        run_file_written = output_path(run_file, '.interrupted')
+        if in_place:
+            _mark_done_in_place_(run_manager, done_lst[already_done:], run_file_written, logger)
+        else:
+            instruction_manager = InstructionManager(run_file_written, debug=debug, metrics=metrics, packed=packed)
+            # Save the instructions that haven't been done yet.
+            set_holdings_lst   = list('+' + num for num in set_holdings_lst)
+            unset_holdings_lst = list('-' + num for num in unset_holdings_lst)
+            check_holdings_lst = list('?' + num for num in check_holdings_lst)
+            # Don't add another action character to the done_lst
+            complete_incomplete_list = instruction_manager.merge(set_holdings_lst, unset_holdings_lst, check_holdings_lst, pending_lst, done_lst)
+            # Output the state of the lists as they were at the time of the interrupt.
+            instruction_manager.write_instructions(complete_incomplete_list)
+        logger.logit('!Warning, received keyboard interrupt!\nSaving work done.', level='error', include_timestamp=True)
+        logger.logit('exited on <ctrl> + C interrupt.', include_timestamp=True)
+    finally:
+        for s in sink:
+            s.close()
+    return run_file_written
+
+# Marks the instructions done in a run in the instruction file itself, then
+# renames it '.completed' or '.interrupted', so a big file isn't merged and
+# written again to record a few done instructions.
+# param: manager InstructionManager that read the file with in_place=True.
+# param: done list of done instructions like '!1234'.
+# param: run_file_written str the name the file is given when it is marked.
+# param: logger Logger.
+def _mark_done_in_place_(manager:InstructionManager, done:list, run_file_written:str, logger:Logger):
+    marked = manager.mark_done(list(instruction[1:] for instruction in done))
+    os.replace(manager.instruction_file, run_file_written)
+    logger.logit(f"marked {marked} instructions done in place, and renamed '{manager.instruction_file}' to '{run_file_written}'.")
+
+# Runs several institutions' instruction files at the same time. Each job
+# has its own YAML, so its own token, quota ledger, concurrency limit, and
+# log, but they share one pool of HTTP connections and one pool of workers,
+# so the whole run takes about as long as the biggest job.
+# param: jobs list of (YAML file, instruction file) pairs.
+# param: logger Logger for the run as a whole. Each job logs to
+#   '<log>_<institutionalSymbol>.log', or the 'log' in its YAML.
+# param: debug True for debug information.
+# param: force True to send instructions the holdings mirror shows are already done.
+# param: stop optional threading.Event that stops all the jobs between batches.
+# param: metrics optional Metrics shared by the jobs.
+# param: in_place True to mark done instructions in each instruction file, see run_instructions().
+# param: tracer optional Tracer shared by the jobs.
+# return: dictionary of {instruction file: '.completed' or '.interrupted' file written}.
+def run_jobs(
+  jobs:list,
+  logger:Logger,
+  debug:bool=False,
+  force:bool=False,
+  stop=None,
+  metrics:Metrics=None,
+  in_place:bool=False,
+  tracer=None) -> dict:
+    from concurrent.futures import ThreadPoolExecutor
+    from lib.oclcws import OclcService, shared_session
+    from lib.quota import QuotaLedger
+    prepared = []
+    for (yaml_file, run_file) in jobs:
+        configs = _load_yaml_(yaml_file)
+        if 'error' in configs.keys():
+            logger.logit(f"skipping '{run_file}': {configs.get('error')}", level='error')
+            continue
+        symbol = configs['service'].get('institutionalSymbol', '')
+        # Each institution gets its own token.
+        configs['service'].setdefault('tokenCache', f"_auth_{symbol}.json")
+        log_file = configs.get('log', f"{splitext(logger.get_log_file())[0]}_{symbol}.log")
+        prepared.append((configs, run_file, symbol, Logger(log_file=log_file, buffered=True)))
+    workers = sum(int(configs.get('maxConcurrency', 4)) for (configs, run_file, symbol, job_logger) in prepared)
+    session = shared_session(workers)
+    results = {}
+    # Runs one job, in its own thread.
+    def run_job(configs:dict, run_file:str, symbol:str, job_logger:Logger):
+        job_logger.logit(f"=== starting version {VERSION}, '{run_file}' for {symbol}", include_timestamp=True)
+        ledger = None
+        if configs.get('database') or configs.get('hitsPerDay') or configs.get('hitsPerSecond'):
+            ledger = QuotaLedger(configs.get('database') or ':memory:', symbol, per_day=configs.get('hitsPerDay'),
+                per_second=configs.get('hitsPerSecond'), debug=debug)
+        try:
+            ws = OclcService(configs, debug=debug, ledger=ledger, session=session, metrics=metrics, tracer=tracer)
+            results[run_file] = run_instructions(run_file, configs, job_logger, debug=debug, force=force,
+                ws=ws, ledger=ledger, stop=stop, pool=pool, metrics=metrics, in_place=in_place)
+        except Exception as ex:
+            job_logger.logit(f"'{run_file}' for {symbol} failed: {ex}", level='error', include_timestamp=True)
+        finally:
+            if ledger:
+                ledger.close()
+            job_logger.close()
+        logger.logit(f"{symbol} '{run_file}' finished: '{results.get(run_file, 'failed')}'.", include_timestamp=True)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        threads = list(threading.Thread(target=run_job, args=job, name=f"job-{job[2]}") for job in prepared)
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return results
+
 # Main entry to the application if not testing.
 def main(argv):
     parser = argparse.ArgumentParser(
@@ -257,21 +677,107 @@ service:
   branchName:    'MAIN'
 ignoreTags: 
   '250': 'Expected release'
-hitsQuota:       100
+hitsQuota:       100              # Web service hits per run, shared by all operations.
+hitsPolicy:      '-+?'            # Optional order hits are spent: unset, set, then check.
+hitsPerDay:      50000            # Optional daily limit, counted by UTC day across runs.
+hitsPerSecond:   10               # Optional limit on the pace of the hits.
+maxConcurrency:  4                # Optional most requests in flight, default 4.
+latencyTarget:   2.0              # Optional seconds before a response counts as slow.
+leaseSeconds:    300              # Optional seconds before a --worker's lease on a shard expires.
 dataDir:         'data'           
+database:        'oclc.db'        # Optional history of every operation.
         '''
     )
-    parser.add_argument('--add', action='store', metavar='[/foo/my_nums.lst]', help='List of OCLC numbers to add to OCLC\'s holdings database.')
+    parser.add_argument('--add', action='store', metavar='[/foo/my_nums.lst]', help='List of OCLC numbers to add to OCLC\'s holdings database, or \'-\' to read flat records from stdin as they are written.')
     parser.add_argument('--check', action='store', metavar='[/foo/check.lst]', help='Check if the OCLC numbers in the list are valid.')
     parser.add_argument('-d', '--debug', action='store_true', default=False, help='turn on debugging.')
     parser.add_argument('--delete', action='store', metavar='[/foo/oclc_nums.lst]', help='List of OCLC numbers to delete from OCLC\'s holdings database.')
+    parser.add_argument('--job', action='append', nargs=2, metavar=('[/foo/prod.yaml]', '[/foo/save_as.lst]'), help='Run an institution\'s instruction file with its own YAML. Repeat for each institution, and they run at the same time.')
+    parser.add_argument('--max_runtime', action='store', type=float, metavar='[3600]', help='Seconds --run may take, like --deadline.')
+    parser.add_argument('--metrics', action='store', metavar='[/foo/oclc.prom]', help='Write counters and latencies of the run to this Prometheus textfile, and a JSON summary beside it, at the end of the run and every --metrics_interval seconds.')
+    parser.add_argument('--metrics_interval', action='store', type=float, default=60.0, metavar='[60]', help='Seconds between writes of the --metrics files during the run. Default 60.')
+    parser.add_argument('--history', action='store', metavar='[OCLC number]', help='Show every recorded operation on an OCLC number. Requires \'database\' in the YAML file.')
+    parser.add_argument('--in_place', action='store_true', default=False, help='Mark done instructions \'!\' in the --run file itself and rename it \'.completed\', rather than writing a new file. Not for compressed files.')
+    parser.add_argument('--force', action='store_true', default=False, help='Send every instruction with --run, even if the local holdings mirror shows it is already done.')
+    parser.add_argument('--deadline', action='store', metavar='[06:30]', help='Time of day, 24 hour, that --run must be finished by. No batch is sent that wouldn\'t finish in time, and what is left is saved as \'.interrupted\'.')
     parser.add_argument('--done', action='store', metavar='[/foo/completed.lst]', help='Used if the process was interrupted.')
+    parser.add_argument('--seed_holdings', action='store', metavar='[/foo/oclc_report.csv]', help='Record the numbers in an OCLC holdings report as set in the local holdings mirror. Requires \'database\' in the YAML file.')
+    parser.add_argument('--shard', action='store', metavar='[/foo/save_as.lst]', help='Split an instruction file into shards in --shard_dir for --worker processes to share, work on them too, and merge the results into one \'.completed\' file. The coordinator and workers share one budget a UTC day, \'hitsPerDay\', or \'hitsQuota\' if there is no \'hitsPerDay\', counted in a \'database\' they can all reach, and won\'t start without one.')
+    parser.add_argument('--shard_dir', action='store', metavar='[/shared/shards]', help='Shared directory of shards. Default the --shard file name with \'.shards\'.')
+    parser.add_argument('--shard_size', action='store', type=int, default=10000, metavar='[10000]', help='Instructions per shard. Default 10000.')
+    parser.add_argument('--spool', action='store', metavar='[/foo/spool]', help='Run instruction files as they arrive in this directory, until stopped with SIGTERM or <ctrl> + C. The files share one budget a UTC day, \'hitsPerDay\', or \'hitsQuota\' if there is no \'hitsPerDay\'.')
+    parser.add_argument('--stdin_type', action='store', choices=('flat', 'lst', 'csv'), default='flat', help='Type of the list read from stdin with \'-\'. Default flat.')
     parser.add_argument('--save_as', action='store', metavar='[/foo/save_as.lst]', help='OCLC save_as instructions file name.')
     parser.add_argument('--log', action='store', default='oclc.log', metavar='[/foo/oclc_YYYY-MM-DD.log]', help=f"Log file.")
+    parser.add_argument('--plan', action='store', metavar='[/foo/save_as.lst]', help='Print the hits, time, and memory running an instruction file would take, and the days it needs at the quota, without running it.')
+    parser.add_argument('--plan_split', action='store_true', default=False, help='With --plan, split the file into a file of instructions for each day, like \'save_as.day01.lst\'.')
+    parser.add_argument('--progress', action='store_true', default=False, help='Report the numbers done, hits used, rate, and ETA as --run goes. One line that updates on a terminal, a log line otherwise.')
+    parser.add_argument('--progress_interval', action='store', type=float, metavar='[60]', help='Seconds between --progress reports. Default 1 on a terminal, 60 otherwise.')
+    parser.add_argument('--profile', action='store_true', default=False, help='Profile the CPU time and memory of each phase of the run: parse, merge, check, unset, set, and write. Profiles are written next to the log.')
+    parser.add_argument('--outcomes', action='store', metavar='[/foo/outcomes.jsonl]', help=f"Write per-number results to this JSON lines (or '.tsv') file instead of the log.")
+    parser.add_argument('--run_summary', action='store', nargs='?', const='last', metavar='[run id]', help='Show the totals of a run, default the last run. Requires \'database\' in the YAML file.')
     parser.add_argument('--run', action='store', metavar='[/foo/save_as.lst]', help=f"File that contains instructions to update WorldCat holdings.")
+    parser.add_argument('--trace', action='store', metavar='[/foo/trace.jsonl]', help='Write a span for each token refresh, web service request, JSON parse, and report of a response to this JSON lines file.')
+    parser.add_argument('--upload', action='store', metavar='[/foo/records.flat]', help='Upload flat records that don\'t have OCLC numbers as institution-level bib records.')
     parser.add_argument('--version', action='version', version='%(prog)s ' + VERSION)
+    parser.add_argument('--workers', action='store', type=int, default=4, metavar='[4]', help='Number of concurrent uploads used with --upload. Default 4.')
+    parser.add_argument('--worker', action='store', metavar='[/shared/shards]', help='Run shards from a shared directory of shards until there are none left. Shares the day\'s budget of hits, see --shard.')
     parser.add_argument('-y', '--yaml', action='store', default='test.yaml', metavar='[/foo/prod.yaml]', help='alternate YAML file for testing. Default to "test.yaml"')
     args = parser.parse_args()
+    # stdin can only be read once, by one list.
+    stdin_lists = list(name for name in ('add', 'delete', 'check', 'done') if getattr(args, name) == '-')
+    if len(stdin_lists) > 1:
+        parser.error(f"only one list can be read from stdin, not --{' and --'.join(stdin_lists)}.")
+    if args.run_summary and args.run_summary != 'last' and not args.run_summary.isdigit():
+        parser.error(f"--run_summary takes a run id or 'last', not '{args.run_summary}'.")
+    if '-' in (args.upload, args.run, args.shard):
+        parser.error('--upload, --run, and --shard read their file more than once, so can\'t read stdin.')
+    # The run must finish by a time of day, or within so many seconds of starting.
+    finish_by = None
+    if args.deadline or args.max_runtime is not None:
+        if args.deadline and args.max_runtime is not None:
+            parser.error('use --deadline or --max_runtime, not both.')
+        if not args.run:
+            parser.error('--deadline and --max_runtime limit --run.')
+        from lib.concurrency import seconds_until
+        try:
+            seconds = seconds_until(args.deadline) if args.deadline else args.max_runtime
+        except ValueError as ex:
+            parser.error(f"--deadline {ex}")
+        finish_by = time.monotonic() + seconds
+
+    # Spans of where the time of each web service call goes.
+    tracer = None
+    if args.trace:
+        from lib.tracing import Tracer
+        tracer = Tracer(args.trace)
+
+    # Counters and latency histograms of the run, written as it goes.
+    metrics = None
+    if args.metrics:
+        from lib.metrics import Metrics
+        metrics = Metrics(args.metrics)
+        metrics.start(args.metrics_interval)
+
+    # Several institutions at once, each with its own YAML.
+    if args.job:
+        logger = Logger(log_file=args.log, buffered=True)
+        logger.logit(f"=== starting version {VERSION}, {len(args.job)} jobs", include_timestamp=True)
+        stop = threading.Event()
+        # Stop every job between batches and save their work as '.interrupted'.
+        def drain(signum, frame):
+            logger.logit(f"received signal {signum}, finishing the requests in flight.", include_timestamp=True)
+            stop.set()
+        signal.signal(signal.SIGTERM, drain)
+        signal.signal(signal.SIGINT, drain)
+        run_jobs(list(tuple(job) for job in args.job), logger, debug=args.debug, force=args.force, stop=stop, metrics=metrics, in_place=args.in_place,
+            tracer=tracer)
+        if metrics:
+            metrics.close()
+        if tracer:
+            tracer.close()
+        logger.logit('done', include_timestamp=True)
+        return
     
     # Load configuration.
     yaml_file = 'test.yaml'
@@ -282,10 +788,14 @@ dataDir:         'data'
         if 'error' in configs.keys():
             sys.stderr.write(configs.get('error'))
             sys.exit()
-        logger = Logger(log_file=args.log)
+        # Log writes are buffered so they stay off the web service hot path.
+        logger = Logger(log_file=args.log, buffered=True)
         hits_quota = configs.get('hitsQuota')
         ignore_dict = configs.get('ignoreTags')
         logger.logit(f"=== starting version {VERSION}", include_timestamp=True)
+        # Profiles go next to the log, like 'oclc.profile.txt'.
+        from lib.profiler import PhaseProfiler
+        profiler = PhaseProfiler(splitext(args.log)[0] if args.profile else None, logger=logger, debug=args.debug)
     else:
         sys.stderr.write(f"*error, required (YAML) configuration file not found! No such file: '{yaml_file}'.\n")
         sys.exit()
@@ -299,20 +809,113 @@ dataDir:         'data'
         logger.logit(f"debug: '{args.debug}'")
         logger.logit(f"save_as: '{args.save_as}'")
         logger.logit(f"run: '{args.run}'")
+        logger.logit(f"spool: '{args.spool}'")
+        logger.logit(f"stdin_type: '{args.stdin_type}'")
+        logger.logit(f"shard: '{args.shard}'")
+        logger.logit(f"shard_dir: '{args.shard_dir}'")
+        logger.logit(f"shard_size: '{args.shard_size}'")
+        logger.logit(f"worker: '{args.worker}'")
+        logger.logit(f"outcomes: '{args.outcomes}'")
+        logger.logit(f"metrics: '{args.metrics}'")
+        logger.logit(f"trace: '{args.trace}'")
+        logger.logit(f"profile: '{args.profile}'")
+        logger.logit(f"progress: '{args.progress}'")
+        logger.logit(f"plan: '{args.plan}'")
+        logger.logit(f"force: '{args.force}'")
+        logger.logit(f"in_place: '{args.in_place}'")
+        logger.logit(f"deadline: '{args.deadline}'")
+        logger.logit(f"max_runtime: '{args.max_runtime}'")
+        logger.logit(f"seed_holdings: '{args.seed_holdings}'")
+        logger.logit(f"upload: '{args.upload}'")
+        logger.logit(f"workers: '{args.workers}'")
         logger.logit(f"yaml: '{yaml_file}'")
         logger.logit(f"hits quota: '{hits_quota}'")
+        from lib.scheduler import DEFAULT_POLICY
+        logger.logit(f"hits policy: '{configs.get('hitsPolicy', DEFAULT_POLICY)}'")
         logger.logit(f"ignoreTags: '{ignore_dict}'")
+        logger.logit(f"database: '{configs.get('database')}'")
+        logger.logit(f"hits per day: '{configs.get('hitsPerDay')}'")
+        logger.logit(f"hits per second: '{configs.get('hitsPerSecond')}'")
+        logger.logit(f"max concurrency: '{configs.get('maxConcurrency', 4)}'")
+        logger.logit(f"latency target: '{configs.get('latencyTarget')}'")
         logger.logit(f"== vars ==\n")
 
-    # Upload XML MARC21 records.
-    # if args.xml_records:
-    #     # TODO: Waiting for OCLC to respond with answers to why the XML throws an error.
-    #     # TODO: Move to different class that works with the flat file to create xml for 
-    #     # TODO: records that don't have OCLC numbers, and to create a slim file for updating ILS
-    #     # TODO: records.  
-    #     print(f"currently not supported.")
-    #     pass
-    
+    # Report on the history of previous runs.
+    if args.history or args.run_summary:
+        if not configs.get('database'):
+            logger.logit(f"no 'database' is configured in {yaml_file}.", level='error')
+            sys.exit()
+        from lib.history import HistoryStore
+        history = HistoryStore(configs.get('database'), debug=args.debug)
+        if args.history:
+            for row in history.number_history(args.history):
+                print(f"run {row['run_id']} [{row['timestamp']}] {row['action']}{args.history} {row['status']} {row['new_number'] or ''} {row['detail'] or ''}".rstrip())
+        if args.run_summary:
+            run_id = None if args.run_summary == 'last' else int(args.run_summary)
+            for (action, statuses) in history.run_summary(run_id).items():
+                print(f"{action} " + ', '.join(f"{status}: {count}" for (status, count) in statuses.items()))
+        history.close()
+
+    # Plan a run without sending anything.
+    if args.plan:
+        from lib.planner import make_plan, format_plan, split_by_day, observed_seconds_per_hit, DEFAULT_SECONDS_PER_HIT
+        from lib.scheduler import DEFAULT_POLICY
+        seconds_per_hit, runs = None, 0
+        if configs.get('database'):
+            from lib.history import HistoryStore
+            history = HistoryStore(configs.get('database'), debug=args.debug)
+            seconds_per_hit, runs = observed_seconds_per_hit(history)
+            history.close()
+        counts = InstructionManager(args.plan, debug=args.debug).count_instructions()
+        policy = configs.get('hitsPolicy', DEFAULT_POLICY)
+        plan = make_plan(counts, hits_quota=configs.get('hitsQuota'), hits_per_day=configs.get('hitsPerDay'),
+            policy=policy, seconds_per_hit=seconds_per_hit or DEFAULT_SECONDS_PER_HIT)
+        print(f"plan for '{args.plan}', " + (f"at the rate of {runs} recent run{'s' if runs > 1 else ''}:" if runs else 'no runs to take the rate from:'))
+        for line in format_plan(plan):
+            print(f"  {line}")
+        if args.plan_split:
+            if not plan['hits_per_day']:
+                logger.logit(f"--plan_split needs 'hitsPerDay' or 'hitsQuota' in {yaml_file}.", level='error')
+            else:
+                for day_file in split_by_day(args.plan, counts, plan['hits_per_day'], policy=policy):
+                    print(f"  wrote '{day_file}'")
+
+    # Count every web service hit by institution and UTC day, and pace them
+    # to the daily and per-second limits. Runs that share the database share
+    # the limits. Without a database the limits only apply to this run.
+    ledger = None
+    per_day = configs.get('hitsPerDay')
+    # A spool daemon runs file after file, and the workers of a sharded run
+    # a shard each, so they share the day's budget, 'hitsQuota' if there is
+    # no 'hitsPerDay', instead of each file or shard getting a quota of its own.
+    if (args.spool or args.shard or args.worker) and not per_day:
+        per_day = configs.get('hitsQuota')
+    # The workers are separate processes, so the budget is only shared
+    # through the database they all count their hits in.
+    if (args.shard or args.worker) and per_day and not configs.get('database'):
+        logger.logit(f"--shard and --worker share 'hitsPerDay', or 'hitsQuota', through a 'database' every worker can reach, but none is configured in {yaml_file}.", level='error')
+        sys.exit()
+    if (args.upload or args.run or args.spool or args.shard or args.worker) and (configs.get('database') or per_day or configs.get('hitsPerSecond')):
+        from lib.quota import QuotaLedger
+        ledger = QuotaLedger(configs.get('database') or ':memory:', configs['service'].get('institutionalSymbol', ''),
+            per_day=per_day, per_second=configs.get('hitsPerSecond'), debug=args.debug)
+        if ledger.remaining() is not None:
+            logger.logit(f"{ledger.used()} web service hits used today (UTC), {ledger.remaining()} remaining.")
+    # Seconds to wait before taking on more work, until the next UTC day if
+    # today's hits are all used.
+    def out_of_hits() -> float:
+        if ledger and ledger.remaining() == 0:
+            from lib.quota import seconds_to_next_day
+            return seconds_to_next_day()
+        return 0.0
+
+    # Upload XML MARC21 records of flat records that don't have OCLC numbers.
+    if args.upload:
+        with profiler.phase('parse'):
+            lister = Lister(args.upload, debug=args.debug, ignore=ignore_dict, metrics=metrics)
+        with profiler.phase('upload'):
+            upload_bib_records(args.upload, lister.get_rejected_tcns(), configs=configs, logger=logger, workers=args.workers, debug=args.debug, ledger=ledger, metrics=metrics, tracer=tracer)
+
     # Two lists, one for adding holdings and one for deleting holdings. 
     set_holdings_lst   = []
     unset_holdings_lst = []
@@ -322,81 +925,137 @@ dataDir:         'data'
 
     # Add records to institution's holdings.
     if args.add:
-        lister = Lister(args.add, debug=args.debug, ignore=ignore_dict)
-        set_holdings_lst = lister.get_list('+')
+        with profiler.phase('parse'):
+            lister = Lister(args.add, debug=args.debug, ignore=ignore_dict, metrics=metrics, stdin_type=args.stdin_type)
+            set_holdings_lst = lister.get_list('+')
         
     # delete records from institutional holdings.
     if args.delete:
-        lister = Lister(args.delete, debug=args.debug, ignore=ignore_dict)
-        unset_holdings_lst = lister.get_list('-')
+        with profiler.phase('parse'):
+            lister = Lister(args.delete, debug=args.debug, ignore=ignore_dict, metrics=metrics, stdin_type=args.stdin_type)
+            unset_holdings_lst = lister.get_list('-')
 
     # Create a list of oclc numbers to check a list of holdings.
     if args.check:
-        lister = Lister(args.check, debug=args.debug, ignore=ignore_dict)
-        check_holdings_lst = lister.get_list('?')
+        with profiler.phase('parse'):
+            lister = Lister(args.check, debug=args.debug, ignore=ignore_dict, metrics=metrics, stdin_type=args.stdin_type)
+            check_holdings_lst = lister.get_list('?')
 
     if args.done:
-        lister = Lister(args.done, debug=args.debug, ignore=ignore_dict)
-        done_lst = lister.get_list('!')
+        with profiler.phase('parse'):
+            lister = Lister(args.done, debug=args.debug, ignore=ignore_dict, metrics=metrics, stdin_type=args.stdin_type)
+            done_lst = lister.get_list('!')
+
+    # Record the OCLC holdings report in the local holdings mirror.
+    if args.seed_holdings:
+        if not configs.get('database'):
+            logger.logit(f"no 'database' is configured in {yaml_file}.", level='error')
+            sys.exit()
+        from lib.holdings import HoldingsMirror
+        mirror = HoldingsMirror(configs.get('database'), debug=args.debug)
+        seeded = mirror.seed(Lister(args.seed_holdings, debug=args.debug).get_list('+'))
+        logger.logit(f"seeded {seeded} holdings from '{args.seed_holdings}'.")
+        mirror.close()
 
-    if not args.save_as and not args.run:
-        logger.logit(f"Warning, nothing to do. Either use --save_as or --run. See --help for more information.")
+    if not args.save_as and not args.run and not args.spool and not args.shard and not args.worker and not args.upload and not args.history and not args.run_summary and not args.seed_holdings and not args.plan:
+        logger.logit(f"Warning, nothing to do. Either use --save_as, --run, --spool, --shard, --worker, or --upload. See --help for more information.")
 
     if args.save_as:
+        # OCLC numbers that OCLC reported as changed in previous runs.
+        remap_dict = {}
+        if configs.get('database'):
+            from lib.remap import RemapTable
+            remap_table = RemapTable(configs.get('database'), debug=args.debug)
+            remap_dict  = remap_table.as_dict()
+            remap_table.close()
         # Merge any and all lists and write out instructions.
-        instruction_manager = InstructionManager(args.save_as, debug=args.debug)
-        instruction_list = instruction_manager.merge(set_holdings_lst, unset_holdings_lst, check_holdings_lst, done_lst)
+        instruction_manager = InstructionManager(args.save_as, debug=args.debug, remap=remap_dict, metrics=metrics)
+        with profiler.phase('merge'):
+            instruction_list = instruction_manager.merge(set_holdings_lst, unset_holdings_lst, check_holdings_lst, done_lst)
         # Output the save_as list. 
-        instruction_manager.write_instructions(instruction_list)
+        with profiler.phase('write'):
+            instruction_manager.write_instructions(instruction_list)
+        if instruction_manager.get_remapped():
+            logger.logit(f"replaced {len(instruction_manager.get_remapped())} OCLC numbers with their current numbers.")
     if args.run:
-        # Load instruction list specified by args.run. 
-        instruction_manager = InstructionManager(args.run, debug=args.debug)
-        set_holdings_lst    = instruction_manager.read_instruction_numbers('+')
-        unset_holdings_lst  = instruction_manager.read_instruction_numbers('-')
-        check_holdings_lst  = instruction_manager.read_instruction_numbers('?')
-        # If there are done items in the file, mark them done for when we write to '.completed'.
-        done_lst            = list('!' + num for num in instruction_manager.read_instruction_numbers('!'))
-        # Call the web service with the appropriate list, and capture results.
-        try:
-            if args.debug:
-                sys.stderr.write(f"set: {set_holdings_lst[:3]}...\nunset: {unset_holdings_lst[:3]}...\ncheck: {check_holdings_lst[:3]}...\n")
-            if check_holdings_lst:
-                check_holdings_lst = check_holdings_lst[0:int(hits_quota)]
-                done = check_institutional_holdings(check_holdings_lst, configs=configs, logger=logger, debug=args.debug)
-                done_lst.extend(list('!' + num for num in done))
-            if unset_holdings_lst:
-                unset_holdings_lst = unset_holdings_lst[0:int(hits_quota)]
-                done = delete_holdings(unset_holdings_lst, configs=configs, logger=logger, debug=args.debug)
-                done_lst.extend(list('!' + num for num in done))
-            if set_holdings_lst:
-                set_holdings_lst = set_holdings_lst[0:int(hits_quota)]
-                done, updated = add_holdings(set_holdings_lst, configs=configs, logger=logger, debug=args.debug)
-                done_lst.extend(list('!' + num for num in done))
-                # Write out any updated oclc numbers to flat slim.
-                # TODO: Currently one must use the --add --save_as AND --run 
-                # for the lister below to have a valid flatLister. 
-                # Can this be made simpler?? Can we use --flat or 
-                if updated and lister:
-                    lister.write_updates(updated)
+        deadline = None
+        if finish_by is not None:
+            from lib.concurrency import Deadline
+            deadline = Deadline(finish_by - time.monotonic(), logger=logger, debug=args.debug)
+        run_instructions(args.run, configs, logger, debug=args.debug, outcomes=args.outcomes,
+            force=args.force, lister=lister, ledger=ledger, metrics=metrics, profiler=profiler, in_place=args.in_place,
+            deadline=deadline, progress=args.progress, progress_interval=args.progress_interval, tracer=tracer)
 
-            # Write out the lists
-            instruction_manager = InstructionManager(args.run + '.completed', debug=args.debug)
-            completed_list = instruction_manager.merge(set_holdings_lst, unset_holdings_lst, check_holdings_lst, done_lst)
-            # Output the completed save_as list. Note this won't include numbers beyond quotas.
-            instruction_manager.write_instructions(completed_list)
-            logger.logit('done', include_timestamp=True)
-        except KeyboardInterrupt:
-            instruction_manager = InstructionManager(args.run + '.interrupted', debug=args.debug)
-            # Save the instructions that haven't been done yet.
-            set_holdings_lst   = list('+' + num for num in set_holdings_lst)
-            unset_holdings_lst = list('-' + num for num in unset_holdings_lst)
-            check_holdings_lst = list('?' + num for num in check_holdings_lst)
-            # Don't add another action character to the done_lst
-            complete_incomplete_list = instruction_manager.merge(set_holdings_lst, unset_holdings_lst, check_holdings_lst, done_lst)
-            # Output the state of the lists as they were at the time of the interrupt.
-            instruction_manager.write_instructions(complete_incomplete_list)
-            logger.logit('!Warning, received keyboard interrupt!\nSaving work done.', level='error', include_timestamp=True)
-            logger.logit('exited on <ctrl> + C interrupt.', include_timestamp=True)
+    # Run instruction files as they arrive with one web service, so the token,
+    # connections, and concurrency limit stay warm from one file to the next.
+    if args.spool:
+        stop = threading.Event()
+        # Stop taking files and batches, finish the requests in flight, and
+        # save the file being run as '.interrupted'.
+        def drain(signum, frame):
+            logger.logit(f"received signal {signum}, finishing the requests in flight.", include_timestamp=True)
+            stop.set()
+        signal.signal(signal.SIGTERM, drain)
+        signal.signal(signal.SIGINT, drain)
+        from lib.oclcws import OclcService
+        from lib.concurrency import AdaptiveLimit
+        from lib.spool import SpoolWatcher
+        ws = OclcService(configs, debug=args.debug, ledger=ledger, metrics=metrics, tracer=tracer)
+        limit = AdaptiveLimit(initial=1, maximum=configs.get('maxConcurrency', 4),
+            latency_target=configs.get('latencyTarget'), logger=logger, debug=args.debug)
+        spool = SpoolWatcher(args.spool, pattern=configs.get('spoolPattern', '*.lst'), logger=logger, debug=args.debug)
+        spool.serve(lambda path: run_instructions(path, configs, logger, debug=args.debug, outcomes=args.outcomes,
+            force=args.force, ws=ws, ledger=ledger, limit=limit, stop=stop, metrics=metrics, profiler=profiler,
+            in_place=args.in_place, progress=args.progress, progress_interval=args.progress_interval, requeue=True), stop,
+            hold=out_of_hits)
+
+    # Share one instruction file among worker processes, on this host or
+    # others, through a shared directory.
+    if args.shard or args.worker:
+        stop = threading.Event()
+        # Stop after the requests in flight, and put what is left of the
+        # shard back for another worker.
+        def drain(signum, frame):
+            logger.logit(f"received signal {signum}, finishing the requests in flight.", include_timestamp=True)
+            stop.set()
+        signal.signal(signal.SIGTERM, drain)
+        signal.signal(signal.SIGINT, drain)
+        from lib.oclcws import OclcService
+        from lib.concurrency import AdaptiveLimit
+        from lib.shard import ShardQueue
+        ws = OclcService(configs, debug=args.debug, ledger=ledger, metrics=metrics, tracer=tracer)
+        limit = AdaptiveLimit(initial=1, maximum=configs.get('maxConcurrency', 4),
+            latency_target=configs.get('latencyTarget'), logger=logger, debug=args.debug)
+        process = lambda path, shard_stop: run_instructions(path, configs, logger, debug=args.debug,
+            outcomes=args.outcomes, force=args.force, ws=ws, ledger=ledger, limit=limit, stop=shard_stop, metrics=metrics, profiler=profiler,
+            in_place=args.in_place, progress=args.progress, progress_interval=args.progress_interval, requeue=True)
+        shard_dir = args.worker if args.worker else (args.shard_dir if args.shard_dir else output_path(args.shard, '.shards', compress=False))
+        queue = ShardQueue(shard_dir, lease_seconds=configs.get('leaseSeconds', 300), logger=logger, debug=args.debug)
+        if args.worker:
+            published = queue.work(process, stop, hold=out_of_hits)
+            logger.logit(f"published {published} shards, {len(queue.pending())} shards left.", include_timestamp=True)
+        else:
+            if not queue.get_manifest():
+                queue.split(args.shard, shard_size=args.shard_size)
+            # Work on shards too, and on any whose lease expires, until they are all done.
+            queue.wait_for_all(process, stop, hold=out_of_hits)
+            output = output_path(args.shard, '.completed' if queue.is_complete() else '.interrupted')
+            from lib.packed import is_packed
+            count = queue.merge(output, packed=is_packed(args.shard))
+            logger.logit(f"merged {count} instructions from {len(queue.get_manifest().get('shards', []))} shards into '{output}'.", include_timestamp=True)
+    if ledger:
+        if ledger.get_waited():
+            logger.logit(f"waited {ledger.get_waited():.1f} seconds for the hits per second limit.")
+        ledger.close()
+    profiler.close()
+    if metrics:
+        for line in metrics.get_summary():
+            logger.logit(line)
+        metrics.close()
+        logger.logit(f"wrote metrics to '{args.metrics}' and '{metrics.json_file}'.")
+    if tracer:
+        tracer.close()
+        logger.logit(f"wrote trace spans to '{args.trace}'.")
     
         
 if __name__ == "__main__":
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# Purpose: Time the parsers, the instruction file handling, and a whole run
+#   against a stand-in for the OCLC web service, on synthetic data.
+# Date:    Sat Oct 24 16:12:45 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import os
+import re
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+from os.path import join, dirname, abspath, exists
+from contextlib import redirect_stdout
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = dirname(dirname(abspath(__file__)))
+OCLC = join(ROOT, 'oclc.py')
+sys.path.insert(0, ROOT)
+from synthetic import SCALES, scale_size, write_flat, write_csv_report, write_number_list, write_instructions
+
+# Cases that build a structure per record are capped, so a '10m' run still
+# finishes. The cap is reported with the result.
+MARCXML_LIMIT = 10_000
+CASES = ('flat_read', 'simple_list', 'csv_list', 'merge', 'write_instructions',
+    'read_instructions', 'read_packed', 'marcxml', 'run')
+
+# Answers the requests oclc.py makes with --run, like the OCLC web service
+# would if every number were valid and every request succeeded.
+class FakeOclc(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def _reply_(self, code:int, body:dict):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _entries_(self) -> dict:
+        query = parse_qs(urlparse(self.path).query)
+        numbers = query.get('oclcNumbers', [''])[0].split(',')
+        return {'entries': [{'title': n, 'updated': '2023-01-31T20:39:40.088Z',
+            'content': {'requestedOclcNumber': n, 'currentOclcNumber': n, 'detail': ''}} for n in numbers]}
+
+    def do_POST(self):
+        if self.path.startswith('/token'):
+            return self._reply_(200, {'access_token': 'benchmark', 'expires_at': '2099-01-01 00:00:00Z'})
+        self._reply_(207, self._entries_())
+
+    def do_DELETE(self):
+        self._reply_(207, self._entries_())
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        number = query.get('oclcNumber', [''])[0]
+        self._reply_(200, {'title': number, 'updated': '2023-01-31T20:39:40.088Z',
+            'content': {'requestedOclcNumber': number, 'currentOclcNumber': number,
+            'holdingCurrentlySet': True, 'institution': 'BENCH'}})
+
+# Starts the stand-in service on a free port.
+# return: the server, call shutdown() when done.
+def start_fake_oclc() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeOclc)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-oclc', daemon=True).start()
+    return server
+
+def get_version() -> str:
+    with open(OCLC, encoding='utf-8') as f:
+        match = re.search(r"^VERSION\s*=\s*['\"]([^'\"]+)['\"]", f.read(), re.MULTILINE)
+    return match.group(1) if match else 'unknown'
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+            text=True, timeout=10).stdout.strip() or 'unknown'
+    except (OSError, subprocess.SubprocessError):
+        return 'unknown'
+
+def median(values:list) -> float:
+    values = sorted(values)
+    return values[len(values) // 2]
+
+# Times a case.
+# param: case callable that returns the count of items it handled.
+# param: repeat int times to run it.
+# return: dictionary of the fastest and median seconds, items, and items per second.
+def measure(case, repeat:int) -> dict:
+    seconds = []
+    items = 0
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        items = case()
+        seconds.append(time.perf_counter() - started)
+    best = min(seconds)
+    return {'min_seconds': round(best, 6), 'median_seconds': round(median(seconds), 6),
+        'runs': len(seconds), 'items': items, 'items_per_second': round(items / best, 1) if best else 0.0}
+
+# Writes the synthetic inputs, once per scale and seed, into the work directory.
+def make_inputs(work_dir:str, size:int, seed:int) -> dict:
+    inputs = {'flat': join(work_dir, 'bench.flat'), 'csv': join(work_dir, 'bench.csv'),
+        'list': join(work_dir, 'bench.lst'), 'instructions': join(work_dir, 'bench_instructions.lst')}
+    for (kind, writer) in (('flat', write_flat), ('csv', write_csv_report),
+      ('list', write_number_list), ('instructions', write_instructions)):
+        if not exists(inputs[kind]):
+            started = time.perf_counter()
+            writer(inputs[kind], size, seed=seed)
+            print(f"wrote {size} records to '{inputs[kind]}' in {time.perf_counter() - started:.1f}s.", file=sys.stderr)
+    return inputs
+
+# Builds the cases. Each returns the number of items it handled.
+def make_cases(inputs:dict, work_dir:str, run_limit:int) -> dict:
+    from lib.flat import Flat, read_flat_records
+    from lib.flat2marcxml import MarcXML
+    from lib.listutils import SimpleListFile, OclcCsvListFile, InstructionManager
+    from lib.packed import convert
+
+    devnull = open(os.devnull, mode='w')
+    # Each list has as many numbers as the scale.
+    lists = {}
+    def get_lists():
+        if not lists:
+            lists['add'] = SimpleListFile(inputs['list']).get_add_list()
+            lists['delete'] = OclcCsvListFile(inputs['csv']).get_delete_list()
+        return lists
+
+    def flat_read():
+        with redirect_stdout(devnull):
+            flat = Flat(inputs['flat'])
+        return len(flat.slim_bib_records) + len(flat.get_rejected_tcns()) + len(flat.get_no_oclc_number_tcns())
+
+    def simple_list():
+        return len(SimpleListFile(inputs['list']).get_add_list())
+
+    def csv_list():
+        return len(OclcCsvListFile(inputs['csv']).get_delete_list())
+
+    def merge():
+        lists = get_lists()
+        return len(InstructionManager(join(work_dir, 'merged.lst')).merge(lists['add'], lists['delete']))
+
+    def write_instructions_case():
+        lists = get_lists()
+        merged = lists.get('merged')
+        if merged is None:
+            merged = lists['merged'] = InstructionManager(join(work_dir, 'merged.lst')).merge(lists['add'], lists['delete'])
+        InstructionManager(join(work_dir, 'merged.lst')).write_instructions(merged)
+        return len(merged)
+
+    def read_instructions():
+        manager = InstructionManager(inputs['instructions'])
+        return sum(len(manager.read_instruction_numbers(action)) for action in ('-', '+', '?', '!', ' '))
+
+    def read_packed():
+        packed_file = join(work_dir, 'bench_instructions.bin')
+        if not exists(packed_file):
+            convert(inputs['instructions'], packed_file)
+        manager = InstructionManager(packed_file)
+        return sum(len(manager.read_instruction_numbers(action)) for action in ('-', '+', '?', '!', ' '))
+
+    def marcxml():
+        count = 0
+        for record in read_flat_records(inputs['flat']):
+            str(MarcXML(record))
+            count += 1
+            if count >= MARCXML_LIMIT:
+                break
+        return count
+
+    def run():
+        # A fresh instruction file, since --run renames it when it finishes.
+        run_file = join(work_dir, 'run.lst')
+        with open(inputs['instructions'], encoding='ISO-8859-1') as f_in, \
+          open(run_file, encoding='ISO-8859-1', mode='w') as f_out:
+            count = 0
+            for line in f_in:
+                if count >= run_limit:
+                    break
+                f_out.write(line)
+                count += 1
+        server = start_fake_oclc()
+        try:
+            base_url = f"http://127.0.0.1:{server.server_address[1]}"
+            yaml_file = join(work_dir, 'bench.yaml')
+            with open(yaml_file, mode='w') as f:
+                f.write("service:\n  name: 'benchmark'\n  clientId: 'id'\n  secret: 'secret'\n"
+                    "  registryId: '1'\n  principalId: ''\n  principalIdns: ''\n"
+                    "  institutionalSymbol: 'BENCH'\n  branchName: 'MAIN'\n"
+                    f"  baseUrl: '{base_url}'\n  authUrl: '{base_url}'\n"
+                    f"  tokenCache: '{join(work_dir, '_auth_.json')}'\n"
+                    f"hitsQuota: {run_limit * 2 + 100}\nhitsPerDay: {run_limit * 2 + 100}\n")
+            result = subprocess.run([sys.executable, OCLC, '--run', run_file, '-y', yaml_file,
+                '--log', join(work_dir, 'bench_run.log')], cwd=work_dir,
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"oclc.py --run exited {result.returncode}: {result.stderr.strip()[-500:]}")
+        finally:
+            server.shutdown()
+            server.server_close()
+        return count
+
+    return {'flat_read': flat_read, 'simple_list': simple_list, 'csv_list': csv_list,
+        'merge': merge, 'write_instructions': write_instructions_case,
+        'read_instructions': read_instructions, 'read_packed': read_packed, 'marcxml': marcxml, 'run': run}
+
+# Compares results with an earlier run.
+# param: baseline dict results of an earlier run.
+# param: results dict results of this run.
+# param: threshold float slowdown, as a fraction, reported as a regression.
+# return: list of regressions, as strings.
+def compare(baseline:dict, results:dict, threshold:float) -> list:
+    regressions = []
+    for (name, result) in results['cases'].items():
+        old = baseline.get('cases', {}).get(name)
+        if not old or old.get('items') != result['items'] or not old.get('min_seconds'):
+            continue
+        change = result['min_seconds'] / old['min_seconds'] - 1.0
+        print(f"{name:<20}{old['min_seconds']:>12.4f}{result['min_seconds']:>12.4f}{change * 100.0:>+9.1f}%")
+        if change > threshold:
+            regressions.append(f"'{name}' is {change * 100.0:.1f}% slower than {baseline.get('commit', 'the baseline')}")
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmarks oclc.py on synthetic flat files, OCLC reports, '
+        'and instruction lists, and writes the results as JSON to compare between versions.')
+    parser.add_argument('--scale', default='10k', help=f"Records in each input: {', '.join(SCALES)}, or a number. Default 10k.")
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of each case, the fastest is compared. Default 3.')
+    parser.add_argument('--cases', default=','.join(CASES), help=f"Comma separated cases to run. Default all: {','.join(CASES)}.")
+    parser.add_argument('--run_limit', type=int, default=5000, help='Instructions sent in the \'run\' case. Default 5000.')
+    parser.add_argument('--work_dir', help='Keep the synthetic inputs here, and reuse them. Default a temporary directory.')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed of the inputs. Default 42.')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--compare', help='Compare with the results of an earlier run, from --output.')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Slowdown reported as a regression by --compare. Default 0.10, 10%%.')
+    args = parser.parse_args(argv)
+    size = scale_size(args.scale)
+    names = [name.strip() for name in args.cases.split(',') if name.strip()]
+    for name in names:
+        if name not in CASES:
+            parser.error(f"unknown case '{name}', expected one of {', '.join(CASES)}.")
+    temp_dir = None
+    if args.work_dir:
+        os.makedirs(args.work_dir, exist_ok=True)
+        work_dir = abspath(args.work_dir)
+    else:
+        temp_dir = tempfile.TemporaryDirectory()
+        work_dir = temp_dir.name
+    results = {'version': get_version(), 'commit': get_commit(), 'python': platform.python_version(),
+        'platform': platform.platform(), 'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'scale': args.scale, 'records': size, 'cases': {}}
+    try:
+        inputs = make_inputs(work_dir, size, args.seed)
+        cases = make_cases(inputs, work_dir, args.run_limit)
+        print(f"{'case':<20}{'min s':>12}{'median s':>12}{'items':>10}{'items/s':>14}")
+        for name in names:
+            result = measure(cases[name], args.repeat)
+            results['cases'][name] = result
+            print(f"{name:<20}{result['min_seconds']:>12.4f}{result['median_seconds']:>12.4f}{result['items']:>10}{result['items_per_second']:>14.1f}")
+    finally:
+        if temp_dir:
+            temp_dir.cleanup()
+    if args.output:
+        with open(args.output, encoding='utf-8', mode='w') as f:
+            json.dump(results, f, indent=2)
+            f.write(os.linesep)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"{'case':<20}{'was s':>12}{'now s':>12}{'change':>10}")
+        regressions = compare(baseline, results, args.threshold)
+        for regression in regressions:
+            sys.stderr.write(f"*warning, {regression}." + os.linesep)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
+# EOF
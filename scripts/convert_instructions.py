@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# Purpose: Convert instruction files between text and packed binary.
+# Date:    Sun Oct 25 15:52:14 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import sys
+import argparse
+from os.path import dirname, abspath, exists
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+from lib.packed import convert, is_packed
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Converts an instruction file, as written by --save_as, '
+        'to a packed binary file if the output ends in \'.bin\', or back to text if it doesn\'t.')
+    parser.add_argument('source', help='Instruction file to read, text or packed.')
+    parser.add_argument('target', help='File to write, like \'master.bin\' or \'master.lst\'.')
+    args = parser.parse_args(argv)
+    if not exists(args.source):
+        sys.stderr.write(f"*error, no such file '{args.source}'.\n")
+        sys.exit(1)
+    try:
+        count = convert(args.source, args.target)
+    except ValueError as ex:
+        sys.stderr.write(f"*error, {ex}\n")
+        sys.exit(1)
+    print(f"converted {count} instructions from {'packed' if is_packed(args.source) else 'text'} '{args.source}' to '{args.target}'.")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
+# EOF
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# Purpose: Measure, and guard, how long oclc.py takes to start in each mode.
+# Date:    Sat Oct 24 10:21:37 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+from os.path import join, dirname, abspath
+
+OCLC = join(dirname(dirname(abspath(__file__))), 'oclc.py')
+
+# Modules a mode must not import. Each is a package that only the web
+# service, the database, or the run options need.
+NETWORK  = ('requests', 'urllib3', 'lib.oclcws', 'lib.concurrency', 'lib.quota', 'concurrent.futures')
+DATABASE = ('sqlite3', 'lib.history', 'lib.remap', 'lib.holdings')
+OPTIONS  = ('lib.spool', 'lib.shard', 'lib.metrics', 'cProfile', 'tracemalloc', 'pstats')
+FORBIDDEN = {
+    'version': NETWORK + DATABASE + OPTIONS + ('yaml',),
+    'help':    NETWORK + DATABASE + OPTIONS + ('yaml',),
+    'save_as': NETWORK + DATABASE + OPTIONS,
+}
+
+# Parses the output of 'python -X importtime'. The interpreter's own start
+# up, 'site' and whatever '.pth' files in site-packages import, is left out.
+# param: stderr str of lines like 'import time:  self | cumulative | name'.
+# return: tuple of the total microseconds of the top level imports, and a
+#   dictionary of {module: cumulative microseconds}.
+def parse_importtime(stderr:str):
+    total = 0
+    modules = {}
+    # A module's imports are listed before it, indented.
+    children = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            (self_us, cumulative_us, name) = line[len('import time:'):].split('|')
+        except ValueError:
+            continue
+        children[name.strip()] = int(cumulative_us)
+        # Top level imports aren't indented, their times include their children.
+        if not name[1:].startswith(' '):
+            if name.strip() != 'site':
+                modules.update(children)
+                total += int(cumulative_us)
+            children = {}
+    return total, modules
+
+# Starts oclc.py once in a mode.
+# return: tuple of the wall seconds, import microseconds, and modules imported.
+def start(args:list, cwd:str):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', OCLC] + args, cwd=cwd,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - started
+    total, modules = parse_importtime(result.stderr)
+    return wall, total, modules
+
+# Writes a small YAML and list of numbers for --save_as, without a database.
+def make_inputs(work_dir:str) -> dict:
+    yaml_file = join(work_dir, 'startup.yaml')
+    with open(yaml_file, mode='w') as f:
+        f.write("service:\n  institutionalSymbol: 'OCPSB'\nhitsQuota: 100\n")
+    list_file = join(work_dir, 'startup.lst')
+    with open(list_file, mode='w') as f:
+        for n in range(1000, 1100):
+            f.write(f"{n}\n")
+    return {
+        'version': ['--version'],
+        'help':    ['--help'],
+        'save_as': ['--add', list_file, '--save_as', join(work_dir, 'startup_out.lst'), '-y', yaml_file,
+            '--log', join(work_dir, 'startup.log')],
+    }
+
+def median(values:list) -> float:
+    values = sorted(values)
+    return values[len(values) // 2]
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Measures how long oclc.py takes to start in each mode, '
+        'with python -X importtime, and checks that each mode only imports what it needs.')
+    parser.add_argument('--repeat', type=int, default=5, help='Starts of each mode, the median is reported. Default 5.')
+    parser.add_argument('--top', type=int, default=0, help='Show the slowest imports of each mode.')
+    parser.add_argument('--budget_ms', type=float, default=0.0, help='Fail if a mode\'s imports take longer than this. Default no limit.')
+    parser.add_argument('--check', action='store_true', default=False, help='Exit 1 if a mode imports a module it shouldn\'t, or is over budget.')
+    args = parser.parse_args(argv)
+    failures = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        modes = make_inputs(work_dir)
+        print(f"{'mode':<10}{'imports ms':>12}{'wall ms':>10}{'modules':>9}")
+        for (mode, mode_args) in modes.items():
+            walls, totals = [], []
+            for _ in range(max(1, args.repeat)):
+                wall, total, modules = start(mode_args, work_dir)
+                walls.append(wall)
+                totals.append(total)
+            import_ms = median(totals) / 1000.0
+            print(f"{mode:<10}{import_ms:>12.1f}{median(walls) * 1000.0:>10.1f}{len(modules):>9}")
+            for name in FORBIDDEN.get(mode, ()):
+                if name in modules:
+                    failures.append(f"'{mode}' imports '{name}' ({modules[name] / 1000.0:.1f} ms)")
+            if args.budget_ms and import_ms > args.budget_ms:
+                failures.append(f"'{mode}' imports take {import_ms:.1f} ms, over the {args.budget_ms:.1f} ms budget")
+            if args.top:
+                for (name, us) in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+                    print(f"    {us / 1000.0:8.1f} ms  {name}")
+    for failure in failures:
+        sys.stderr.write(f"*error, {failure}." + os.linesep)
+    if args.check and failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
+# EOF
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# Purpose: Generate realistic flat files, OCLC reports, and instruction lists
+#   for testing and benchmarks.
+# Date:    Sat Oct 24 15:47:02 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import sys
+import random
+import argparse
+from os import linesep
+
+# Named sizes, as used by --scale.
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+FORMS    = ('BOOK', 'BOOK', 'BOOK', 'MUSIC', 'VIDEO', 'SERIAL')
+SUBJECTS = ('Canadian fiction.', 'Cooking.', 'Alberta -- History.', 'Gardening.', 'Jazz.',
+    'Children\'s stories.', 'Mystery fiction.', 'Science -- Popular works.')
+WORDS    = ('treasure', 'island', 'river', 'north', 'garden', 'winter', 'stone', 'city',
+    'secret', 'house', 'light', 'prairie', 'history', 'song', 'journey', 'last')
+
+# Returns a size from a name like '1m', or a number.
+def scale_size(scale:str) -> int:
+    return SCALES.get(str(scale).lower()) or int(scale)
+
+# The OCLC number of the n'th title. Numbers are spread over the range OCLC
+# uses, but the same n always gives the same number.
+def oclc_number(n:int) -> int:
+    return 1000 + (n * 7919) % 1_500_000_000
+
+# Writes a Symphony flat file, like 'catalogdump' would with the tags
+# oclc.py reads. Most records have one OCLC number in an '035', some have
+# none and would be uploaded, some have more than one, and some are on order.
+# param: path str file to write.
+# param: records int number of records.
+# param: no_number float share of records without an OCLC number.
+# param: many_numbers float share of records with more than one OCLC number.
+# param: on_order float share of records with '250 |aExpected release'.
+# param: seed int for the random choices.
+# return: int count of records written.
+def write_flat(path:str, records:int, no_number:float=0.05, many_numbers:float=0.03,
+  on_order:float=0.02, seed:int=42) -> int:
+    rand = random.Random(seed)
+    with open(path, encoding='ISO-8859-1', mode='w') as f:
+        for n in range(records):
+            form = rand.choice(FORMS)
+            title = ' '.join(rand.choice(WORDS) for _ in range(rand.randint(2, 5))).capitalize()
+            lines = ['*** DOCUMENT BOUNDARY ***', f"FORM={form}",
+                f".000. |a{'am' if form == 'BOOK' else 'jm'} a0c a",
+                f".001. |aepl{n:08d}",
+                ".003. |aSIRSI",
+                f".005. |a2023{rand.randint(1, 12):02d}{rand.randint(1, 28):02d}120000.0",
+                f".008. |a{rand.randint(0, 23):02d}0101s{rand.randint(1950, 2023)}    abcd          000 1 eng d",
+                f".020.   |a978{rand.randint(0, 9999999999):010d}",
+                f".035.   |a(Sirsi) a{n}"]
+            roll = rand.random()
+            if roll >= no_number:
+                lines.append(f".035.   |a(OCoLC){oclc_number(n)}")
+                if roll < no_number + many_numbers:
+                    lines.append(f".035.   |a(OCoLC){oclc_number(n + records)}|z(OCoLC){oclc_number(n + 2 * records)}")
+            lines.append(".040.   |aAEEPL|beng|cAEEPL")
+            lines.append(f".100. 1 |a{rand.choice(WORDS).capitalize()}, {rand.choice(WORDS).capitalize()}.")
+            lines.append(f".245. 10|a{title} /|cby {rand.choice(WORDS).capitalize()}.")
+            if rand.random() < on_order:
+                lines.append(".250.   |aExpected release")
+            lines.append(f".264.  1|aEdmonton :|bSome Press,|c{rand.randint(1950, 2023)}.")
+            lines.append(f".300.   |a{rand.randint(24, 900)} pages ;|c24 cm")
+            lines.append(f".650.  0|a{rand.choice(SUBJECTS)}")
+            f.write(linesep.join(lines) + linesep)
+    return records
+
+# Writes an OCLC holdings report, as converted from XLSX to CSV.
+# param: path str file to write.
+# param: rows int number of holdings.
+# return: int count of rows written.
+def write_csv_report(path:str, rows:int, seed:int=42) -> int:
+    rand = random.Random(seed)
+    with open(path, encoding='ISO-8859-1', mode='w') as f:
+        f.write(f"OCLC Number\tFormat\tTitle{linesep}")
+        for n in range(rows):
+            number = oclc_number(n)
+            title = ' '.join(rand.choice(WORDS) for _ in range(rand.randint(2, 5))).capitalize()
+            f.write(f'=HYPERLINK("http://www.worldcat.org/oclc/{number}", "{number}")\t{rand.choice(("Book, Print", "Music, CD", "Video, DVD"))}\t{title}{linesep}')
+    return rows
+
+# Writes a list of numbers with trailing text, like a hand made '.txt' list.
+def write_number_list(path:str, rows:int, seed:int=42) -> int:
+    rand = random.Random(seed)
+    with open(path, encoding='ISO-8859-1', mode='w') as f:
+        for n in range(rows):
+            f.write(f"{oclc_number(n)} {rand.choice(WORDS)} {rand.choice(WORDS)}{linesep}")
+    return rows
+
+# Writes an instruction file, like --save_as does, sorted by number.
+# param: path str file to write.
+# param: rows int number of instructions.
+# param: mix dict of {instruction: share}, default mostly sets and unsets.
+# return: int count of instructions written.
+def write_instructions(path:str, rows:int, mix:dict=None, seed:int=42) -> int:
+    rand = random.Random(seed)
+    mix = mix if mix else {'+': 0.45, '-': 0.35, '?': 0.1, '!': 0.05, ' ': 0.05}
+    actions = list(mix.keys())
+    weights = list(mix.values())
+    with open(path, encoding='ISO-8859-1', mode='w') as f:
+        for number in sorted(str(oclc_number(n)) for n in range(rows)):
+            f.write(f"{rand.choices(actions, weights)[0]}{number}{linesep}")
+    return rows
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Writes synthetic test data.')
+    parser.add_argument('kind', choices=('flat', 'csv', 'list', 'instructions'), help='Kind of file to write.')
+    parser.add_argument('path', help='File to write.')
+    parser.add_argument('--scale', default='10k', help=f"Records to write: {', '.join(SCALES)}, or a number. Default 10k.")
+    parser.add_argument('--seed', type=int, default=42, help='Random seed. Default 42.')
+    args = parser.parse_args(argv)
+    writers = {'flat': write_flat, 'csv': write_csv_report, 'list': write_number_list, 'instructions': write_instructions}
+    count = writers[args.kind](args.path, scale_size(args.scale), seed=args.seed)
+    print(f"wrote {count} {args.kind} records to '{args.path}'.")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
+# EOF
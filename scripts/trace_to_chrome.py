@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# Purpose: Convert a --trace file to a Chrome trace a trace viewer can load.
+# Date:    Tue Oct 27 11:20:45 EDT 2026
+# Copyright 2023 Andrew Nisbet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import sys
+import json
+import argparse
+from os.path import dirname, abspath, exists
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+from lib.tracing import read_spans
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Converts the JSON lines spans written by oclc.py --trace '
+        'to a Chrome trace file, to load into https://ui.perfetto.dev or chrome://tracing.')
+    parser.add_argument('trace', help='Trace file written by --trace.')
+    parser.add_argument('output', help='Chrome trace file to write, like \'trace.json\'.')
+    args = parser.parse_args(argv)
+    if not exists(args.trace):
+        sys.stderr.write(f"*error, no such file '{args.trace}'.\n")
+        sys.exit(1)
+    spans = read_spans(args.trace)
+    with open(args.output, encoding='utf-8', mode='w') as f:
+        json.dump({'traceEvents': spans, 'displayTimeUnit': 'ms'}, f)
+    print(f"converted {len(spans)} spans from '{args.trace}' to '{args.output}'.")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
+# EOF